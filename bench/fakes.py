@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""Stand-ins for the system backends the dashboard talks to.
+
+Commands (nmcli, ping, dnsmasq, systemctl, salt-call, ...) are small
+executables in a bin directory put first on PATH; the Docker Engine API is
+served on a unix socket from a JSON file of containers, and NetworkManager
+on a private dbus-daemon. All read their behaviour from the environment, so
+the app under test runs unmodified:
+
+  PIONEER_FAKE_LATENCY  seconds per call: "0.02" for everything, or
+                        "nmcli=0.3,ping=0.05,docker=0.01,*=0" per backend
+                        (commands by name, plus docker, ndsctl and
+                        networkmanager)
+  PIONEER_FAKE_FAIL     failure rate per backend, optionally with a mode:
+                        "nmcli=0.1,ping=0.5:hang,docker=0.05"
+                        error: non-zero exit / HTTP 500 (default)
+                        hang:  no answer for PIONEER_FAKE_HANG seconds (30)
+
+    fakes.py exec NAME [ARGS...]          run one fake command
+    fakes.py docker SOCKET CONTAINERS     serve the fake Engine API
+    fakes.py ndsctl SOCKET CLIENTS        serve nodogsplash's control socket
+    fakes.py networkmanager ADDRESS       own NetworkManager's name on a bus
+                                          (see start_bus for a private one)
+"""
+import json
+import os
+import random
+import socket
+import socketserver
+import stat
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlsplit
+
+COMMANDS = ['nmcli', 'ping', 'dnsmasq', 'systemctl', 'salt-call', 'hostnamectl', 'shutdown', 'sed']
+HANG_SECONDS = float(os.environ.get('PIONEER_FAKE_HANG', 30))
+
+
+def parse_spec(value):
+    """"nmcli=0.3,*=0.01" or "0.01" -> {'nmcli': '0.3', '*': '0.01'}"""
+    spec = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, sep, setting = item.rpartition('=')
+        spec[name if sep else '*'] = setting
+    return spec
+
+
+def behaviour(name):
+    """(latency seconds, failure rate, failure mode) of one backend, from the environment."""
+    latency = parse_spec(os.environ.get('PIONEER_FAKE_LATENCY'))
+    fail = parse_spec(os.environ.get('PIONEER_FAKE_FAIL'))
+    rate, _, mode = fail.get(name, fail.get('*', '0')).partition(':')
+    return float(latency.get(name, latency.get('*', 0))), float(rate), mode or 'error'
+
+
+def install_commands(bin_dir):
+    """Writes one wrapper per faked command into bin_dir; returns the PATH to use."""
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.abspath(__file__)
+    for name in COMMANDS:
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            # -S skips site: the wrappers are called often and startup dominates their cost
+            f.write(f"#!{sys.executable} -S\nimport sys\nsys.argv[1:1] = ['exec', {name!r}]\n"
+                    f"exec(open({script!r}).read())\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir + os.pathsep + os.environ.get('PATH', '')
+
+
+# --- Commands ---
+NMCLI_CONNECTIONS = [('Wired connection 1', 'yes'), ('PIONEER_SETUP', 'yes')]
+NMCLI_DEVICES = [('eth0', 'ethernet'), ('wlan0', 'wifi'), ('lo', 'loopback')]
+
+
+def fake_nmcli(args):
+    fields = args[args.index('-f') + 1].split(',') if '-f' in args else []
+    if args[-2:] == ['connection', 'show']:
+        rows = [dict(zip(('NAME', 'ACTIVE'), conn)) for conn in NMCLI_CONNECTIONS]
+    elif args[-1:] == ['device']:
+        rows = [dict(zip(('DEVICE', 'TYPE'), dev)) for dev in NMCLI_DEVICES]
+    else:
+        return 0  # con add/up/down/modify
+    for row in rows:
+        print(':'.join(row[field] for field in fields))
+    return 0
+
+
+def fake_ping(args):
+    host = args[-1]
+    print(f"PING {host} ({host}) 56(84) bytes of data.")
+    print(f"64 bytes from {host}: icmp_seq=1 ttl=117 time={random.uniform(8, 40):.1f} ms")
+    return 0
+
+
+def fake_dnsmasq(args):
+    if '--test' in args:
+        print("dnsmasq: syntax check OK.", file=sys.stderr)
+    return 0
+
+
+def fake_salt_call(args):
+    print(json.dumps({'local': {}}) if '--out=json' in args else "local:\n    ----------")
+    return 0
+
+
+def run_command(name, args):
+    latency, rate, mode = behaviour(name)
+    time.sleep(latency)
+    if random.random() < rate:
+        if mode == 'hang':
+            time.sleep(HANG_SECONDS)
+        print(f"{name}: simulated failure", file=sys.stderr)
+        return 1
+    handler = {'nmcli': fake_nmcli, 'ping': fake_ping, 'dnsmasq': fake_dnsmasq,
+               'salt-call': fake_salt_call}.get(name)
+    # systemctl, hostnamectl, shutdown and sed only need to succeed (and not touch the host)
+    return handler(args) if handler else 0
+
+
+# --- Docker Engine API ---
+class DockerState:
+    """Containers from a fixture file, with start/stop/remove applied in memory."""
+
+    def __init__(self, containers):
+        self.lock = threading.Lock()
+        self.containers = {c['Id']: c for c in containers}
+        self.subscribers = []
+
+    def find(self, ref):
+        for c in self.containers.values():
+            if c['Id'].startswith(ref) or '/' + ref in c['Names']:
+                return c
+        return None
+
+    def listing(self, all_, filters):
+        labels = filters.get('label', [])
+        names = filters.get('name', [])
+        result = []
+        with self.lock:
+            for c in self.containers.values():
+                if not all_ and c['State'] != 'running':
+                    continue
+                if names and not any(n.lstrip('/') in names for n in c['Names']):
+                    continue
+                if any(c['Labels'].get(k) != v if v else k not in c['Labels']
+                       for k, _, v in (label.partition('=') for label in labels)):
+                    continue
+                result.append(c)
+            return json.dumps(result).encode()
+
+    def set_state(self, container, state):
+        with self.lock:
+            changed = container['State'] != state
+            container['State'] = state
+            container['Status'] = 'Up 1 second' if state == 'running' else 'Exited (0) 1 second ago'
+            event = {'Type': 'container', 'Action': 'start' if state == 'running' else 'die',
+                     'Actor': {'ID': container['Id'], 'Attributes': dict(container['Labels'],
+                               name=container['Names'][0].lstrip('/'))}, 'time': int(time.time())}
+            for q in self.subscribers:
+                q.append(event)
+        return changed
+
+
+class DockerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return 'docker'
+
+    def send(self, code, body=b'', content_type='application/json'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error(self, code, message):
+        self.send(code, json.dumps({'message': message}).encode())
+
+    def simulate(self):
+        latency, rate, mode = behaviour('docker')
+        time.sleep(latency)
+        if random.random() < rate:
+            if mode == 'hang':
+                time.sleep(HANG_SECONDS)
+            self.error(500, 'simulated failure')
+            return False
+        return True
+
+    def route(self, method):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if path == '/events':
+            return self.events()
+        if not self.simulate():
+            return
+        parts = path.strip('/').split('/')
+        if path == '/_ping':
+            return self.send(200, b'OK', 'text/plain')
+        if path == '/containers/json':
+            filters = json.loads(query.get('filters', '{}'))
+            return self.send(200, self.state.listing(query.get('all') == '1', filters))
+        if path == '/networks':
+            return self.send(200, b'[]')
+        if parts[0] == 'images':
+            return self.error(404, 'no such image')
+        if parts[0] == 'containers' and len(parts) >= 2:
+            container = self.state.find(parts[1])
+            if container is None:
+                return self.error(404, f"No such container: {parts[1]}")
+            if method == 'GET' and parts[2:] == ['json']:
+                return self.send(200, json.dumps({'Id': container['Id'], 'State': {
+                    'Status': container['State'], 'Running': container['State'] == 'running'}}).encode())
+            if method == 'POST' and parts[2:] in (['start'], ['stop']):
+                changed = self.state.set_state(container, 'running' if parts[2] == 'start' else 'exited')
+                return self.send(204 if changed else 304)
+            if method == 'DELETE':
+                with self.state.lock:
+                    self.state.containers.pop(container['Id'], None)
+                return self.send(204)
+        self.error(404, f"page not found: {method} {path}")
+
+    def events(self):
+        # Chunked stream of JSON lines, fed by start/stop calls
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pending = []
+        with self.state.lock:
+            self.state.subscribers.append(pending)
+        try:
+            while True:
+                while pending:
+                    line = json.dumps(pending.pop(0)).encode() + b'\n'
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+        finally:
+            with self.state.lock:
+                self.state.subscribers.remove(pending)
+
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+    def do_DELETE(self):
+        self.route('DELETE')
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-reply (a closed events stream, a dropped pooled connection) are normal
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+# --- nodogsplash control socket ---
+NDS_STATES = {'auth': 'Authenticated', 'deauth': 'Preauthenticated', 'trust': 'Trusted',
+              'untrust': 'Authenticated', 'block': 'Blocked', 'unblock': 'Preauthenticated'}
+
+
+class NdsctlHandler(socketserver.StreamRequestHandler):
+    """One request per connection, terminated by a blank line, like ndsctl's own socket."""
+
+    clients = None
+    lock = threading.Lock()
+
+    def handle(self):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            data = self.request.recv(4096)
+            if not data:
+                return
+            request += data
+        latency, rate, mode = behaviour('ndsctl')
+        time.sleep(latency)
+        if random.random() < rate:
+            if mode == 'hang':
+                time.sleep(HANG_SECONDS)
+            return  # Closed without a reply
+        words = request.decode().split()
+        with self.lock:
+            if words == ['json']:
+                reply = json.dumps({'client_length': len(self.clients), 'clients': self.clients})
+            elif len(words) == 2 and words[0] in NDS_STATES and words[1] in self.clients:
+                self.clients[words[1]]['state'] = NDS_STATES[words[0]]
+                reply = 'Yes'
+            else:
+                reply = 'No'
+        self.wfile.write(reply.encode())
+
+
+# --- NetworkManager on a private D-Bus ---
+# jeepney is imported where it's used: the command wrappers run this file without site-packages
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_PATH = '/org/freedesktop/NetworkManager'
+NM_IFACE = 'org.freedesktop.NetworkManager'
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+SETTINGS_IFACE = 'org.freedesktop.NetworkManager.Settings'
+CONNECTION_IFACE = 'org.freedesktop.NetworkManager.Settings.Connection'
+ACTIVE_IFACE = 'org.freedesktop.NetworkManager.Connection.Active'
+DEVICE_IFACE = 'org.freedesktop.NetworkManager.Device'
+PROPERTIES_IFACE = 'org.freedesktop.DBus.Properties'
+
+# The same device as the fake nmcli: profile name -> (type, interface)
+NM_PROFILES = {'Wired connection 1': ('802-3-ethernet', 'eth0'), 'PIONEER_SETUP': ('802-11-wireless', 'wlan0')}
+NM_DEVICE_TYPES = {'ethernet': 1, 'wifi': 2, 'loopback': 32}
+NM_ACTIVATED, NM_DEACTIVATED = 2, 4
+NM_DEVICE_ACTIVATED, NM_DEVICE_DISCONNECTED = 100, 30
+
+BUS_CONFIG = """<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>custom</type>
+  <listen>unix:path={socket}</listen>
+  <auth>EXTERNAL</auth>
+  <policy context="default">
+    <allow own="*"/>
+    <allow send_destination="*"/>
+    <allow receive_sender="*"/>
+  </policy>
+</busconfig>
+"""
+
+
+def start_bus(directory):
+    """Runs a private dbus-daemon with its socket in `directory`; returns (process, address)."""
+    config = os.path.join(directory, 'bus.conf')
+    with open(config, 'w') as f:
+        f.write(BUS_CONFIG.format(socket=os.path.join(directory, 'bus.sock')))
+    with open(os.path.join(directory, 'bus.log'), 'w') as log:
+        proc = subprocess.Popen(['dbus-daemon', '--nofork', f"--config-file={config}", '--print-address=1'],
+                                stdout=subprocess.PIPE, stderr=log, text=True)
+    address = proc.stdout.readline().strip()
+    if not address:
+        proc.wait()
+        raise RuntimeError("dbus-daemon did not start")
+    return proc, address
+
+
+def wait_for_name(address, name=NM_BUS, timeout=10):
+    """Blocks until `name` has an owner on the bus at `address`."""
+    from jeepney.bus_messages import message_bus
+    from jeepney.io.blocking import open_dbus_connection
+    deadline = time.time() + timeout
+    with open_dbus_connection(bus=address) as connection:
+        while not connection.send_and_get_reply(message_bus.NameHasOwner(name)).body[0]:
+            if time.time() > deadline:
+                raise RuntimeError(f"{name} did not appear on {address}")
+            time.sleep(0.05)
+
+
+class FakeNetworkManager:
+    """Profiles, active connections and devices behind NetworkManager's D-Bus API.
+
+    Covers what nm.DBusNetworkManager uses: listing and reading profiles,
+    AddConnection, Update, (De)ActivateConnection and GetAll on the manager,
+    active connections and devices, with the signals NM sends when they change.
+    """
+
+    def __init__(self, connection, profiles=NM_PROFILES, active=None, devices=None):
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.profiles = {}  # path -> settings, as a{sa{sv}}
+        self.active = {}    # path -> {'Id', 'State', 'Connection'}
+        self.devices = {}   # path -> {'Interface', 'DeviceType', 'State'}
+        self._ids = iter(range(1, 1 << 30))
+        self._signals = []
+        for iface, kind in devices or NMCLI_DEVICES:
+            self.devices[f"{NM_PATH}/Devices/{next(self._ids)}"] = {
+                'Interface': iface, 'DeviceType': NM_DEVICE_TYPES.get(kind, 0), 'State': NM_DEVICE_DISCONNECTED}
+        for name, (kind, iface) in profiles.items():
+            self.add_profile({'connection': {'id': ('s', name), 'type': ('s', kind),
+                                             'interface-name': ('s', iface)}})
+        if active is None:
+            active = [name for name, up in NMCLI_CONNECTIONS if up == 'yes' and name in profiles]
+        for name in active:
+            self.activate(self.profile_path(name))
+        self._signals.clear()
+
+    @classmethod
+    def connect(cls, address, **kwargs):
+        """Owns NetworkManager's bus name on `address`; call serve_forever() to answer."""
+        from jeepney.bus_messages import message_bus
+        from jeepney.io.blocking import open_dbus_connection
+        connection = open_dbus_connection(bus=address)
+        connection.send_and_get_reply(message_bus.RequestName(NM_BUS))
+        return cls(connection, **kwargs)
+
+    # --- State ---
+    def profile_path(self, name):
+        return next((path for path, settings in self.profiles.items()
+                     if settings['connection']['id'][1] == name), None)
+
+    def add_profile(self, settings):
+        path = f"{SETTINGS_PATH}/{next(self._ids)}"
+        settings['connection'].setdefault('uuid', ('s', str(uuid.uuid4())))
+        self.profiles[path] = settings
+        self._signal(SETTINGS_PATH, SETTINGS_IFACE, 'NewConnection', 'o', (path,))
+        return path
+
+    def _device(self, settings):
+        iface = settings['connection'].get('interface-name', ('s', ''))[1]
+        return next((dev for dev in self.devices.values() if dev['Interface'] == iface), None)
+
+    def activate(self, profile):
+        settings = self.profiles[profile]
+        name = settings['connection']['id'][1]
+        # Re-activating a profile replaces its active connection, as NM does
+        for path in [p for p, conn in self.active.items() if conn['Id'] == name]:
+            self.deactivate(path)
+        path = f"{NM_PATH}/ActiveConnection/{next(self._ids)}"
+        self.active[path] = {'Id': name, 'State': NM_ACTIVATED, 'Connection': profile}
+        device = self._device(settings)
+        if device:
+            device['State'] = NM_DEVICE_ACTIVATED
+        self._signal(path, ACTIVE_IFACE, 'StateChanged', 'uu', (NM_ACTIVATED, 0))
+        self._signal(NM_PATH, PROPERTIES_IFACE, 'PropertiesChanged', 'sa{sv}as',
+                     (NM_IFACE, {'ActiveConnections': ('ao', list(self.active))}, []))
+        return path
+
+    def deactivate(self, path):
+        conn = self.active.pop(path)
+        device = self._device(self.profiles[conn['Connection']])
+        if device:
+            device['State'] = NM_DEVICE_DISCONNECTED
+        self._signal(path, ACTIVE_IFACE, 'StateChanged', 'uu', (NM_DEACTIVATED, 0))
+        self._signal(NM_PATH, PROPERTIES_IFACE, 'PropertiesChanged', 'sa{sv}as',
+                     (NM_IFACE, {'ActiveConnections': ('ao', list(self.active))}, []))
+
+    def properties(self, path, interface):
+        if path == NM_PATH and interface == NM_IFACE:
+            return {'ActiveConnections': ('ao', list(self.active)), 'Devices': ('ao', list(self.devices))}
+        if path in self.active and interface == ACTIVE_IFACE:
+            conn = self.active[path]
+            return {'Id': ('s', conn['Id']), 'State': ('u', conn['State']), 'Connection': ('o', conn['Connection'])}
+        if path in self.devices and interface == DEVICE_IFACE:
+            dev = self.devices[path]
+            return {'Interface': ('s', dev['Interface']), 'DeviceType': ('u', dev['DeviceType']),
+                    'State': ('u', dev['State'])}
+        return None
+
+    # --- D-Bus ---
+    def _signal(self, path, interface, member, signature, body):
+        self._signals.append((path, interface, member, signature, body))
+
+    def call(self, path, interface, member, body):
+        """(signature, body) of the reply; raises KeyError for unknown objects or methods."""
+        if interface == PROPERTIES_IFACE and member == 'GetAll':
+            props = self.properties(path, body[0])
+            if props is None:
+                raise KeyError(f"no interface {body[0]} on {path}")
+            return 'a{sv}', (props,)
+        if path == SETTINGS_PATH and member == 'ListConnections':
+            return 'ao', (list(self.profiles),)
+        if path == SETTINGS_PATH and member == 'AddConnection':
+            return 'o', (self.add_profile(body[0]),)
+        if path == NM_PATH and member == 'GetDevices':
+            return 'ao', (list(self.devices),)
+        if path == NM_PATH and member == 'ActivateConnection':
+            return 'o', (self.activate(body[0]),)
+        if path == NM_PATH and member == 'DeactivateConnection':
+            self.deactivate(body[0])
+            return None, ()
+        if path in self.profiles and member == 'GetSettings':
+            return 'a{sa{sv}}', (self.profiles[path],)
+        if path in self.profiles and member == 'Update':
+            body[0]['connection']['uuid'] = self.profiles[path]['connection']['uuid']
+            self.profiles[path] = body[0]
+            self._signal(path, CONNECTION_IFACE, 'Updated', None, ())
+            return None, ()
+        raise KeyError(f"{interface}.{member} on {path}")
+
+    def handle(self, msg):
+        from jeepney import DBusAddress, HeaderFields, new_error, new_method_return, new_signal
+        fields = msg.header.fields
+        path, member = fields.get(HeaderFields.path), fields.get(HeaderFields.member)
+        interface = fields.get(HeaderFields.interface)
+        latency, rate, mode = behaviour('networkmanager')
+        time.sleep(latency)
+        if random.random() < rate:
+            if mode == 'hang':
+                return  # No reply: the caller times out
+            self.connection.send(new_error(msg, 'org.freedesktop.NetworkManager.Failed', 's',
+                                           ('simulated failure',)))
+            return
+        with self.lock:
+            try:
+                signature, body = self.call(path, interface, member, msg.body)
+                reply = new_method_return(msg, signature, body)
+            except KeyError as e:
+                reply = new_error(msg, 'org.freedesktop.DBus.Error.UnknownMethod', 's', (str(e),))
+            signals, self._signals = self._signals, []
+        self.connection.send(reply)
+        for path, interface, member, signature, body in signals:
+            self.connection.send(new_signal(DBusAddress(path, interface=interface), member, signature, body))
+
+    def serve_forever(self):
+        from jeepney import MessageType
+        try:
+            while True:
+                msg = self.connection.receive()
+                if msg.header.message_type == MessageType.method_call:
+                    self.handle(msg)
+        except (OSError, EOFError):
+            pass  # Bus gone or close() called
+        finally:
+            self.connection.close()
+
+    def close(self):
+        """Stops serve_forever(); the socket is shut down so its blocking receive returns."""
+        try:
+            self.connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def serve_ndsctl(socket_path, clients_file):
+    with open(clients_file, 'r') as f:
+        NdsctlHandler.clients = json.load(f)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    UnixServer(socket_path, NdsctlHandler).serve_forever()
+
+
+def serve_docker(socket_path, containers_file):
+    with open(containers_file, 'r') as f:
+        DockerHandler.state = DockerState(json.load(f))
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    UnixServer(socket_path, DockerHandler).serve_forever()
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == 'exec':
+        return run_command(argv[1], argv[2:])
+    if len(argv) == 3 and argv[0] in ('docker', 'ndsctl'):
+        (serve_docker if argv[0] == 'docker' else serve_ndsctl)(argv[1], argv[2])
+        return 0
+    if len(argv) == 2 and argv[0] == 'networkmanager':
+        FakeNetworkManager.connect(argv[1]).serve_forever()
+        return 0
+    print(__doc__, file=sys.stderr)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,146 @@
+"""Scale fixtures: what a busy device looks like to the dashboard.
+
+Everything is written under one scratch directory; the harness points the
+dashboard at it through the PIONEER_* path overrides.
+"""
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+COMPOSE_PROJECT_LABEL = 'com.docker.compose.project'
+COMPOSE_SERVICE_LABEL = 'com.docker.compose.service'
+COMPOSE_DEPENDS_LABEL = 'com.docker.compose.depends_on'
+APP_LABEL = 'io.pioneer.app'
+
+DEFAULTS = {'leases': 5000, 'reservations': 2000, 'records': 500, 'apps': 50, 'processes': 500,
+            'portal_clients': 500}
+
+
+def mac(n, prefix=0x02):
+    return ':'.join(f"{b:02x}" for b in (prefix, 0, (n >> 24) & 0xff, (n >> 16) & 0xff, (n >> 8) & 0xff, n & 0xff))
+
+
+def ip(n, net='10.42'):
+    n += 1  # Skip the network address
+    return f"{net}.{(n >> 8) & 0xff}.{n & 0xff}"
+
+
+def write_leases(path, count, now=None):
+    """dnsmasq lease file; about one in ten leases already expired."""
+    now = int(now or time.time())
+    rng = random.Random(1)
+    with open(path, 'w') as f:
+        for n in range(count):
+            expiry = now + rng.randint(-3600, -1) if n % 10 == 9 else now + rng.randint(60, 86400)
+            hostname = f"host-{n}" if n % 4 else '*'
+            f.write(f"{expiry} {mac(n)} {ip(n)} {hostname} 01:{mac(n)}\n")
+
+
+def write_dnsmasq_conf(config_dir, reservations, records):
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, 'pioneer-dhcp.conf'), 'w') as f:
+        for n in range(reservations):
+            f.write(f"dhcp-host={mac(n, 0x06)},{ip(n, '10.43')},fixed-{n}\n")
+    with open(os.path.join(config_dir, 'pioneer-dns.conf'), 'w') as f:
+        for n in range(records):
+            f.write(f"host-record=svc-{n}.lan,{ip(n, '10.43')}\n")
+
+
+def write_apps(modules_dir, apps_dir, count):
+    """App manifests plus the containers the fake Docker daemon reports for them.
+
+    Every app has a web container, every other one a database it depends on;
+    two thirds are installed and half of those running. Returns the containers.
+    """
+    os.makedirs(modules_dir, exist_ok=True)
+    containers = []
+    for n in range(count):
+        app_id = f"app{n:02d}"
+        compose_dir = os.path.join(apps_dir, app_id)
+        with open(os.path.join(modules_dir, f"{app_id}.json"), 'w') as f:
+            json.dump({
+                'name': f"App {n}",
+                'description': f"Benchmark fixture app {n}",
+                'port': 8000 + n,
+                'url': f"http://{{hostname}}:{8000 + n}",
+                'compose_dir': compose_dir,
+                'images': [f"example/{app_id}:latest"] + ([f"mariadb:10.{n % 10}"] if n % 2 else []),
+                'order': n,
+            }, f)
+        if n % 3 == 2:
+            continue  # Not installed
+        os.makedirs(compose_dir, exist_ok=True)
+        state = 'running' if n % 2 == 0 else 'exited'
+        services = ['web', 'db'] if n % 2 else ['web']
+        for service in services:
+            labels = {COMPOSE_PROJECT_LABEL: app_id, COMPOSE_SERVICE_LABEL: service, APP_LABEL: app_id}
+            if service == 'web' and 'db' in services:
+                labels[COMPOSE_DEPENDS_LABEL] = 'db:service_started:false'
+            containers.append({
+                'Id': f"{n:04x}{service}".ljust(64, '0'),
+                'Names': [f"/{app_id}-{service}-1"],
+                'Image': f"example/{app_id}:latest",
+                'State': state,
+                'Status': 'Up 2 hours' if state == 'running' else 'Exited (0) 2 hours ago',
+                'Labels': labels,
+            })
+    return containers
+
+
+def portal_clients(count, now=None):
+    """nodogsplash clients (ndsctl json entries) for the first `count` leases; a quarter still on the splash page."""
+    now = int(now or time.time())
+    rng = random.Random(2)
+    clients = {}
+    for n in range(count):
+        added = now - rng.randint(60, 7200)
+        clients[mac(n)] = {
+            'id': n + 1, 'ip': ip(n), 'mac': mac(n), 'added': added, 'active': now - rng.randint(0, 60),
+            'duration': now - added, 'token': f"{n:08x}",
+            'state': 'Preauthenticated' if n % 4 == 3 else 'Authenticated',
+            'downloaded': rng.randint(0, 500000), 'avg_down_speed': round(rng.uniform(0, 800), 2),
+            'uploaded': rng.randint(0, 50000), 'avg_up_speed': round(rng.uniform(0, 80), 2),
+        }
+    return clients
+
+
+def write_nodogsplash_conf(path, max_clients):
+    with open(path, 'w') as f:
+        f.write(f"GatewayInterface wlan0\nMaxClients {max_clients}\nAuthIdleTimeout 480\nPreauthIdleTimeout 10\n")
+
+
+class ProcessTable:
+    """Idle child processes so process-table scans see a realistic count.
+
+    A few of them look like `salt-call state.apply modules.<app>` runs, so
+    the install detection has matches to find.
+    """
+
+    def __init__(self, count, installing=()):
+        self.count = count
+        self.installing = list(installing)
+        self.procs = []
+
+    def start(self):
+        for app_id in self.installing:
+            # argv[0] is what the process index matches on; the body just sleeps
+            self.procs.append(subprocess.Popen(
+                ['salt-call', '-c', 'import time; time.sleep(86400)', 'state.apply', f"modules.{app_id}"],
+                executable=sys.executable, stdin=subprocess.DEVNULL))
+        for _ in range(max(0, self.count - len(self.installing))):
+            self.procs.append(subprocess.Popen(['sleep', '86400'], stdin=subprocess.DEVNULL))
+        return self
+
+    def stop(self):
+        for proc in self.procs:
+            try:
+                proc.send_signal(signal.SIGTERM)
+            except OSError:
+                pass
+        for proc in self.procs:
+            proc.wait()
+        self.procs = []
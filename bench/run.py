@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Route benchmarks for the dashboard against fake system backends.
+
+Builds a scratch device (lease file, dnsmasq.d, app manifests, containers,
+portal clients and a process table at the sizes below), puts fake nmcli/ping/
+dnsmasq/systemctl/salt-call first on PATH, serves the Docker API and
+nodogsplash's control socket from fake daemons and NetworkManager on a
+private D-Bus (the fake nmcli with --nmcli, or without dbus-daemon or
+jeepney), and runs the real app in-process on a threaded server. N
+logged-in sessions then hit each route concurrently; latency percentiles
+and throughput are reported per route.
+
+    bench/run.py                                  default scale, no backend latency
+    bench/run.py --latency nmcli=0.3,docker=0.01  slow backends
+    bench/run.py --fail docker=0.1 --fail ping=0.5:hang
+    bench/run.py --save base.json                 record a baseline
+    bench/run.py --compare base.json              exit 1 if a route's p95 regressed
+
+See fakes.py for the latency/failure spec format.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts'))
+
+import fakes  # noqa: E402
+import fixtures  # noqa: E402
+from loadtest import Session, percentile  # noqa: E402
+
+PASSWORD = 'bench'
+
+
+def dhcp_action(session, iteration):
+    # Add on even iterations, remove on odd: the reservation count stays at fixture size
+    mac = fixtures.mac(0x100000 + session, 0x0a)
+    if iteration % 2 == 0:
+        return {'command': 'add_dhcp_reservation',
+                'data': {'mac': mac, 'ip': fixtures.ip(session, '10.44'), 'hostname': f"bench-{session}"}}
+    return {'command': 'del_dhcp_reservation', 'data': {'mac': mac}}
+
+
+def app_action(session, iteration, apps):
+    # Apps numbered 0 mod 6 are installed and running in the fixtures
+    running = list(range(0, apps, 6)) or [0]
+    app_id = f"app{running[session % len(running)]:02d}"
+    return {'command': 'stop_app' if iteration % 2 == 0 else 'start_app', 'target': app_id}
+
+
+def portal_action(session, iteration, clients):
+    # Re-authenticates a 20-client slice: one bulk call, the portal's state stays the same
+    start = (session * 20) % max(1, clients)
+    macs = [fixtures.mac(n) for n in range(start, min(start + 20, clients))]
+    return {'command': 'portal_clients', 'data': {'op': 'auth', 'macs': macs}}
+
+
+# name -> (method, path, body(session, iteration, args) or None)
+ROUTES = {
+    'index': ('GET', '/', None),
+    'apps': ('GET', '/apps', None),
+    'network': ('GET', '/network', None),
+    'status': ('GET', '/api/status', None),
+    'leases': ('GET', '/api/leases?q=host-12&state=all', None),
+    'reservations': ('GET', '/api/dhcp/reservations?q=fixed-1&page=2', None),
+    'records': ('GET', '/api/dns/records?page=3', None),
+    'action:dhcp': ('POST', '/api/action', lambda s, i, args: dhcp_action(s, i)),
+    'action:app': ('POST', '/api/action', lambda s, i, args: app_action(s, i, args.apps)),
+    'portal': ('GET', '/api/portal/clients?state=authenticated&page=2', None),
+    'action:portal': ('POST', '/api/action', lambda s, i, args: portal_action(s, i, args.portal_clients)),
+}
+
+
+class Device:
+    """Scratch directory with fixtures, fake commands and the fake Docker/nodogsplash/NM daemons."""
+
+    def __init__(self, args):
+        self.args = args
+        self.root = tempfile.mkdtemp(prefix='pioneer-bench-')
+        self.daemons = []
+        self.bus = None
+        self.processes = None
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def setup(self):
+        args = self.args
+        started = time.perf_counter()
+        fixtures.write_leases(self.path('dnsmasq.leases'), args.leases)
+        fixtures.write_dnsmasq_conf(self.path('dnsmasq.d'), args.reservations, args.records)
+        containers = fixtures.write_apps(self.path('modules'), self.path('apps'), args.apps)
+        with open(self.path('containers.json'), 'w') as f:
+            json.dump(containers, f)
+        with open(self.path('portal.json'), 'w') as f:
+            json.dump(fixtures.portal_clients(args.portal_clients), f)
+        fixtures.write_nodogsplash_conf(self.path('nodogsplash.conf'), max(50, args.portal_clients))
+        with open(self.path('config.json'), 'w') as f:
+            json.dump({'admin_password': PASSWORD, 'secret_key': 'bench'}, f)
+
+        os.environ.update({
+            'PATH': fakes.install_commands(self.path('bin')),
+            'PIONEER_DOCKER_SOCKET': self.path('docker.sock'),
+            'PIONEER_LEASE_FILE': self.path('dnsmasq.leases'),
+            'PIONEER_DNSMASQ_DIR': self.path('dnsmasq.d'),
+            'PIONEER_MODULES_DIR': self.path('modules'),
+            'PIONEER_JOB_LOG_DIR': self.path('jobs'),
+            'PIONEER_IMAGE_CACHE': self.path('images'),
+            'PIONEER_CONFIG': self.path('config.json'),
+            'PIONEER_LOG_FILE': self.path('dashboard.log'),
+            'PIONEER_SESSION_FILE': self.path('sessions.json'),
+            'PIONEER_NDSCTL_SOCKET': self.path('ndsctl.sock'),
+            'PIONEER_NDS_CONF': self.path('nodogsplash.conf'),
+            'PIONEER_FAKE_LATENCY': args.latency,
+            'PIONEER_FAKE_FAIL': ','.join(args.fail),
+            'DBUS_SYSTEM_BUS_ADDRESS': self.start_networkmanager(),
+        })
+        for name, fixture in (('docker', 'containers.json'), ('ndsctl', 'portal.json')):
+            self.daemons.append(subprocess.Popen([sys.executable, fakes.__file__, name,
+                                                  self.path(f"{name}.sock"), self.path(fixture)]))
+        deadline = time.time() + 10
+        while not all(os.path.exists(self.path(f"{name}.sock")) for name in ('docker', 'ndsctl')):
+            if time.time() > deadline or any(d.poll() is not None for d in self.daemons):
+                raise RuntimeError("fake daemons did not start")
+            time.sleep(0.05)
+        installing = [f"app{n:02d}" for n in range(1, min(args.apps, 4), 3)]
+        self.processes = fixtures.ProcessTable(args.processes, installing).start()
+        return time.perf_counter() - started
+
+    @property
+    def networkmanager(self):
+        return 'D-Bus' if self.bus else 'nmcli'
+
+    def start_networkmanager(self):
+        """System bus address for the app: a private bus with the fake NetworkManager on it,
+        or a missing socket so the app falls back to the fake nmcli."""
+        if self.args.nmcli or not shutil.which('dbus-daemon') or not importlib.util.find_spec('jeepney'):
+            return f"unix:path={self.path('no-bus')}"
+        self.bus, address = fakes.start_bus(self.root)
+        self.daemons.append(subprocess.Popen([sys.executable, fakes.__file__, 'networkmanager', address]))
+        fakes.wait_for_name(address)
+        return address
+
+    def teardown(self):
+        if self.processes:
+            self.processes.stop()
+        for daemon in self.daemons + ([self.bus] if self.bus else []):
+            daemon.terminate()
+            daemon.wait()
+        if self.args.keep:
+            print(f"fixtures kept in {self.root}")
+        else:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+def start_app(device):
+    """Imports the dashboard against the fixtures and serves it on a free local port."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'dashboard'))
+    started = time.perf_counter()
+    import app as dashboard
+    imported = time.perf_counter() - started
+    # First full app listing, so the first measured requests don't pay for it
+    dashboard.collector.refresh('apps', wait=True)
+    server = make_server('127.0.0.1', 0, dashboard.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, imported
+
+
+def stop_app(server):
+    server.shutdown()
+    # Drop the app's bus connection before the fake bus goes away
+    dashboard = sys.modules['app']
+    if dashboard.network_manager.resolved:
+        dashboard.network_manager.close()
+
+
+def run(args, url, routes, admin):
+    results = {name: [] for name in routes}
+    errors = {name: [] for name in routes}
+    lock = threading.Lock()
+    start_gate = threading.Barrier(args.sessions + 1)
+    headers = {'Accept-Encoding': 'gzip'}
+
+    def request(session, index, iteration, name):
+        method, path, body = ROUTES[name]
+        payload = json.dumps(body(index, iteration, args)) if body else None
+        req_headers = dict(headers, **({'Content-Type': 'application/json'} if payload else {}))
+        return session.request(method, path, payload, req_headers)
+
+    def worker(index):
+        session = Session(url, '', args.timeout)
+        try:
+            session.login(PASSWORD)
+            for iteration in range(args.warmup):
+                for name in routes:
+                    request(session, index, iteration, name)
+        finally:
+            start_gate.wait()
+        for iteration in range(args.warmup, args.warmup + args.requests):
+            for name in routes:
+                started = time.perf_counter()
+                try:
+                    status, _ = request(session, index, iteration, name)
+                except Exception as e:
+                    with lock:
+                        errors[name].append(str(e))
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if status in (200, 304):
+                        results[name].append(elapsed)
+                    else:
+                        errors[name].append(f"HTTP {status}")
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.sessions)]
+    for t in threads:
+        t.start()
+    # Sessions are parked at the gate after warm-up: profile only the measured part
+    admin.request('DELETE', '/api/profile')
+    start_gate.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    return results, errors, time.perf_counter() - started
+
+
+def summarize(results, errors, wall):
+    routes = {}
+    for name, values in results.items():
+        row = {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+        row.update({'max': max(values, default=None), 'n': len(values), 'errors': len(errors[name]),
+                    'rps': len(values) / wall if wall else 0})
+        routes[name] = row
+    total = sum(len(v) for v in results.values())
+    return {'wall': wall, 'requests': total, 'rps': total / wall if wall else 0, 'routes': routes}
+
+
+def report(summary, baseline=None):
+    def ms(value):
+        return f"{value * 1000:>8.1f}" if value is not None else f"{'-':>8}"
+
+    print(f"{'route':<14} {'n':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'req/s':>7}"
+          + (f" {'base p95':>9}" if baseline else ''))
+    for name, row in summary['routes'].items():
+        line = (f"{name:<14} {row['n']:>5} {row['errors']:>4} {ms(row['p50'])} {ms(row['p95'])} "
+                f"{ms(row['p99'])} {ms(row['max'])} {row['rps']:>7.1f}")
+        base = (baseline or {}).get('routes', {}).get(name)
+        if base:
+            line += f" {ms(base['p95'])}"
+        print(line)
+    print(f"{summary['requests']} requests in {summary['wall']:.2f}s ({summary['rps']:.1f} req/s)")
+
+
+def report_commands(commands, top=8):
+    """External commands by total time spent, from the app's own /api/profile."""
+    if not commands:
+        return
+    print(f"\n{'command':<24} {'n':>5} {'err':>4} {'total ms':>9} {'p95 ms':>8} {'max ms':>8}")
+    for row in commands[:top]:
+        print(f"{row['command']:<24} {row['count']:>5} {row['errors']:>4} {row['total_ms']:>9.0f} "
+              f"{row['p95_ms'] or 0:>8.0f} {row['max_ms']:>8.1f}")
+
+
+def regressions(summary, baseline, tolerance):
+    """Routes whose p95 grew by more than `tolerance` (a ratio) over the baseline."""
+    slower = []
+    for name, row in summary['routes'].items():
+        base = baseline.get('routes', {}).get(name)
+        if base and base['p95'] and row['p95'] and row['p95'] > base['p95'] * tolerance:
+            slower.append((name, base['p95'], row['p95']))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('routes', nargs='*', metavar='ROUTE', help=f"routes to run (default: all of {', '.join(ROUTES)})")
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=20, help="iterations over the routes per session")
+    parser.add_argument('--warmup', type=int, default=2, help="unmeasured iterations per session first")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--latency', default='0', help="backend latency spec, e.g. nmcli=0.3,*=0.01")
+    parser.add_argument('--fail', action='append', default=[], help="backend failure spec, e.g. docker=0.1:hang")
+    parser.add_argument('--nmcli', action='store_true', help="NetworkManager through the fake nmcli, not D-Bus")
+    for name, default in fixtures.DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, help=f"fixture size (default {default})")
+    parser.add_argument('--save', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="baseline JSON from --save to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="allowed p95 ratio over the baseline")
+    parser.add_argument('--keep', action='store_true', help="keep the fixture directory")
+    args = parser.parse_args()
+    routes = args.routes or list(ROUTES)
+    unknown = [name for name in routes if name not in ROUTES]
+    if unknown:
+        parser.error(f"unknown route: {', '.join(unknown)}")
+
+    device = Device(args)
+    try:
+        setup = device.setup()
+        server, imported = start_app(device)
+        print(f"fixtures: {args.leases} leases, {args.reservations} reservations, {args.records} DNS records, "
+              f"{args.apps} apps, {args.processes} processes, {args.portal_clients} portal clients "
+              f"({setup:.1f}s); app import {imported:.2f}s")
+        print(f"backends: latency {args.latency or '0'}, failures {','.join(args.fail) or 'none'}, "
+              f"NetworkManager over {device.networkmanager}; "
+              f"{args.sessions} sessions x {args.requests} iterations\n")
+        url = f"http://127.0.0.1:{server.server_port}"
+        admin = Session(url, '', args.timeout)
+        admin.login(PASSWORD)
+        results, errors, wall = run(args, url, routes, admin)
+        _, body = admin.request('GET', '/api/profile')
+        commands = json.loads(body)['commands']
+        stop_app(server)
+    finally:
+        device.teardown()
+
+    summary = summarize(results, errors, wall)
+    summary['commands'] = commands
+    summary['config'] = {k: v for k, v in vars(args).items() if k not in ('save', 'compare', 'keep')}
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    report(summary, baseline)
+    report_commands(commands)
+    for name, messages in errors.items():
+        for message in sorted(set(messages))[:3]:
+            print(f"error: {name}: {message}", file=sys.stderr)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if baseline:
+        slower = regressions(summary, baseline, args.tolerance)
+        for name, before, after in slower:
+            print(f"REGRESSION {name}: p95 {before * 1000:.1f} ms -> {after * 1000:.1f} ms", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
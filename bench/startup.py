@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Start-up benchmark: import time and time to first response of the dashboard.
+
+Uses the same scratch device and fake backends as run.py. Each run binds the
+listening socket first and hands it to a fresh server process, as systemd
+socket activation does at boot, then sends a request straight away; the
+connection waits in the socket's backlog until the app can answer it, the
+way nginx's first /admin/ request after boot does. Per run it measures:
+
+  import         importing app.py in the server process
+  first          spawn -> first response (GET /login)
+  login          spawn -> logged-in index page (includes the password hash)
+  warm           spawn -> warm-up finished and every probe has a value
+
+Medians over the runs are reported, with the biggest imports from one
+`python -X importtime` run. Track it on the device itself (Pi 3B class):
+
+    bench/startup.py                       gunicorn if installed, else werkzeug
+    bench/startup.py --server gunicorn --runs 10 --save pi3b.json
+    bench/startup.py --compare pi3b.json   exit 1 if a median regressed
+"""
+import argparse
+import importlib.util
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+DASHBOARD_DIR = os.path.join(ROOT_DIR, 'dashboard')
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts'))
+
+import fixtures  # noqa: E402
+from loadtest import Session  # noqa: E402
+from run import PASSWORD, Device  # noqa: E402
+
+METRICS = ('import', 'first', 'login', 'warm')
+LISTEN_FD = 3  # SD_LISTEN_FDS_START
+
+
+def serve(socket_path):
+    """Server process for --server werkzeug: app on the inherited listening socket."""
+    started = time.perf_counter()
+    sys.path.insert(0, DASHBOARD_DIR)
+    import app as dashboard
+    imported = time.perf_counter() - started
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(f"unix://{socket_path}", 0, dashboard.app, threaded=True,
+                         request_handler=QuietHandler, fd=LISTEN_FD)
+    print(json.dumps({'import': imported}), flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.serve_forever()
+
+
+def spawn(kind, socket_path, listener):
+    """Starts a server on `listener` with systemd's LISTEN_FDS protocol."""
+    env = dict(os.environ, LISTEN_FDS='1')
+    if kind == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app']
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), 'serve', socket_path]
+    # LISTEN_PID must be the server's own PID: a shell that execs it keeps its PID
+    shell = 'LISTEN_PID=$$ exec "$@"'
+
+    def move_listener():
+        os.dup2(listener.fileno(), LISTEN_FD)
+
+    return subprocess.Popen(['/bin/sh', '-c', shell, 'sh'] + cmd, cwd=DASHBOARD_DIR, env=env,
+                            stdout=subprocess.PIPE, text=True, preexec_fn=move_listener,
+                            pass_fds=(LISTEN_FD,))
+
+
+def cold_start(kind, device, timeout):
+    socket_path = device.path('dashboard.sock')
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+    url = f"unix:{socket_path}"
+    result = dict.fromkeys(METRICS)
+    started = time.perf_counter()
+    proc = spawn(kind, socket_path, listener)
+    listener.close()
+    try:
+        session = Session(url, '', timeout)
+        status, _ = session.request('GET', '/login')
+        result['first'] = time.perf_counter() - started
+        session.login(PASSWORD)
+        status, _ = session.request('GET', '/')
+        if status != 200:
+            raise RuntimeError(f"index returned HTTP {status}")
+        result['login'] = time.perf_counter() - started
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            _, body = session.request('GET', '/api/status')
+            data = json.loads(body)
+            probes = [v for k, v in data.items() if isinstance(v, dict) and 'updated' in v]
+            if data['warmup']['finished'] and all(p['updated'] or p['error'] for p in probes):
+                result['warm'] = time.perf_counter() - started
+                break
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        try:
+            out, _ = proc.communicate(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            out, _ = proc.communicate()
+    for line in (out or '').splitlines():
+        if line.startswith('{'):
+            result['import'] = json.loads(line)['import']
+    return result
+
+
+def import_profile(top=10):
+    """Total import time of app.py, and the modules its own modules pull in, costliest first."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=DASHBOARD_DIR,
+                          env=dict(os.environ, PIONEER_WARMUP_DELAY='3600'),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    local = {name[:-3] for name in os.listdir(DASHBOARD_DIR) if name.endswith('.py')}
+    entries = []
+    for line in proc.stderr.splitlines():
+        fields = line.split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2][1:]
+        entries.append(((len(name) - len(name.lstrip())) // 2, name.strip(), int(fields[1]) / 1000))
+    # Children are listed before their parent: walk backwards to know each entry's parent
+    total, stack, direct = None, [], []
+    for depth, name, ms in reversed(entries):
+        del stack[depth:]
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        if name == 'app' and depth == 0:
+            total = ms
+        elif parent in local and name not in local:
+            direct.append((name, parent, ms))
+    return total, sorted(direct, key=lambda e: -e[2])[:top]
+
+
+def summarize(runs):
+    return {metric: statistics.median(values) if values else None
+            for metric, values in ((m, [r[m] for r in runs if r[m] is not None]) for m in METRICS)}
+
+
+def report(summary, runs, imports, baseline=None):
+    def ms(value):
+        return f"{value * 1000:>8.0f}" if value is not None else f"{'-':>8}"
+
+    print(f"{'':<8}" + ''.join(f"{m + ' ms':>10}" for m in METRICS))
+    for index, row in enumerate(runs, 1):
+        print(f"{'run ' + str(index):<8}" + ''.join(f"  {ms(row[m])}" for m in METRICS))
+    print(f"{'median':<8}" + ''.join(f"  {ms(summary[m])}" for m in METRICS))
+    if baseline:
+        print(f"{'base':<8}" + ''.join(f"  {ms(baseline['median'].get(m))}" for m in METRICS))
+    total, direct = imports
+    print(f"\nimport app: {total or 0:.0f} ms cumulative (python -X importtime)")
+    for name, parent, cumulative in direct:
+        print(f"  {name:<28} {cumulative:>7.1f} ms  (from {parent})")
+
+
+def regressions(summary, baseline, tolerance):
+    slower = []
+    for metric in METRICS:
+        before, after = baseline['median'].get(metric), summary[metric]
+        if before and after and after > before * tolerance:
+            slower.append((metric, before, after))
+    return slower
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == 'serve':
+        return serve(sys.argv[2])
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'werkzeug'), default='auto')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--warmup-delay', type=float, default=0, help="PIONEER_WARMUP_DELAY for the server")
+    parser.add_argument('--latency', default='0', help="backend latency spec, e.g. nmcli=0.3,*=0.01")
+    parser.add_argument('--fail', action='append', default=[], help="backend failure spec, e.g. docker=0.1:hang")
+    parser.add_argument('--nmcli', action='store_true', help="NetworkManager through the fake nmcli, not D-Bus")
+    for name, default in fixtures.DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, help=f"fixture size (default {default})")
+    parser.add_argument('--save', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="baseline JSON from --save to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="allowed ratio over the baseline medians")
+    parser.add_argument('--keep', action='store_true', help="keep the fixture directory")
+    args = parser.parse_args()
+    kind = args.server
+    if kind == 'auto':
+        kind = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'werkzeug'
+
+    device = Device(args)
+    try:
+        device.setup()
+        os.environ['PIONEER_WARMUP_DELAY'] = str(args.warmup_delay)
+        os.environ['PIONEER_BIND'] = f"unix:{device.path('dashboard.sock')}"
+        imports = import_profile()
+        # The import profile's run also hashes the fixture's plaintext password,
+        # so the timed starts see an already migrated config, as on every boot but the first
+        runs = [cold_start(kind, device, args.timeout) for _ in range(args.runs)]
+    finally:
+        device.teardown()
+
+    summary = summarize(runs)
+    print(f"server: {kind}, {args.runs} cold starts, warm-up delay {args.warmup_delay:g}s, "
+          f"NetworkManager over {device.networkmanager}\n")
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    report(summary, runs, imports, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'median': summary, 'runs': runs, 'server': kind,
+                       'imports': {'total_ms': imports[0], 'modules': imports[1]}}, f, indent=2)
+    if baseline:
+        slower = regressions(summary, baseline, args.tolerance)
+        for metric, before, after in slower:
+            print(f"REGRESSION {metric}: {before * 1000:.0f} ms -> {after * 1000:.0f} ms", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
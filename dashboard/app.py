@@ -1,26 +1,56 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-import subprocess
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, flash, abort
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 import shutil
 import os
 import json
-import psutil
+import queue
 import sys
+import threading
 from werkzeug.middleware.proxy_fix import ProxyFix
+from collector import StatusCollector
+from docker_api import get_client as get_docker, DockerError
+from appstate import AppStateTable, DockerEventWatcher
+from catalog import registry
+from jobs import JobQueue, JobQueueFull
+from leases import lease_tracker
+from connectivity import ConnectivityMonitor
+from interfaces import InterfaceInventory
+from httpcache import HTTPCache, stable_etag
+from logs import setup_logging, get_logger
+from profiling import RequestProfiler, profile
+from auth import Authenticator, AuthError, ConfigFile, SessionStore
+from startup import Lazy, Warmup, lazy_import
+import commands
+from dnsmasq import (BatchError, ConfigTransaction, ConfigError, save_dhcp_reservation,
+                     delete_dhcp_reservation, save_dns_record, delete_dns_record,
+                     reservations as reservation_index, records as record_index)
 
 app = Flask(__name__)
 # Apply ProxyFix to trust X-Forwarded headers (Nginx)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
-
-# Load Config
-CONFIG_FILE = 'config.json'
-def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    return {"admin_password": "pioneer_admin", "secret_key": "default_secret"}
-
-config = load_config()
+# ETag/304 for JSON, compression, and long-lived caching of fingerprinted static files
+HTTPCache(app)
+# Per-route timings with the external commands each request ran (see /api/profile)
+RequestProfiler(app)
+# Structured JSON log, buffered and rotated (PIONEER_LOG_FILE)
+setup_logging()
+log = get_logger('app')
+
+# psutil/jeepney-backed and rarely used subsystems load on first use, not at import
+processes = lazy_import('processes')
+imagecache = lazy_import('imagecache')
+portal = lazy_import('portal')
+metrics = lazy_import('metrics')
+nm = lazy_import('nm')
+
+# Load Config (a plaintext admin_password is replaced with its hash on load).
+# The live file lives outside the code directory; a missing one is seeded from
+# an older install's copy next to app.py, or else from config.example.json.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.environ.get('PIONEER_CONFIG', '/etc/pioneer-dashboard/config.json')
+config = ConfigFile(CONFIG_FILE, {"admin_password": "pioneer_admin", "secret_key": "default_secret"},
+                    template_path=os.path.join(APP_DIR, 'config.example.json'),
+                    legacy_path=os.path.join(APP_DIR, 'config.json'))
 app.secret_key = config['secret_key']
 
 # Login Manager Setup
@@ -28,350 +58,148 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-class User(UserMixin):
-    def __init__(self, id):
-        self.id = id
+# The password hash is only checked at login; requests are validated against the session store
+authenticator = Authenticator(config)
+sessions = SessionStore()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User(user_id)
+    return sessions.get(user_id)
 
 # --- Helpers ---
-def check_internet():
-    try:
-        subprocess.check_call(['ping', '-c', '1', '8.8.8.8'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
-
-def get_hotspot_status():
-    try:
-        # Check if PIONEER_SETUP is active
-        out_name = subprocess.check_output(['nmcli', '-t', '-f', 'NAME,ACTIVE', 'connection', 'show']).decode()
-        if "PIONEER_SETUP:yes" in out_name:
-            return True
-        return False
-    except Exception as e:
-        print(f"Error checking hotspot: {e}", file=sys.stderr)
-        return False
-
-def ensure_hotspot_exists():
-    """Creates the hotspot connection if it doesn't exist."""
-    try:
-        # Check if connection exists (active or not)
-        out = subprocess.check_output(['nmcli', '-t', '-f', 'NAME', 'connection', 'show']).decode()
-        if "PIONEER_SETUP" not in out:
-            print("Creating Hotspot PIONEER_SETUP...", file=sys.stderr)
-            # Try to find a wireless interface
-            iface = "wlan0" # Default fallback
-            try:
-                 # Find first wireless device
-                devs = subprocess.check_output(['nmcli', '-t', '-f', 'DEVICE,TYPE', 'device']).decode().split('\n')
-                for line in devs:
-                    if ':wifi' in line:
-                        iface = line.split(':')[0]
-                        break
-            except:
-                pass
-            
-            subprocess.check_call([
-                'nmcli', 'con', 'add', 'type', 'wifi', 'ifname', iface, 'con-name', 'PIONEER_SETUP',
-                'autoconnect', 'yes', 'ssid', 'PIONEER_SETUP'
-            ])
-            subprocess.check_call([
-                'nmcli', 'con', 'modify', 'PIONEER_SETUP', '802-11-wireless.mode', 'ap',
-                '802-11-wireless.band', 'bg', 'ipv4.method', 'shared'
-            ])
-            subprocess.check_call([
-                'nmcli', 'con', 'modify', 'PIONEER_SETUP', 'wifi-sec.key-mgmt', 'wpa-psk',
-                'wifi-sec.psk', 'pioneer123'
-            ])
-            return True
-    except Exception as e:
-        print(f"Failed to create hotspot: {e}", file=sys.stderr)
-        return False
-
-def is_installing(app_id):
-    """Checks if a salt-call process is running for the given app_id."""
-    try:
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'status']):
-            try:
-                # Ignore zombie processes (finished but not reaped)
-                if proc.info['status'] == psutil.STATUS_ZOMBIE:
-                    continue
-
-                cmdline = proc.info['cmdline']
-                if cmdline:
-                    cmd_str = " ".join(cmdline)
-                    if 'salt-call' in cmd_str and f"modules.{app_id}" in cmd_str:
-                        return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-    except Exception:
-        pass
-    return False
-
 def get_installed_apps():
-    # Assuming standard ports. In production, read from docker compose labels.
+    """Catalogue apps from their manifests, with status from one container listing."""
     hostname = os.uname()[1]
-    apps = [
-        {
-            "id": "wordpress", 
-            "name": "WordPress", 
-            "description": "Blog and Website Builder", 
-            "port": 8080,
-            "url": f"https://{hostname}.local/", 
-            "login_info": "Default User: user / bitnami (Check logs if changed)"
-        },
-        {
-            "id": "portainer", 
-            "name": "Portainer", 
-            "description": "Advanced App/Container Manager", 
-            "port": 9443,
-            "url": f"https://{hostname}.local:9443", 
-            "login_info": "Create admin user on first login."
-        },
-        # {"id": "filebrowser", "name": "File Browser", "description": "Web-based File Manager", "port": 8081}
-    ]
     try:
-        # Check running containers
-        docker_ps = subprocess.check_output(['docker', 'ps', '--format', '{{.Names}}']).decode()
-        for app in apps:
-            # Check if container is running OR if data directory exists (installed but stopped)
-            is_running = app['id'] in docker_ps
-            is_installed = os.path.exists(f"/opt/pioneer/{app['id']}")
-            installing = is_installing(app['id'])
-            
-            app['installed'] = is_installed
-            app['running'] = is_running
-            app['installing'] = installing
-            
-            # If installing, override installed/running to prevent confusion
-            if installing:
-                app['installed'] = False
-                app['running'] = False
-                
-    except Exception as e:
-        print(f"Error checking apps: {e}", file=sys.stderr)
-        pass
-    return apps
-
-def read_dhcp_leases():
-    leases = []
-    lease_file = '/var/lib/misc/dnsmasq.leases'
-    if os.path.exists(lease_file):
-        with open(lease_file, 'r') as f:
-            for line in f:
-                parts = line.split()
-                if len(parts) >= 4:
-                    leases.append({
-                        'mac': parts[1],
-                        'ip': parts[2],
-                        'hostname': parts[3]
-                    })
-    return leases
-
-# --- DNS & DHCP Config Helpers ---
-DHCP_CONF = '/etc/dnsmasq.d/pioneer-dhcp.conf'
-DNS_CONF = '/etc/dnsmasq.d/pioneer-dns.conf'
-
-def reload_dnsmasq():
-    """Reloads dnsmasq configuration safely."""
-    log_file = '/var/log/pioneer-dashboard.log'
-    
-    def log_error(msg):
-        try:
-            with open(log_file, 'a') as f:
-                f.write(f"[DNSMASQ ERROR] {msg}\n")
-        except:
-            pass
-
+        containers = get_docker().containers(all=True)
+    except (DockerError, OSError) as e:
+        log.warning("error checking apps: %s", e)
+        containers = []
+    apps = registry.resolve(containers)
+    # One fresh pass over the process table for all apps
     try:
-        # Check config syntax first
-        subprocess.check_output(['dnsmasq', '--test'], stderr=subprocess.STDOUT)
-        
-        # Check if running
-        try:
-            subprocess.check_call(['systemctl', 'is-active', '--quiet', 'dnsmasq'])
-            is_running = True
-        except subprocess.CalledProcessError:
-            is_running = False
-
-        if is_running:
-            # Try reload
-            try:
-                subprocess.check_output(['systemctl', 'reload', 'dnsmasq'], stderr=subprocess.STDOUT)
-            except subprocess.CalledProcessError as e:
-                log_error(f"Reload failed: {e.output.decode()}")
-                # Fallback to restart
-                subprocess.check_output(['systemctl', 'restart', 'dnsmasq'], stderr=subprocess.STDOUT)
-        else:
-            # Not running, just start
-            subprocess.check_output(['systemctl', 'start', 'dnsmasq'], stderr=subprocess.STDOUT)
-
-    except subprocess.CalledProcessError as e:
-        err_msg = e.output.decode().strip() if e.output else str(e)
-        log_error(f"Operation failed: {err_msg}")
-        raise Exception(f"Dnsmasq Error: {err_msg}")
-    except Exception as e:
-        log_error(f"Unexpected error: {str(e)}")
-        raise Exception(f"System Error: {str(e)}")
-
-def ensure_config_dir():
-    if not os.path.exists('/etc/dnsmasq.d'):
-        os.makedirs('/etc/dnsmasq.d')
-
-def read_dhcp_reservations():
-    res = []
-    if os.path.exists(DHCP_CONF):
-        with open(DHCP_CONF, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('dhcp-host=') and not line.startswith('#'):
-                    # dhcp-host=mac,ip,[hostname]
-                    try:
-                        parts = line.replace('dhcp-host=', '').split(',')
-                        res.append({
-                            'mac': parts[0],
-                            'ip': parts[1] if len(parts) > 1 else '',
-                            'hostname': parts[2] if len(parts) > 2 else ''
-                        })
-                    except:
-                        continue
-    return res
-
-def save_dhcp_reservation(mac, ip, hostname=""):
-    ensure_config_dir()
-    mac = mac.strip()
-    ip = ip.strip()
-    hostname = hostname.strip()
-    
-    lines = []
-    if os.path.exists(DHCP_CONF):
-        with open(DHCP_CONF, 'r') as f:
-            lines = f.readlines()
-    
-    # Format: dhcp-host=MAC,IP,HOSTNAME
-    entry = f"dhcp-host={mac},{ip}"
-    if hostname:
-        entry += f",{hostname}"
-    entry += "\n"
-
-    found = False
-    for i, line in enumerate(lines):
-        if f"dhcp-host={mac}" in line:
-            lines[i] = entry
-            found = True
-            break
-    
-    if not found:
-        # Ensure we are on a new line if the file has content and no trailing newline
-        if lines and not lines[-1].endswith('\n'):
-            lines[-1] += '\n'
-        lines.append(entry)
-        
-    with open(DHCP_CONF, 'w') as f:
-        f.writelines(lines)
-    
-    reload_dnsmasq()
+        proc_index = processes.get_process_index(max_age=0)
+    except Exception:
+        proc_index = None
+    for app in apps:
+        # Manifest URLs may hold other braces (paths, query strings); only this placeholder is ours
+        app['url'] = app['url'].replace('{hostname}', hostname)
+        install_job = jobs.active(f"install:{app['id']}")
+        # Queued/running jobs we own, plus salt-calls started outside the dashboard
+        app['installing'] = bool(install_job) or (proc_index.is_applying(app['state']) if proc_index else False)
+        app['job'] = install_job.id if install_job else None
+        app['cache'] = image_cache.status(app['images'])
+        cache_job = jobs.active(f"cache:{app['id']}")
+        app['cache_job'] = cache_job.id if cache_job else None
+        # If installing, override installed/running to prevent confusion
+        if app['installing']:
+            app['installed'] = False
+            app['running'] = False
+    return apps
 
-def delete_dhcp_reservation(mac):
-    if not os.path.exists(DHCP_CONF): return
-    mac = mac.strip()
-    
-    with open(DHCP_CONF, 'r') as f:
-        lines = f.readlines()
-    
-    with open(DHCP_CONF, 'w') as f:
-        for line in lines:
-            if f"dhcp-host={mac}" not in line:
-                f.write(line)
-    
-    reload_dnsmasq()
-
-def read_dns_records():
-    recs = []
-    if os.path.exists(DNS_CONF):
-        with open(DNS_CONF, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('host-record=') and not line.startswith('#'):
-                    try:
-                        parts = line.replace('host-record=', '').split(',')
-                        if len(parts) >= 2:
-                            recs.append({'hostname': parts[0], 'ip': parts[1]})
-                    except:
-                        continue
-    return recs
-
-def save_dns_record(hostname, ip):
-    ensure_config_dir()
-    hostname = hostname.strip()
-    ip = ip.strip()
-    
-    lines = []
-    if os.path.exists(DNS_CONF):
-        with open(DNS_CONF, 'r') as f:
-            lines = f.readlines()
-    
-    entry = f"host-record={hostname},{ip}\n"
-    
-    # Check if hostname exists, update IP
-    found = False
-    for i, line in enumerate(lines):
-        if line.startswith(f"host-record={hostname},"):
-            lines[i] = entry
-            found = True
-            break
-            
-    if not found:
-        # Ensure we are on a new line
-        if lines and not lines[-1].endswith('\n'):
-            lines[-1] += '\n'
-        lines.append(entry)
-        
-    with open(DNS_CONF, 'w') as f:
-        f.writelines(lines)
-    
-    reload_dnsmasq()
+def get_disk_percent():
+    disk_total, disk_used, disk_free = shutil.disk_usage("/")
+    return int((disk_used / disk_total) * 100)
+
+# docker save tarballs of catalogue images, loaded by the module states before compose runs
+image_cache = Lazy(lambda: imagecache.ImageCache(get_docker()))
+IMAGE_CACHE_TOOL = os.path.join(APP_DIR, 'imagecache.py')
+
+# Salt runs go through one worker by default; they are too RAM hungry to overlap on a Pi 3B
+jobs = JobQueue(workers=int(os.environ.get('PIONEER_JOB_WORKERS', 1)))
+
+# --- Background Status Collector ---
+# Probes run on their own threads; requests only read the latest snapshot.
+collector = StatusCollector()
+app_states = AppStateTable()
+# Manifests only, so the first pages list every app before the 'apps' probe has run
+app_states.seed(registry.apps())
+# D-Bus client keeps its own model current from NM signals; the nmcli fallback is polled.
+# Connecting is deferred to the warm-up (or the first request that needs it).
+network_manager = Lazy(lambda: nm.get_network_manager())
+collector.register('hotspot', lambda: network_manager.hotspot_active(), interval=15, default=False)
+# Full app listing is only a periodic safety net; Docker events keep the table current in between
+collector.register('apps', lambda: app_states.reconcile(get_installed_apps()), interval=60, default=[])
+collector.register('disk', get_disk_percent, interval=60, default=0)
+# Sampled regularly so RX/TX rates are available whenever the page is opened
+collector.register('interfaces', InterfaceInventory().snapshot, interval=5, default=[])
+# Several targets probed concurrently with timeouts, backing off while offline
+connectivity = ConnectivityMonitor()
+# Captive portal clients from one cached `ndsctl json` per interval, joined with the leases
+portal_tracker = Lazy(lambda: portal.PortalTracker(portal.Ndsctl(), lease_tracker))
+# Fixed-size ring buffers: 1 s for 10 min and 1 min for 24 h, per-container every 10 s
+metrics_sampler = Lazy(lambda: metrics.MetricsSampler(get_docker()))
+
+# Nothing above has probed anything yet: the worker answers as soon as the
+# import finishes, and this starts PIONEER_WARMUP_DELAY seconds later or at
+# the first request
+warmup = Warmup()
+warmup.add('collector', collector.start)
+warmup.add('docker_events', lambda: DockerEventWatcher(app_states, get_docker(), registry).start())
+warmup.add('connectivity', connectivity.start)
+warmup.add('metrics', lambda: metrics_sampler.start())
+warmup.add('network_manager', network_manager.resolve)
+warmup.init_app(app)
+warmup.start()
 
-def delete_dns_record(hostname):
-    if not os.path.exists(DNS_CONF): return
-    hostname = hostname.strip()
-    
-    with open(DNS_CONF, 'r') as f:
-        lines = f.readlines()
-    
-    with open(DNS_CONF, 'w') as f:
-        for line in lines:
-            if not line.startswith(f"host-record={hostname},"):
-                f.write(line)
-    
-    reload_dnsmasq()
+def get_hotspot_status():
+    # With D-Bus this is a read of the signal-maintained model; with nmcli, the last poll.
+    # Until the warm-up has connected, the collector's value stands in: a page
+    # render must not be the thing that opens the D-Bus connection.
+    if network_manager.resolved and network_manager.cached:
+        return network_manager.hotspot_active()
+    return collector.get('hotspot')
+
+def install_app(app):
+    """Queues the Salt state for an app; returns the existing job if one is already active."""
+    job, created = jobs.submit(
+        f"install:{app['id']}",
+        ['salt-call', '--local', '--log-level=info', 'state.apply', app['state']],
+        on_exit=lambda job: collector.refresh('apps'))
+    if created:
+        app_states.update(app['id'], installing=True, job=job.id)
+    return job
+
+def apply_portal_settings(settings):
+    """Re-renders nodogsplash.conf with new limits; the state keeps them as grains for later runs."""
+    pillar = json.dumps({'pioneer_portal': settings})
+    job, created = jobs.submit(
+        'portal:settings',
+        ['salt-call', '--local', '--log-level=info', 'state.apply', 'modules.captive_portal', f"pillar={pillar}"])
+    return job, created
+
+def cache_app_images(app):
+    """Queues a pull + docker save of an app's images into the offline cache."""
+    job, created = jobs.submit(
+        f"cache:{app['id']}",
+        [sys.executable, IMAGE_CACHE_TOOL, 'warm', '--app', app['id']],
+        on_exit=lambda job: collector.refresh('apps'))
+    if created:
+        app_states.update(app['id'], cache_job=job.id)
+    return job
 
 # --- Routes ---
 
 @app.route('/')
 def index():
-    try:
-        disk_total, disk_used, disk_free = shutil.disk_usage("/")
-        disk_percent = (disk_used / disk_total) * 100
-    except:
-        disk_percent = 0
-    
     return render_template('index.html', 
-                         disk_percent=int(disk_percent),
+                         disk_percent=collector.get('disk'),
                          hostname=os.uname()[1],
-                         internet=check_internet(),
+                         internet=connectivity.online,
                          hotspot=get_hotspot_status(),
-                         apps=get_installed_apps())
+                         apps=app_states.list())
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         password = request.form.get('password')
-        if password == config['admin_password']:
-            login_user(User(1))
+        try:
+            ok = authenticator.verify(password, request.remote_addr)
+        except AuthError as e:
+            flash(str(e))
+            return render_template('login.html'), 429, {'Retry-After': str(e.retry_after)}
+        if ok:
+            login_user(sessions.create())
             return redirect(url_for('index'))
         else:
             flash('Invalid password')
@@ -380,58 +208,252 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    sessions.revoke(current_user.id)
     logout_user()
     return redirect(url_for('index'))
 
 @app.route('/apps')
 @login_required
 def apps():
-    return render_template('apps.html', apps=get_installed_apps())
+    return render_template('apps.html', apps=app_states.list(), image_cache=image_cache.summary())
+
+@app.route('/apps/<app_id>/card')
+@login_required
+def app_card(app_id):
+    # Single card fragment, swapped in place when a state change arrives over /api/events
+    app_info = app_states.get(app_id)
+    if app_info is None:
+        abort(404)
+    return render_template('_app_card.html', app=app_info)
+
+LEASES_PER_PAGE = 25
 
 @app.route('/network')
 @login_required
 def network():
-    # Get detailed interface info
-    interfaces = []
-    try:
-        # Try ip -j first (requires iproute2-json usually, but standard ip usually supports it now)
-        # If not, we might need manual parsing. Let's try simple manual parsing of 'ip addr' if -j fails
-        # or just basic parsing.
-        # Check if json output is supported
-        try:
-            output = subprocess.check_output(['ip', '-j', 'addr'], stderr=subprocess.DEVNULL).decode()
-            data = json.loads(output)
-            for iface in data:
-                if iface['ifname'] == 'lo': continue
-                ipv4 = next((a['local'] for a in iface.get('addr_info', []) if a['family'] == 'inet'), 'No IP')
-                interfaces.append({
-                    'name': iface['ifname'],
-                    'mac': iface.get('address', ''),
-                    'ip': ipv4,
-                    'state': iface['operstate']
-                })
-        except:
-             # Fallback to simple shell
-             output = subprocess.check_output(['ip', '-o', 'addr']).decode()
-             for line in output.split('\n'):
-                 if 'inet ' in line and ' lo ' not in line:
-                     parts = line.split()
-                     # 1: lo    inet 127.0.0.1/8 ...
-                     interfaces.append({'name': parts[1], 'ip': parts[3].split('/')[0], 'state': 'up', 'mac': 'Unknown'})
-    except:
-        pass
-
     return render_template('network.html', 
-                         interfaces=interfaces, 
+                         interfaces=collector.get('interfaces'), 
                          hotspot_active=get_hotspot_status(),
-                         leases=read_dhcp_leases(), 
-                         dhcp_reservations=read_dhcp_reservations(),
-                         dns_records=read_dns_records())
+                         leases=lease_tracker.query(per_page=LEASES_PER_PAGE), 
+                         portal_settings=portal_tracker.settings(),
+                         portal_job=jobs.active('portal:settings'))
 
 @app.route('/docs')
 def docs():
     return render_template('docs.html')
 
+# Per-run bookkeeping in the status payloads; a new run that finds the same
+# values shouldn't make every poller download the body again
+STATUS_TIMING_FIELDS = frozenset({'age', 'updated', 'duration', 'checked'})
+
+def status_response(data):
+    """JSON whose ETag ignores ages and run times, so unchanged values revalidate as 304."""
+    response = jsonify(data)
+    response.set_etag(stable_etag(data, STATUS_TIMING_FIELDS), weak=True)
+    return response
+
+@app.route('/api/status')
+@login_required
+def status():
+    # Latest probe values with their age, straight from memory; nothing here scans or forks
+    data = collector.snapshot()
+    data['warmup'] = warmup.status()
+    data['connectivity'] = connectivity.status()
+    return status_response(data)
+
+@app.route('/api/connectivity')
+@login_required
+def connectivity_status():
+    """Cached reachability with per-target latency and the latency/loss history."""
+    if request.args.get('refresh'):
+        connectivity.check_now()
+    return status_response(connectivity.status(with_history=True))
+
+@app.route('/api/interfaces')
+@login_required
+def list_interfaces():
+    return jsonify(collector.get('interfaces'))
+
+@app.route('/api/metrics')
+@login_required
+def metrics_series():
+    """?series=cpu,mem&res=1s|10s|1m&points=N&format=json|bin
+
+    Binary responses are the requested series' little-endian float32 values
+    back to back (NaN for gaps), described by the X-Metrics-* headers.
+    """
+    names = [n for n in request.args.get('series', '').split(',') if n] or metrics_sampler.names()
+    data = metrics_sampler.query(names, request.args.get('res', '1s'), request.args.get('points', type=int))
+    if request.args.get('format') == 'bin':
+        body = bytearray()
+        for start, step, values in data.values():
+            if sys.byteorder != 'little':
+                values.byteswap()
+            body += values.tobytes()
+        # Comma-separated, one entry per series in X-Metrics-Series order
+        return Response(bytes(body), mimetype='application/octet-stream', headers={
+            'X-Metrics-Series': ','.join(data),
+            'X-Metrics-Start': ','.join(str(start or 0) for start, step, values in data.values()),
+            'X-Metrics-Step': ','.join(str(step) for start, step, values in data.values()),
+            'X-Metrics-Points': ','.join(str(len(values)) for start, step, values in data.values()),
+        })
+    return jsonify({name: {'start': start, 'step': step, 'values': metrics.to_json_values(values)}
+                    for name, (start, step, values) in data.items()})
+
+@app.route('/api/images')
+@login_required
+def image_cache_status():
+    """Offline image cache: cached tarballs with checksum and size, plus free space."""
+    return jsonify(image_cache.summary())
+
+@app.route('/api/profile', methods=['GET', 'DELETE'])
+@login_required
+def profile_stats():
+    """Debug view: latency histograms per external command and per route, slowest first.
+
+    Each route also lists the commands its requests ran. DELETE starts a new window.
+    """
+    if request.method == 'DELETE':
+        profile.reset()
+    return jsonify(profile.snapshot())
+
+@app.route('/api/leases')
+@login_required
+def list_leases():
+    """Paginated lease table: ?page=&per_page=&q=&state=active|expired|all"""
+    return jsonify(lease_tracker.query(
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', LEASES_PER_PAGE, type=int),
+        search=request.args.get('q', ''),
+        state=request.args.get('state', 'active')))
+
+# Reservations and DNS records are loaded by the page a screenful at a time, like the leases
+CONFIG_PER_PAGE = 50
+
+@app.route('/api/dhcp/reservations')
+@login_required
+def list_dhcp_reservations():
+    """Paginated DHCP reservations: ?page=&per_page=&q="""
+    return jsonify(reservation_index.query(
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', CONFIG_PER_PAGE, type=int),
+        search=request.args.get('q', '')))
+
+@app.route('/api/dns/records')
+@login_required
+def list_dns_records():
+    """Paginated local DNS records: ?page=&per_page=&q="""
+    return jsonify(record_index.query(
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', CONFIG_PER_PAGE, type=int),
+        search=request.args.get('q', '')))
+
+PORTAL_PER_PAGE = 50
+
+@app.route('/api/portal/clients')
+@login_required
+def portal_clients():
+    """Paginated captive portal clients: ?page=&per_page=&q=&state=authenticated|preauthenticated|all"""
+    return jsonify(portal_tracker.query(
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', PORTAL_PER_PAGE, type=int),
+        search=request.args.get('q', ''),
+        state=request.args.get('state', 'all')))
+
+@app.route('/api/jobs')
+@login_required
+def list_jobs():
+    return jsonify(jobs.list())
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def job_detail(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/log')
+@login_required
+def job_log(job_id):
+    """Plain-text log from ?offset=N; X-Log-Offset tells the client where to resume."""
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    data, offset = job.read_log(request.args.get('offset', 0, type=int))
+    return Response(data, mimetype='text/plain',
+                    headers={'X-Log-Offset': str(offset), 'X-Job-Status': job.status})
+
+# Each open SSE stream holds a server thread for as long as its tab stays open.
+# Past this many, new streams get a 503 and the page polls instead, so the
+# remaining threads (see gunicorn.conf.py) are always free for requests.
+MAX_STREAMS = int(os.environ.get('PIONEER_MAX_STREAMS', 4))
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def event_stream(stream):
+    """SSE response for a generator, holding one stream slot until the response is closed."""
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'Too many live streams open'}), 503, {'Retry-After': '30'}
+    response = Response(stream, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the server closes the response, even if the generator never started
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route('/api/jobs/<job_id>/stream')
+@login_required
+def job_stream(job_id):
+    """Server-Sent Events stream of a job's log lines until it finishes."""
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+
+    def stream():
+        offset = 0
+        yield "retry: 3000\n\n"
+        while True:
+            # Read under the job's condition so a line written meanwhile can't be missed
+            with job.changed:
+                active = job.active
+                data, _ = job.read_log(offset)
+                if active:
+                    # Only send complete lines while the job is still writing
+                    data = data[:data.rfind(b'\n') + 1]
+                if not data and active:
+                    job.changed.wait(15)
+                    continue
+            offset += len(data)
+            for line in data.decode(errors='replace').splitlines():
+                yield f"event: log\ndata: {line}\n\n"
+            if not active and not data:
+                yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+
+    return event_stream(stream())
+
+@app.route('/api/events')
+@login_required
+def events():
+    """Server-Sent Events stream of app state changes."""
+    def stream():
+        # Subscribed on the first read, so a refused stream doesn't leave a queue behind
+        subscription = app_states.subscribe()
+        try:
+            # Flush headers right away so the browser sees the stream as open
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    app_info = subscription.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from timing out an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: app\ndata: {json.dumps(app_info)}\n\n"
+        finally:
+            app_states.unsubscribe(subscription)
+
+    return event_stream(stream())
+
 # --- API Actions (Protected) ---
 
 @app.route('/api/action', methods=['POST'])
@@ -443,18 +465,18 @@ def action():
     
     try:
         if cmd == 'reboot':
-            subprocess.Popen(['shutdown', '-r', 'now'])
+            commands.spawn(['shutdown', '-r', 'now'])
             return jsonify({'status': 'rebooting'})
         
         elif cmd == 'shutdown':
-            subprocess.Popen(['shutdown', '-h', 'now'])
+            commands.spawn(['shutdown', '-h', 'now'])
             return jsonify({'status': 'shutting_down'})
         
         elif cmd == 'toggle_hotspot':
-            ensure_hotspot_exists()
-            is_on = get_hotspot_status()
-            action = 'down' if is_on else 'up'
-            subprocess.run(['nmcli', 'connection', action, 'PIONEER_SETUP'], check=True)
+            network_manager.ensure_hotspot()
+            is_on = network_manager.hotspot_active()
+            network_manager.set_hotspot_active(not is_on)
+            collector.refresh('hotspot')
             return jsonify({'status': 'success', 'new_state': not is_on})
             
         elif cmd == 'update_hotspot':
@@ -463,11 +485,9 @@ def action():
             if len(password) < 8:
                 raise Exception("Password must be at least 8 characters")
             
-            ensure_hotspot_exists()
-            subprocess.run(['nmcli', 'con', 'modify', 'PIONEER_SETUP', 'ssid', ssid, 'wifi-sec.psk', password], check=True)
-            # Restart connection
-            subprocess.run(['nmcli', 'con', 'down', 'PIONEER_SETUP'])
-            subprocess.run(['nmcli', 'con', 'up', 'PIONEER_SETUP'])
+            network_manager.ensure_hotspot()
+            network_manager.update_hotspot(ssid, password)
+            collector.refresh('hotspot')
             return jsonify({'status': 'success'})
 
         elif cmd == 'set_hostname':
@@ -476,9 +496,9 @@ def action():
             if not new_name.replace('-', '').isalnum():
                 raise Exception("Invalid hostname format")
             
-            subprocess.run(['hostnamectl', 'set-hostname', new_name], check=True)
+            commands.run(['hostnamectl', 'set-hostname', new_name], check=True)
             # Update /etc/hosts to prevent sudo warnings
-            subprocess.run(['sed', '-i', f's/127.0.1.1.*/127.0.1.1\t{new_name}/', '/etc/hosts'])
+            commands.run(['sed', '-i', f's/127.0.1.1.*/127.0.1.1\t{new_name}/', '/etc/hosts'])
             return jsonify({'status': 'success', 'message': 'Hostname changed. Reboot recommended.'})
 
         elif cmd == 'update_password':
@@ -486,42 +506,55 @@ def action():
             if len(new_pass) < 5:
                  raise Exception("Password too short")
             
-            config['admin_password'] = new_pass
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(config, f)
+            authenticator.set_password(new_pass)
+            # Other browsers logged in with the old password have to log in again
+            sessions.revoke_others(current_user.id)
             return jsonify({'status': 'success'})
 
-        elif cmd == 'install_app':
-            if target == 'wordpress':
+        elif cmd in ('install_app', 'start_app', 'stop_app', 'remove_app', 'cache_app'):
+            manifest = registry.get(target) if target else None
+            if manifest is None:
+                return jsonify({'status': 'error', 'message': f"Unknown app: {target}"}), 404
+
+            if cmd == 'install_app':
                 # Run Salt State in background
-                subprocess.Popen(['salt-call', '--local', 'state.apply', 'modules.wordpress'])
-                return jsonify({'status': 'installing'})
-        
-        elif cmd == 'start_app':
-             if target == 'wordpress':
-                # Use up -d to ensure it starts even if not created or just stopped
-                res = subprocess.run(['/usr/bin/docker', 'compose', 'up', '-d'], cwd='/opt/pioneer/wordpress', capture_output=True, text=True)
-                if res.returncode != 0:
-                    raise Exception(f"Docker failed: {res.stderr}")
+                job = install_app(manifest)
+                return jsonify({'status': 'installing', 'job': job.id})
+
+            elif cmd == 'cache_app':
+                job = cache_app_images(manifest)
+                return jsonify({'status': 'caching', 'job': job.id})
+
+            elif cmd == 'start_app':
+                # Start existing containers over the API; create them with compose only if missing
+                if not registry.start(manifest, get_docker()):
+                    # No timeout: creating containers may pull images first
+                    res = commands.run(['/usr/bin/docker', 'compose', 'up', '-d'], cwd=manifest['compose_dir'], capture_output=True, text=True, timeout=None)
+                    if res.returncode != 0:
+                        raise Exception(f"Docker failed: {res.stderr}")
+                collector.refresh('apps', wait=True)
                 return jsonify({'status': 'started'})
 
-        elif cmd == 'stop_app':
-             if target == 'wordpress':
-                res = subprocess.run(['/usr/bin/docker', 'compose', 'stop'], cwd='/opt/pioneer/wordpress', capture_output=True, text=True)
-                if res.returncode != 0:
-                    raise Exception(f"Docker stop failed: {res.stderr}")
+            elif cmd == 'stop_app':
+                try:
+                    registry.stop(manifest, get_docker())
+                except DockerError as e:
+                    raise Exception(f"Docker stop failed: {e}")
+                collector.refresh('apps', wait=True)
                 return jsonify({'status': 'stopped'})
 
-        elif cmd == 'remove_app':
-            if target == 'wordpress':
+            elif cmd == 'remove_app':
+                if not manifest['removable']:
+                    return jsonify({'status': 'error', 'message': f"{manifest['name']} is a core app"}), 400
                 # Stop container and remove dir
-                res = subprocess.run(['/usr/bin/docker', 'compose', 'down'], cwd='/opt/pioneer/wordpress', capture_output=True, text=True)
-                if res.returncode != 0:
-                     # Log but continue cleanup
-                     with open('/var/log/pioneer-dashboard.log', 'a') as f:
-                        f.write(f"Docker down warning: {res.stderr}\n")
-                
-                shutil.rmtree('/opt/pioneer/wordpress', ignore_errors=True)
+                try:
+                    registry.remove(manifest, get_docker())
+                except (DockerError, OSError) as e:
+                    # Log but continue cleanup
+                    log.warning("docker down failed for %s: %s", manifest['id'], e)
+
+                shutil.rmtree(manifest['compose_dir'], ignore_errors=True)
+                collector.refresh('apps', wait=True)
                 return jsonify({'status': 'removed'})
 
         # --- DHCP & DNS Actions ---
@@ -541,14 +574,46 @@ def action():
             delete_dns_record(data['hostname'])
             return jsonify({'status': 'success'})
 
+        # --- Captive Portal ---
+        elif cmd == 'portal_clients':
+            # One call for any number of clients: a MAC list, or everything matching a filter
+            result = portal_tracker.bulk(data.get('op'), macs=data.get('macs'),
+                                 search=data.get('q'), state=data.get('state'))
+            return jsonify(dict(result, status='success'))
+
+        elif cmd == 'portal_settings':
+            if not isinstance(data, dict):
+                raise ConfigError("Portal settings must be an object")
+            current = portal_tracker.settings()
+            if current is None:
+                return jsonify({'status': 'error', 'message': 'Captive portal is not installed'}), 404
+            settings = portal.validate_settings(dict(current, **data))
+            job, created = apply_portal_settings(settings)
+            if not created:
+                return jsonify({'status': 'error', 'message': 'Portal settings are already being applied', 'job': job.id}), 409
+            return jsonify({'status': 'success', 'job': job.id})
+
+        elif cmd == 'network_batch':
+            # Many reservation/record changes, validated up front, one write per file and one reload
+            if not isinstance(data, dict):
+                raise ConfigError("Batch data must be an object")
+            tx = ConfigTransaction()
+            tx.apply_ops(data.get('ops', []))
+            applied = tx.commit()
+            return jsonify({'status': 'success', 'applied': applied})
+
+    except (JobQueueFull, portal.PortalError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+    except BatchError as e:
+        return jsonify({'status': 'error', 'message': str(e), 'index': e.index}), 400
+    except ConfigError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
-        with open('/var/log/pioneer-dashboard.log', 'a') as f:
-            f.write(f"Action failed: {str(e)}\n")
-        print(f"Action failed: {e}", file=sys.stderr)
+        log.error("action %s failed: %s", cmd, e, extra={'command': cmd, 'target': target})
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
     return jsonify({'status': 'unknown_command'}), 400
 
 if __name__ == '__main__':
-    # Run on port 5000 (Nginx will proxy to this)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
     app.run(host='0.0.0.0', port=5000)
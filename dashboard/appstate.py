@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+
+from docker_api import DockerError
+from logs import get_logger
+
+# Container actions that can change whether an app counts as installed or running
+CONTAINER_ACTIONS = ['create', 'start', 'restart', 'stop', 'die', 'kill', 'pause', 'unpause', 'destroy']
+
+log = get_logger('appstate')
+
+
+class AppStateTable:
+    """In-memory app state, updated incrementally and fanned out to subscribers.
+
+    Each subscriber (one per open browser tab) gets its own bounded queue of
+    changed app rows; a tab that stops reading is dropped instead of letting
+    its queue grow.
+    """
+
+    def __init__(self):
+        self._apps = {}
+        self._order = []
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def list(self):
+        with self._lock:
+            return [dict(self._apps[app_id]) for app_id in self._order]
+
+    def get(self, app_id):
+        with self._lock:
+            app = self._apps.get(app_id)
+            return dict(app) if app else None
+
+    def ids(self):
+        with self._lock:
+            return list(self._order)
+
+    def seed(self, apps):
+        """Lists catalogue apps before the first reconcile, with their state still unknown.
+
+        Pages and card fragments can then render every app from the start;
+        the first full listing replaces these rows and publishes them.
+        """
+        with self._lock:
+            if self._order:
+                return
+            for app in apps:
+                self._apps[app['id']] = dict(app, status='unknown', installed=False, running=False,
+                                             installing=False, job=None, cache=None, cache_job=None)
+                self._order.append(app['id'])
+
+    def reconcile(self, apps):
+        """Replaces the table with a full listing, publishing only the rows that changed."""
+        changed = []
+        with self._lock:
+            self._order = [app['id'] for app in apps]
+            for app in apps:
+                if self._apps.get(app['id']) != app:
+                    changed.append(dict(app))
+                self._apps[app['id']] = dict(app)
+        for app in changed:
+            self._publish(app)
+        return apps
+
+    def update(self, app_id, **fields):
+        with self._lock:
+            app = self._apps.get(app_id)
+            if app is None:
+                return
+            new = dict(app, **fields)
+            if 'installed' in fields:
+                new.pop('status', None)
+            # While installing, installed/running are forced off to prevent confusion
+            if new.get('installing'):
+                new['installed'] = False
+                new['running'] = False
+            if new == app:
+                return
+            self._apps[app_id] = new
+        self._publish(dict(new))
+
+    def subscribe(self, maxsize=100):
+        q = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _publish(self, app):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(app)
+            except queue.Full:
+                self.unsubscribe(q)
+
+
+class DockerEventWatcher:
+    """Follows the Docker /events stream and re-resolves only the app a container belongs to."""
+
+    def __init__(self, table, client, registry, retry_interval=30):
+        self.table = table
+        self.client = client
+        self.registry = registry
+        self.retry_interval = retry_interval
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='docker-events', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        filters = {'type': ['container'], 'event': CONTAINER_ACTIONS}
+        while True:
+            try:
+                for event in self.client.events(filters=filters):
+                    self.handle(event)
+            except (DockerError, OSError, ValueError) as e:
+                log.warning("docker event stream unavailable: %s", e)
+            time.sleep(self.retry_interval)
+
+    def handle(self, event):
+        attrs = event.get('Actor', {}).get('Attributes', {})
+        app_id = self.registry.owner(attrs, attrs.get('name'))
+        if app_id not in self.table.ids():
+            return
+        self.table.update(app_id, **self.resolve(app_id))
+
+    def resolve(self, app_id):
+        """Looks up installed/running for one app from a single container listing."""
+        for app in self.registry.resolve(self.client.containers(all=True)):
+            if app['id'] == app_id:
+                return {'installed': app['installed'], 'running': app['running']}
+        return {}
@@ -0,0 +1,341 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+
+from flask_login import UserMixin
+
+from fileutil import atomic_write
+from logs import get_logger
+
+# PBKDF2-SHA256 rounds for new hashes. ~0.25 s per check on a Pi 3B (no SHA
+# instructions on its Cortex-A53); re-tune with `python3 auth.py calibrate`.
+# Stored hashes keep their own count and are upgraded at the next login.
+HASH_ITERATIONS = int(os.environ.get('PIONEER_HASH_ITERATIONS', 80000))
+# Concurrent hash checks; a login burst then occupies one of the Pi's four cores.
+# A login that finds the slot taken waits less than one hash before it is
+# turned away with 429, so it never holds a request thread for long.
+HASH_SLOTS = 1
+HASH_WAIT = 0.2
+# Failed logins allowed per client IP within the window before it has to wait
+MAX_FAILURES = 5
+FAILURE_WINDOW = 300
+MAX_TRACKED_CLIENTS = 4096
+
+SESSION_FILE = os.environ.get('PIONEER_SESSION_FILE', '/run/pioneer-dashboard/sessions.json')
+SESSION_IDLE_TIMEOUT = 12 * 3600
+MAX_SESSIONS = 64
+# Last-seen times are only bumped (and saved) this often, so most requests are a dict lookup
+TOUCH_INTERVAL = 60
+
+log = get_logger('auth')
+
+
+class AuthError(Exception):
+    """Login refused before the password was checked; retry_after is in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# --- Password hashes ---
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def hash_password(password, iterations=HASH_ITERATIONS):
+    """'pbkdf2_sha256$<iterations>$<salt>$<hash>', salt and hash base64."""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def hash_iterations(encoded):
+    try:
+        return int(encoded.split('$')[1])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def check_password(password, encoded):
+    """Constant-time comparison against a stored hash; False for malformed hashes."""
+    try:
+        algorithm, iterations, salt, expected = encoded.split('$')
+        if algorithm != 'pbkdf2_sha256':
+            return False
+        salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, int(iterations))
+    except (AttributeError, ValueError):
+        return False
+    return hmac.compare_digest(digest, expected)
+
+
+# --- Config file ---
+class ConfigFile:
+    """config.json kept in memory; every update is written atomically under one lock.
+
+    A missing file is created from `legacy_path` (where older installs kept
+    it, next to the code) or else from the shipped `template_path`. A
+    plaintext `admin_password` from either is replaced with its hash on
+    load. The file holds the password hash and the session secret, so it is
+    only ever readable by its owner.
+    """
+
+    MODE = 0o600
+
+    def __init__(self, path, defaults, template_path=None, legacy_path=None):
+        self.path = path
+        self.defaults = dict(defaults)
+        self.template_path = template_path
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+        self._data = self.load()
+
+    def load(self):
+        data = dict(self.defaults)
+        source = next((p for p in (self.path, self.legacy_path, self.template_path)
+                       if p and os.path.exists(p)), None)
+        if source is not None:
+            with open(source, 'r') as f:
+                data.update(json.load(f))
+        if 'admin_password' in data:
+            plaintext = data.pop('admin_password')
+            if 'admin_password_hash' not in data:
+                data['admin_password_hash'] = hash_password(plaintext)
+        elif source == self.path:
+            self._restrict()
+            return data
+        try:
+            self._write(data)
+        except OSError as e:
+            log.warning("could not store config in %s: %s", self.path, e)
+            return data
+        if source is not None and source == self.legacy_path:
+            log.info("moved config from %s to %s", source, self.path)
+            try:
+                os.remove(source)
+            except OSError as e:
+                log.warning("could not remove old config %s: %s", source, e)
+        return data
+
+    def _restrict(self):
+        # Files written before the config was owner-only were 0644
+        try:
+            if os.stat(self.path).st_mode & 0o077:
+                os.chmod(self.path, self.MODE)
+        except OSError as e:
+            log.warning("could not restrict permissions of %s: %s", self.path, e)
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(self.path) or '.', mode=0o700, exist_ok=True)
+        atomic_write(self.path, [json.dumps(data, indent=4) + '\n'], mode=self.MODE)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def update(self, **changes):
+        with self._lock:
+            data = dict(self._data, **changes)
+            self._write(data)
+            self._data = data
+
+
+# --- Login throttling ---
+class LoginLimiter:
+    """Sliding window of failed logins per client IP.
+
+    Only failures are counted, and a successful login clears them, so the
+    admin isn't locked out by their own earlier typos once they get it right.
+    """
+
+    def __init__(self, max_failures=MAX_FAILURES, window=FAILURE_WINDOW, max_clients=MAX_TRACKED_CLIENTS):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._failures = {}  # ip -> deque of failure times, oldest first
+
+    def retry_after(self, client):
+        """Seconds until `client` may try again; 0 when it isn't limited."""
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.get(client)
+            if not failures:
+                return 0
+            while failures and now - failures[0] >= self.window:
+                failures.popleft()
+            if len(failures) < self.max_failures:
+                return 0
+            return int(failures[0] + self.window - now) + 1
+
+    def failure(self, client):
+        now = time.monotonic()
+        with self._lock:
+            if client not in self._failures and len(self._failures) >= self.max_clients:
+                # Forget the client whose latest failure is oldest
+                stalest = min(self._failures, key=lambda ip: self._failures[ip][-1] if self._failures[ip] else 0)
+                del self._failures[stalest]
+            self._failures.setdefault(client, deque(maxlen=self.max_failures)).append(now)
+
+    def success(self, client):
+        with self._lock:
+            self._failures.pop(client, None)
+
+
+# --- Sessions ---
+class User(UserMixin):
+    def __init__(self, id):
+        self.id = id
+
+
+class SessionStore:
+    """Logged-in sessions by random token, checked in memory on every request.
+
+    The password hash is only computed at login; afterwards flask_login's
+    user loader is a dict lookup that returns the same User object. Tokens
+    are saved (hashed) to a file under /run, so a graceful reload keeps
+    people logged in while a reboot does not.
+    """
+
+    def __init__(self, path=SESSION_FILE, idle_timeout=SESSION_IDLE_TIMEOUT, max_sessions=MAX_SESSIONS):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = {}  # sha256(token) -> [User, last seen]
+        self._load()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        self._sessions = {key: [None, seen] for key, seen in saved.items() if now - seen < self.idle_timeout}
+
+    def _save(self):
+        try:
+            atomic_write(self.path, [json.dumps({key: seen for key, (_, seen) in self._sessions.items()})], mode=0o600)
+        except OSError as e:
+            log.debug("sessions not saved to %s: %s", self.path, e)
+
+    def create(self):
+        user = User(secrets.token_urlsafe(32))
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                oldest = min(self._sessions, key=lambda key: self._sessions[key][1])
+                del self._sessions[oldest]
+            self._sessions[self._key(user.id)] = [user, time.time()]
+            self._save()
+        return user
+
+    def get(self, token):
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            if now - entry[1] >= self.idle_timeout:
+                del self._sessions[key]
+                return None
+            if entry[0] is None:
+                entry[0] = User(token)
+            if now - entry[1] >= TOUCH_INTERVAL:
+                entry[1] = now
+                # Saved too, or a reload would bring the session back with its old time and expire it early
+                self._save()
+            return entry[0]
+
+    def revoke(self, token):
+        with self._lock:
+            if self._sessions.pop(self._key(token), None) is not None:
+                self._save()
+
+    def revoke_others(self, token):
+        """Ends every session but `token`'s, e.g. after a password change."""
+        key = self._key(token)
+        with self._lock:
+            self._sessions = {k: v for k, v in self._sessions.items() if k == key}
+            self._save()
+
+
+# --- Authenticator ---
+class Authenticator:
+    """Password checks for the single admin account.
+
+    Throttled clients are turned away before any hashing, and at most
+    HASH_SLOTS hashes run at once; an attempt that can't get a slot within
+    HASH_WAIT seconds is refused straight away (the login page answers 429
+    with Retry-After), so a burst of logins can't starve the probes and page
+    requests of CPU or tie up the worker's threads.
+    """
+
+    def __init__(self, config, limiter=None, iterations=HASH_ITERATIONS, slots=HASH_SLOTS):
+        self.config = config
+        self.limiter = limiter or LoginLimiter()
+        self.iterations = iterations
+        self._slots = threading.BoundedSemaphore(slots)
+
+    def verify(self, password, client):
+        """True if `password` is right. Raises AuthError when the attempt is refused unchecked."""
+        retry_after = self.limiter.retry_after(client)
+        if retry_after:
+            raise AuthError(f"Too many failed logins, try again in {retry_after} s", retry_after)
+        if not self._slots.acquire(timeout=HASH_WAIT):
+            raise AuthError("Login is busy, try again in a moment", 1)
+        try:
+            encoded = self.config['admin_password_hash']
+            ok = check_password(password or '', encoded)
+            if ok and hash_iterations(encoded) != self.iterations:
+                try:
+                    self.config.update(admin_password_hash=hash_password(password, self.iterations))
+                except OSError as e:
+                    log.warning("could not rehash admin password: %s", e)
+        finally:
+            self._slots.release()
+        if ok:
+            self.limiter.success(client)
+        else:
+            self.limiter.failure(client)
+            log.info("failed login from %s", client, extra={'client': client})
+        return ok
+
+    def set_password(self, password):
+        with self._slots:
+            encoded = hash_password(password, self.iterations)
+        self.config.update(admin_password_hash=encoded)
+
+
+def calibrate(target_ms=250):
+    """Iterations that take about target_ms on this machine."""
+    probe = 20000
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac('sha256', b'calibrate', b'0' * 16, probe)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return max(10000, int(probe * target_ms / elapsed_ms) // 1000 * 1000)
+
+
+if __name__ == '__main__':
+    # python3 auth.py calibrate [TARGET_MS]: suggests PIONEER_HASH_ITERATIONS for this board
+    if len(sys.argv) in (2, 3) and sys.argv[1] == 'calibrate':
+        target = int(sys.argv[2]) if len(sys.argv) == 3 else 250
+        print(f"PIONEER_HASH_ITERATIONS={calibrate(target)}  # ~{target} ms per login check here")
+    else:
+        print("usage: auth.py calibrate [TARGET_MS]", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+
+from docker_api import COMPOSE_PROJECT_LABEL
+from logs import get_logger
+
+# Compose/container labels that tie a container to a catalogue app
+APP_LABEL = 'io.pioneer.app'
+NAME_LABEL = 'io.pioneer.name'
+DESCRIPTION_LABEL = 'io.pioneer.description'
+URL_LABEL = 'io.pioneer.url'
+
+DEFAULT_MODULES_DIR = '/opt/pioneer-os/salt/states/modules'
+# Checkout layout (dashboard/ next to salt/), for running from the repo
+REPO_MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'salt', 'states', 'modules')
+APPS_DIR = '/opt/pioneer'
+
+log = get_logger('catalog')
+
+
+def modules_dir():
+    path = os.environ.get('PIONEER_MODULES_DIR')
+    if path:
+        return path
+    return DEFAULT_MODULES_DIR if os.path.isdir(DEFAULT_MODULES_DIR) else os.path.normpath(REPO_MODULES_DIR)
+
+
+def normalize(app_id, manifest):
+    """Fills the defaults of a manifest; only `name` is required.
+
+    - state: Salt state applied to install the app (modules.<id>)
+    - project: compose project whose containers belong to the app (<id>)
+    - container: plain container name, for apps not run through compose
+    - compose_dir: directory with the compose file and app data (/opt/pioneer/<id>)
+    - images: image references the app runs, kept in the offline image cache
+    - order: position in the catalogue, lowest first
+    """
+    return {
+        'id': app_id,
+        'name': manifest.get('name', app_id),
+        'description': manifest.get('description', ''),
+        'port': manifest.get('port'),
+        'url': manifest.get('url', ''),
+        'login_info': manifest.get('login_info', ''),
+        'state': manifest.get('state', f"modules.{app_id}"),
+        'project': manifest.get('project', app_id),
+        'container': manifest.get('container'),
+        'compose_dir': manifest.get('compose_dir', os.path.join(APPS_DIR, app_id)),
+        'removable': manifest.get('removable', True),
+        'images': manifest.get('images', []),
+        'order': manifest.get('order', 100),
+    }
+
+
+class AppRegistry:
+    """App catalogue built from `<id>.json` manifests next to the Salt module states.
+
+    Manifests are parsed on first use and kept in memory; at most every
+    `max_age` seconds the directory is stat'ed and only files whose mtime or
+    size changed are parsed again. Containers labelled `io.pioneer.app` that
+    have no manifest are listed too, described by their labels.
+    """
+
+    def __init__(self, path=None, max_age=2.0):
+        self.path = path or modules_dir()
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._files = {}  # filename -> (mtime_ns, size, app)
+        self._checked = None
+
+    def _refresh(self):
+        with self._lock:
+            if self._checked is not None and time.time() - self._checked < self.max_age:
+                return
+            try:
+                names = [n for n in os.listdir(self.path) if n.endswith('.json')]
+            except OSError:
+                names = []
+            files = {}
+            for name in sorted(names):
+                path = os.path.join(self.path, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                cached = self._files.get(name)
+                if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                    files[name] = cached
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        app = normalize(name[:-len('.json')], json.load(f))
+                except (OSError, ValueError) as e:
+                    log.warning("skipping app manifest %s: %s", name, e)
+                    continue
+                files[name] = (st.st_mtime_ns, st.st_size, app)
+            self._files = files
+            self._checked = time.time()
+
+    def apps(self):
+        self._refresh()
+        apps = [dict(entry[2]) for entry in self._files.values()]
+        return sorted(apps, key=lambda app: (app['order'], app['id']))
+
+    def get(self, app_id):
+        self._refresh()
+        entry = self._files.get(f"{app_id}.json")
+        return dict(entry[2]) if entry else None
+
+    @staticmethod
+    def container_keys(container):
+        """Every key a container can be matched on: app label, compose project and names."""
+        labels = container.get('Labels') or {}
+        keys = {name.lstrip('/') for name in container.get('Names', [])}
+        for label in (APP_LABEL, COMPOSE_PROJECT_LABEL):
+            if labels.get(label):
+                keys.add(labels[label])
+        return keys
+
+    @staticmethod
+    def app_keys(app):
+        keys = {app['id'], app['project']}
+        if app['container']:
+            keys.add(app['container'])
+        return keys
+
+    def owner(self, labels, name=None):
+        """App id owning a container, from its labels (e.g. a Docker event's Actor attributes)."""
+        keys = {labels.get(APP_LABEL), labels.get(COMPOSE_PROJECT_LABEL), name} - {None, ''}
+        for app in self.apps():
+            if keys & self.app_keys(app):
+                return app['id']
+        # Labelled container without a manifest
+        return labels.get(APP_LABEL) or None
+
+    def resolve(self, containers):
+        """Full catalogue with installed/running set, from one container listing.
+
+        `containers` is a single `/containers/json?all=1` result, so the cost
+        is one Docker call however many apps the catalogue holds.
+        """
+        running = set()
+        existing = set()
+        discovered = {}
+        for c in containers:
+            keys = self.container_keys(c)
+            existing |= keys
+            if c.get('State') == 'running':
+                running |= keys
+            labels = c.get('Labels') or {}
+            if labels.get(APP_LABEL):
+                discovered.setdefault(labels[APP_LABEL], labels)
+        apps = self.apps()
+        known = set()
+        for app in apps:
+            known |= self.app_keys(app)
+        # Labelled containers without a manifest still show up, described by their labels
+        for app_id, labels in sorted(discovered.items()):
+            if app_id in known:
+                continue
+            apps.append(normalize(app_id, {
+                'name': labels.get(NAME_LABEL, app_id),
+                'description': labels.get(DESCRIPTION_LABEL, ''),
+                'url': labels.get(URL_LABEL, ''),
+                'removable': False,
+            }))
+        for app in apps:
+            keys = self.app_keys(app)
+            app['running'] = bool(keys & running)
+            app['installed'] = bool(keys & existing) or os.path.exists(app['compose_dir'])
+        return apps
+
+    # --- Lifecycle ---
+    def start(self, app, docker):
+        """Starts an app's containers; returns False when they don't exist yet."""
+        if app['container'] and docker.container_state(app['container']) is not None:
+            docker.start(app['container'])
+            return True
+        return docker.start_project(app['project'])
+
+    def stop(self, app, docker):
+        if app['container']:
+            docker.stop(app['container'])
+        docker.stop_project(app['project'])
+
+    def remove(self, app, docker):
+        if app['container']:
+            docker.remove(app['container'])
+        docker.remove_project(app['project'])
+
+
+registry = AppRegistry()
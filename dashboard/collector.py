@@ -0,0 +1,128 @@
+import threading
+import time
+
+from logs import get_logger
+
+log = get_logger('collector')
+
+
+class Probe:
+    """A single status check refreshed on its own interval in a background thread."""
+
+    def __init__(self, name, func, interval, default=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.value = default
+        self.updated = None   # Epoch seconds of the last successful run
+        self.duration = None  # Seconds the last run took
+        self.error = None
+        self._wake = threading.Event()
+        self._cond = threading.Condition()
+        self._runs_started = 0
+        self._runs_finished = 0
+        self._thread = None
+
+    def run_once(self):
+        with self._cond:
+            self._runs_started += 1
+        started = time.time()
+        try:
+            value = self.func()
+            self.value = value
+            self.updated = time.time()
+            self.error = None
+        except Exception as e:
+            # Keep serving the last good value; just record why the refresh failed
+            self.error = str(e)
+            log.warning("probe %s failed: %s", self.name, e, extra={'probe': self.name})
+        finally:
+            self.duration = time.time() - started
+            with self._cond:
+                self._runs_finished += 1
+                self._cond.notify_all()
+
+    def _loop(self, stopping):
+        while not stopping.is_set():
+            # Cleared before the run, not after the wait: a wake() that lands
+            # while the probe runs or between the two calls leaves the event set
+            # and triggers the next run instead of being wiped
+            self._wake.clear()
+            self.run_once()
+            self._wake.wait(self.interval)
+
+    def start(self, stopping):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, args=(stopping,),
+                                        name=f"probe-{self.name}", daemon=True)
+        self._thread.start()
+
+    def wake(self, wait=False, timeout=None):
+        """Triggers a run now; with wait=True blocks until a run that started after this call finishes."""
+        with self._cond:
+            target = self._runs_started + 1
+            self._wake.set()
+            if wait:
+                self._cond.wait_for(lambda: self._runs_finished >= target, timeout)
+
+    def state(self):
+        return {
+            'value': self.value,
+            'updated': self.updated,
+            'age': (time.time() - self.updated) if self.updated else None,
+            'duration': self.duration,
+            'error': self.error,
+        }
+
+
+class StatusCollector:
+    """Keeps the latest result of every registered probe in memory.
+
+    Page renders and APIs read from here instead of running the probes inline,
+    so a hung ping or a slow docker call never blocks a request.
+    """
+
+    def __init__(self):
+        self._probes = {}
+        self._stopping = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def register(self, name, func, interval, default=None):
+        probe = Probe(name, func, interval, default)
+        self._probes[name] = probe
+        if self._started:
+            probe.start(self._stopping)
+        return probe
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stopping.clear()
+            for probe in self._probes.values():
+                probe.start(self._stopping)
+
+    def stop(self):
+        self._stopping.set()
+        for probe in self._probes.values():
+            probe.wake()
+        self._started = False
+
+    def get(self, name):
+        """Returns the last value of a probe (its default until the first run finishes)."""
+        return self._probes[name].value
+
+    def refresh(self, name, wait=False, timeout=10):
+        """Asks a probe to run now instead of at its next interval."""
+        probe = self._probes[name]
+        if not self._started:
+            probe.run_once()
+            return probe.value
+        probe.wake(wait=wait, timeout=timeout)
+        return probe.value
+
+    def snapshot(self):
+        return {name: probe.state() for name, probe in self._probes.items()}
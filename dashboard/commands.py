@@ -0,0 +1,102 @@
+"""Runs external commands with timing, exit codes and output sizes recorded.
+
+Every nmcli/systemctl/ping/... call goes through here, so /api/profile can
+show per-command histograms and which routes spend their time waiting on
+which commands. Failures, timeouts and slow calls are logged as JSON.
+"""
+import os
+import re
+import subprocess
+import time
+
+from logs import get_logger
+from profiling import profile, current_request
+
+DEFAULT_TIMEOUT = 30
+SLOW_MS = 1000
+SUBCOMMAND_RE = re.compile(r'^[A-Za-z][\w.-]*$')
+# Arguments whose following value must not end up in logs
+SECRET_ARGS = {'wifi-sec.psk', '802-11-wireless-security.psk', 'password'}
+
+log = get_logger('commands')
+
+
+def command_name(cmd):
+    """Program plus its subcommand, e.g. 'nmcli connection' or 'systemctl reload'.
+
+    The subcommand is the first argument that is neither an option nor an
+    option's value, so `nmcli -t -f NAME connection show` is 'nmcli connection'.
+    """
+    name = os.path.basename(cmd[0])
+    for previous, arg in zip(cmd, cmd[1:]):
+        if arg.startswith('-') or (previous.startswith('-') and '=' not in previous):
+            continue
+        return f"{name} {arg}" if SUBCOMMAND_RE.match(arg) else name
+    return name
+
+
+def redact(cmd):
+    return [('***' if prev in SECRET_ARGS else arg) for prev, arg in zip([None] + list(cmd), cmd)]
+
+
+def record(cmd, ms, returncode, stdout_bytes=None, timed_out=False):
+    """Adds one finished command to the profile and the log."""
+    name = command_name(cmd)
+    failed = timed_out or returncode != 0
+    profile.record_command(name, ms, error=failed, timeout=timed_out, size=stdout_bytes)
+    ctx = current_request()
+    fields = {'command': name, 'argv': redact(cmd), 'duration_ms': round(ms, 2), 'returncode': returncode,
+              'stdout_bytes': stdout_bytes, 'timed_out': timed_out, 'route': ctx['route'] if ctx else None}
+    if failed:
+        log.warning("command failed: %s", name, extra=fields)
+    elif ms > SLOW_MS:
+        log.info("slow command: %s", name, extra=fields)
+    else:
+        log.debug("command: %s", name, extra=fields)
+
+
+def run(cmd, timeout=DEFAULT_TIMEOUT, check=False, **kwargs):
+    """subprocess.run() with a default timeout; the call is timed and recorded.
+
+    Raises like subprocess.run: TimeoutExpired (after killing the command),
+    CalledProcessError with check=True, OSError if it can't be started.
+    """
+    started = time.perf_counter()
+    returncode, stdout_bytes, timed_out = None, None, False
+    try:
+        result = subprocess.run(cmd, timeout=timeout, **kwargs)
+        returncode = result.returncode
+        stdout_bytes = len(result.stdout) if result.stdout is not None else None
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        raise
+    finally:
+        record(cmd, (time.perf_counter() - started) * 1000, returncode, stdout_bytes, timed_out)
+    if check:
+        result.check_returncode()
+    return result
+
+
+def check_output(cmd, **kwargs):
+    return run(cmd, stdout=subprocess.PIPE, check=True, **kwargs).stdout
+
+
+def check_call(cmd, **kwargs):
+    run(cmd, check=True, **kwargs)
+    return 0
+
+
+def spawn(cmd, **kwargs):
+    """Starts a command without waiting for it (e.g. shutdown); only the launch is timed."""
+    started = time.perf_counter()
+    try:
+        proc = subprocess.Popen(cmd, **kwargs)
+    except OSError:
+        record(cmd, (time.perf_counter() - started) * 1000, None)
+        raise
+    ms = (time.perf_counter() - started) * 1000
+    name = command_name(cmd)
+    profile.record_command(name, ms)
+    log.info("spawned: %s", name, extra={'command': name, 'argv': redact(cmd), 'pid': proc.pid,
+                                         'duration_ms': round(ms, 2)})
+    return proc
@@ -0,0 +1,161 @@
+import random
+import re
+import socket
+import struct
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import commands
+from logs import get_logger
+
+# (name, kind, host, port)
+DEFAULT_TARGETS = [
+    ('icmp-google', 'icmp', '8.8.8.8', None),
+    ('icmp-cloudflare', 'icmp', '1.1.1.1', None),
+    ('dns-cloudflare', 'dns', '1.1.1.1', 53),
+    ('https-cloudflare', 'tcp', '1.1.1.1', 443),
+]
+
+log = get_logger('connectivity')
+
+
+def probe_icmp(host, timeout):
+    out = commands.run(['ping', '-n', '-c', '1', '-W', str(max(1, int(timeout))), host],
+                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                       timeout=timeout + 1)
+    if out.returncode != 0:
+        raise OSError(f"ping exited {out.returncode}")
+    match = re.search(r'time[=<]([\d.]+)', out.stdout)
+    return float(match.group(1)) if match else None
+
+
+def probe_dns(host, timeout, port=53, name='example.com'):
+    """Sends one A query over UDP and waits for the matching reply."""
+    query_id = random.randint(0, 0xFFFF)
+    header = struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.')) + b'\x00'
+    packet = header + qname + struct.pack('>HH', 1, 1)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        started = time.monotonic()
+        sock.sendto(packet, (host, port))
+        while True:
+            data, _ = sock.recvfrom(512)
+            if len(data) >= 12 and struct.unpack('>H', data[:2])[0] == query_id:
+                return (time.monotonic() - started) * 1000
+
+
+def probe_tcp(host, timeout, port=443):
+    started = time.monotonic()
+    with socket.create_connection((host, port), timeout=timeout):
+        return (time.monotonic() - started) * 1000
+
+
+class ConnectivityMonitor:
+    """Checks internet reachability in the background against several targets at once.
+
+    All targets are probed concurrently with short timeouts; the device is
+    online if any of them answers. While offline the check interval backs off
+    exponentially so a dead uplink isn't hammered. The last result, its age and
+    a bounded history of latency/loss are kept for the dashboard.
+    """
+
+    def __init__(self, targets=None, timeout=2.0, interval=30, offline_interval=5,
+                 max_interval=300, history=120):
+        self.targets = targets or DEFAULT_TARGETS
+        self.timeout = timeout
+        self.interval = interval
+        self.offline_interval = offline_interval
+        self.max_interval = max_interval
+        self.history = deque(maxlen=history)
+        self.online = False
+        self.checked = None
+        self.latency_ms = None
+        self.results = {}
+        self.next_interval = offline_interval
+        self._failures = 0
+        self._wake = threading.Event()
+        self._thread = None
+        self._pool = ThreadPoolExecutor(max_workers=len(self.targets), thread_name_prefix='connectivity')
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='connectivity', daemon=True)
+        self._thread.start()
+
+    def check_now(self):
+        self._wake.set()
+
+    def _probe(self, target):
+        name, kind, host, port = target
+        started = time.monotonic()
+        try:
+            if kind == 'icmp':
+                latency = probe_icmp(host, self.timeout)
+            elif kind == 'dns':
+                latency = probe_dns(host, self.timeout, port or 53)
+            else:
+                latency = probe_tcp(host, self.timeout, port or 443)
+            if latency is None:
+                latency = (time.monotonic() - started) * 1000
+            return name, {'ok': True, 'latency_ms': round(latency, 1)}
+        except (OSError, subprocess.SubprocessError) as e:
+            return name, {'ok': False, 'error': str(e) or e.__class__.__name__}
+
+    def check(self):
+        results = dict(self._pool.map(self._probe, self.targets))
+        latencies = [r['latency_ms'] for r in results.values() if r['ok']]
+        self.results = results
+        self.online = bool(latencies)
+        self.latency_ms = min(latencies) if latencies else None
+        self.checked = time.time()
+        self.history.append({
+            'time': self.checked,
+            'online': self.online,
+            'latency_ms': self.latency_ms,
+            'ok': len(latencies),
+            'total': len(results),
+        })
+        if self.online:
+            self._failures = 0
+            self.next_interval = self.interval
+        else:
+            # Exponential backoff while offline: 5s, 10s, 20s ... capped
+            self.next_interval = min(self.max_interval, self.offline_interval * (2 ** self._failures))
+            self._failures += 1
+        return self.online
+
+    def _run(self):
+        while True:
+            # Cleared before the check so a check_now() during it isn't lost
+            self._wake.clear()
+            try:
+                self.check()
+            except Exception as e:
+                log.warning("connectivity check failed: %s", e)
+            self._wake.wait(self.next_interval)
+
+    def loss(self):
+        """Fraction of failed target probes across the kept history."""
+        total = sum(h['total'] for h in self.history)
+        if not total:
+            return None
+        return round(1 - sum(h['ok'] for h in self.history) / total, 3)
+
+    def status(self, with_history=False):
+        data = {
+            'online': self.online,
+            'checked': self.checked,
+            'age': (time.time() - self.checked) if self.checked else None,
+            'latency_ms': self.latency_ms,
+            'loss': self.loss(),
+            'check_interval': self.next_interval,
+            'targets': self.results,
+        }
+        if with_history:
+            data['history'] = list(self.history)
+        return data
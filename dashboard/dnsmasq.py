@@ -0,0 +1,406 @@
+import ipaddress
+import os
+import re
+import subprocess
+import threading
+
+import commands
+from fileutil import atomic_write
+from logs import get_logger
+
+# --- DNS & DHCP Config Helpers ---
+CONFIG_DIR = os.environ.get('PIONEER_DNSMASQ_DIR', '/etc/dnsmasq.d')
+DHCP_CONF = os.path.join(CONFIG_DIR, 'pioneer-dhcp.conf')
+DNS_CONF = os.path.join(CONFIG_DIR, 'pioneer-dns.conf')
+
+MAC_RE = re.compile(r'^[0-9A-Fa-f]{2}(:[0-9A-Fa-f]{2}){5}$')
+HOSTNAME_RE = re.compile(r'^(?=.{1,253}$)[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?(\.[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*$')
+
+log = get_logger('dnsmasq')
+
+# Held from reading the config files through the reload (and any rollback), so
+# concurrent transactions can't merge into stale copies or undo each other
+_commit_lock = threading.Lock()
+
+
+class ConfigError(Exception):
+    pass
+
+
+class BatchError(ConfigError):
+    """An operation in a batch was rejected; `index` is its position in the batch."""
+
+    def __init__(self, index, message):
+        super().__init__(f"Operation {index}: {message}")
+        self.index = index
+
+
+def reload_dnsmasq():
+    """Reloads dnsmasq configuration safely."""
+    try:
+        # Check config syntax first
+        commands.check_output(['dnsmasq', '--test'], stderr=subprocess.STDOUT)
+        
+        # Check if running
+        try:
+            commands.check_call(['systemctl', 'is-active', '--quiet', 'dnsmasq'])
+            is_running = True
+        except subprocess.CalledProcessError:
+            is_running = False
+
+        if is_running:
+            # Try reload
+            try:
+                commands.check_output(['systemctl', 'reload', 'dnsmasq'], stderr=subprocess.STDOUT)
+            except subprocess.CalledProcessError as e:
+                log.warning("dnsmasq reload failed, restarting: %s", e.output.decode().strip())
+                # Fallback to restart
+                commands.check_output(['systemctl', 'restart', 'dnsmasq'], stderr=subprocess.STDOUT)
+        else:
+            # Not running, just start
+            commands.check_output(['systemctl', 'start', 'dnsmasq'], stderr=subprocess.STDOUT)
+
+    except subprocess.CalledProcessError as e:
+        err_msg = e.output.decode().strip() if e.output else str(e)
+        log.error("dnsmasq operation failed: %s", err_msg)
+        raise Exception(f"Dnsmasq Error: {err_msg}")
+    except Exception as e:
+        log.exception("dnsmasq reload failed")
+        raise Exception(f"System Error: {str(e)}")
+
+def ensure_config_dir():
+    if not os.path.exists(CONFIG_DIR):
+        os.makedirs(CONFIG_DIR)
+
+def _parse_reservation(parts):
+    # dhcp-host=mac,ip,[hostname]
+    return {
+        'key': parts[0].strip().lower(),
+        'mac': parts[0].strip(),
+        'ip': parts[1].strip() if len(parts) > 1 else '',
+        'hostname': parts[2].strip() if len(parts) > 2 else '',
+        'conflict': False,
+    }
+
+
+def _parse_record(parts):
+    # host-record=hostname,ip
+    if len(parts) < 2:
+        return None
+    return {
+        'key': parts[0].strip().lower(),
+        'hostname': parts[0].strip(),
+        'ip': parts[1].strip(),
+        'conflict': False,
+    }
+
+
+class ConfigIndex:
+    """Parsed, keyed view of one dnsmasq.d file.
+
+    The file is only re-parsed when its inode, mtime or size changes, so
+    repeated page renders are dictionary reads. `parse` turns the fields of
+    one `prefix=` line into an entry dict (or None to skip it); entries are
+    keyed by their first field (MAC for dhcp-host, hostname for
+    host-record), lowercased. With `conflicts`, entries sharing an IP are
+    flagged.
+    """
+
+    def __init__(self, path, prefix, parse, conflicts=True):
+        self.path = path
+        self.prefix = prefix
+        self.parse = parse
+        self.conflicts = conflicts
+        self._signature = None
+        self._lock = threading.Lock()
+        self.entries = []
+        self.by_key = {}
+        self.by_ip = {}
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        with self._lock:
+            signature = self._stat()
+            if signature == self._signature and self._signature is not None:
+                return self
+            self.load_lines(_read_lines(self.path) if signature else [])
+            self._signature = signature
+        return self
+
+    def load_lines(self, lines):
+        entries, by_key, by_ip = [], {}, {}
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(self.prefix):
+                continue
+            entry = self.parse(line[len(self.prefix):].split(','))
+            if entry is None:
+                continue
+            entries.append(entry)
+            by_key[entry['key']] = entry
+            if entry.get('ip'):
+                by_ip.setdefault(entry['ip'], []).append(entry)
+        if self.conflicts:
+            for group in by_ip.values():
+                if len(group) > 1:
+                    for entry in group:
+                        entry['conflict'] = True
+        self.entries, self.by_key, self.by_ip = entries, by_key, by_ip
+
+    def all(self):
+        return [dict(e) for e in self.refresh().entries]
+
+    def query(self, page=1, per_page=50, search=''):
+        """One page of entries whose key, IP or hostname contains `search`."""
+        entries = self.refresh().entries
+        search = search.strip().lower()
+        if search:
+            entries = [e for e in entries
+                       if search in e['key'] or search in e['ip'] or search in e['hostname'].lower()]
+        per_page = max(1, min(per_page, 500))
+        page = max(1, page)
+        start = (page - 1) * per_page
+        return {
+            'total': len(entries),
+            'page': page,
+            'per_page': per_page,
+            'pages': (len(entries) + per_page - 1) // per_page,
+            'entries': [dict(e) for e in entries[start:start + per_page]],
+        }
+
+
+class ReservationIndex(ConfigIndex):
+    def __init__(self, path=DHCP_CONF):
+        super().__init__(path, 'dhcp-host=', _parse_reservation)
+
+
+class RecordIndex(ConfigIndex):
+    def __init__(self, path=DNS_CONF):
+        # Several names for one IP is normal for DNS; only reservations treat it as a conflict
+        super().__init__(path, 'host-record=', _parse_record, conflicts=False)
+
+
+reservations = ReservationIndex()
+records = RecordIndex()
+
+
+def validate_mac(mac):
+    mac = mac.strip()
+    if not MAC_RE.match(mac):
+        raise ConfigError(f"Invalid MAC address: {mac}")
+    return mac.lower()
+
+def validate_ip(ip, version=None):
+    ip = ip.strip()
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        raise ConfigError(f"Invalid IP address: {ip}")
+    if version and addr.version != version:
+        raise ConfigError(f"Expected an IPv{version} address: {ip}")
+    return ip
+
+def validate_hostname(hostname, required=True):
+    hostname = hostname.strip()
+    if not hostname and not required:
+        return hostname
+    if not HOSTNAME_RE.match(hostname):
+        raise ConfigError(f"Invalid hostname: {hostname}")
+    return hostname
+
+def validate_key(key):
+    """Loose check for deletes, so entries written by hand can still be removed."""
+    key = key.strip()
+    if not key or any(c in key for c in ',\n\r\t '):
+        raise ConfigError(f"Invalid entry: {key!r}")
+    return key.lower()
+
+def _read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return f.readlines()
+
+def _entry_key(line, prefix):
+    """Returns the first field of a `prefix=` line (MAC or hostname), or None for other lines."""
+    line = line.strip()
+    if not line.startswith(prefix):
+        return None
+    return line[len(prefix):].split(',')[0].strip().lower()
+
+
+class ConfigTransaction:
+    """Applies a batch of DHCP reservation and DNS record changes at once.
+
+    Every change is validated before anything is written, each touched file is
+    replaced atomically, and dnsmasq is reloaded once at the end. If the reload
+    fails (e.g. `dnsmasq --test` rejects the result), the previous files are put
+    back so the running config and the files on disk stay in sync.
+    """
+
+    def __init__(self, dhcp_conf=DHCP_CONF, dns_conf=DNS_CONF, reload=None):
+        self.dhcp_conf = dhcp_conf
+        self.dns_conf = dns_conf
+        self.reload = reload or reload_dnsmasq
+        self._reservations = []  # (op, key, line or None)
+        self._records = []
+
+    def add_reservation(self, mac, ip, hostname=""):
+        mac = validate_mac(mac)
+        ip = validate_ip(ip, version=4)
+        hostname = validate_hostname(hostname or "", required=False)
+        # Format: dhcp-host=MAC,IP,HOSTNAME
+        entry = f"dhcp-host={mac},{ip}"
+        if hostname:
+            entry += f",{hostname}"
+        self._reservations.append(('set', mac, entry + "\n"))
+
+    def delete_reservation(self, mac):
+        self._reservations.append(('delete', validate_key(mac), None))
+
+    def add_record(self, hostname, ip):
+        hostname = validate_hostname(hostname)
+        ip = validate_ip(ip)
+        self._records.append(('set', hostname.lower(), f"host-record={hostname},{ip}\n"))
+
+    def delete_record(self, hostname):
+        self._records.append(('delete', validate_key(hostname), None))
+
+    @staticmethod
+    def _field(op, name, required=True):
+        value = op.get(name)
+        if value is None and not required:
+            return ''
+        if not isinstance(value, str):
+            raise ConfigError(f"'{name}' is required" if value is None else f"'{name}' must be a string")
+        return value
+
+    def apply_op(self, op):
+        """Adds one operation given in the /api/action command format."""
+        if not isinstance(op, dict):
+            raise ConfigError("Each operation must be an object")
+        cmd = op.get('command')
+        if cmd == 'add_dhcp_reservation':
+            self.add_reservation(self._field(op, 'mac'), self._field(op, 'ip'),
+                                 self._field(op, 'hostname', required=False))
+        elif cmd == 'del_dhcp_reservation':
+            self.delete_reservation(self._field(op, 'mac'))
+        elif cmd == 'add_dns_record':
+            self.add_record(self._field(op, 'hostname'), self._field(op, 'ip'))
+        elif cmd == 'del_dns_record':
+            self.delete_record(self._field(op, 'hostname'))
+        else:
+            raise ConfigError(f"Unknown batch command: {cmd}")
+
+    def apply_ops(self, ops):
+        """Adds a list of operations; a rejected one raises BatchError with its index."""
+        if not isinstance(ops, list):
+            raise ConfigError("'ops' must be a list")
+        for index, op in enumerate(ops):
+            try:
+                self.apply_op(op)
+            except ConfigError as e:
+                raise BatchError(index, e) from None
+
+    def __len__(self):
+        return len(self._reservations) + len(self._records)
+
+    @staticmethod
+    def _merge(lines, changes, prefix):
+        """Applies set/delete ops by exact key, one index pass plus O(1) per op."""
+        lines = list(lines)
+        positions = {}
+        for i, line in enumerate(lines):
+            key = _entry_key(line, prefix)
+            if key is not None:
+                positions.setdefault(key, []).append(i)
+        for op, key, entry in changes:
+            found = positions.pop(key, [])
+            if op == 'set':
+                if found:
+                    lines[found[0]] = entry
+                    # Collapse duplicates of the same key into the updated line
+                    for i in found[1:]:
+                        lines[i] = None
+                    positions[key] = [found[0]]
+                else:
+                    # Ensure we are on a new line if the file has content and no trailing newline
+                    last = next((i for i in range(len(lines) - 1, -1, -1) if lines[i] is not None), None)
+                    if last is not None and not lines[last].endswith('\n'):
+                        lines[last] += '\n'
+                    lines.append(entry)
+                    positions[key] = [len(lines) - 1]
+            else:
+                for i in found:
+                    lines[i] = None
+        return [line for line in lines if line is not None]
+
+    def _check_conflicts(self, merged):
+        """Refuses reservations that would hand one IP to two different MACs."""
+        changed = {key for op, key, entry in self._reservations if op == 'set'}
+        if not changed:
+            return
+        index = ReservationIndex(self.dhcp_conf)
+        index.load_lines(merged)
+        for key in changed:
+            entry = index.by_key[key]
+            others = [e['mac'] for e in index.by_ip.get(entry['ip'], []) if e['key'] != key]
+            if others:
+                raise ConfigError(f"IP {entry['ip']} is already reserved for {', '.join(others)}")
+
+    def commit(self):
+        if not len(self):
+            return 0
+        ensure_config_dir()
+        with _commit_lock:
+            originals = {}
+            plan = []
+            if self._reservations:
+                originals[self.dhcp_conf] = _read_lines(self.dhcp_conf)
+                merged = self._merge(originals[self.dhcp_conf], self._reservations, 'dhcp-host=')
+                self._check_conflicts(merged)
+                plan.append((self.dhcp_conf, merged))
+            if self._records:
+                originals[self.dns_conf] = _read_lines(self.dns_conf)
+                plan.append((self.dns_conf, self._merge(originals[self.dns_conf], self._records, 'host-record=')))
+
+            for path, lines in plan:
+                atomic_write(path, lines)
+            try:
+                self.reload()
+            except Exception:
+                # Roll back so the files match what dnsmasq is actually serving
+                for path, lines in originals.items():
+                    atomic_write(path, lines)
+                raise
+        applied = len(self)
+        self._reservations = []
+        self._records = []
+        return applied
+
+
+def save_dhcp_reservation(mac, ip, hostname=""):
+    tx = ConfigTransaction()
+    tx.add_reservation(mac, ip, hostname)
+    tx.commit()
+
+def delete_dhcp_reservation(mac):
+    tx = ConfigTransaction()
+    tx.delete_reservation(mac)
+    tx.commit()
+
+def save_dns_record(hostname, ip):
+    tx = ConfigTransaction()
+    tx.add_record(hostname, ip)
+    tx.commit()
+
+def delete_dns_record(hostname):
+    tx = ConfigTransaction()
+    tx.delete_record(hostname)
+    tx.commit()
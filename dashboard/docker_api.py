@@ -0,0 +1,330 @@
+import http.client
+import json
+import os
+import queue
+import socket
+from urllib.parse import urlencode, quote
+
+DOCKER_SOCKET = os.environ.get('PIONEER_DOCKER_SOCKET', '/var/run/docker.sock')
+COMPOSE_PROJECT_LABEL = 'com.docker.compose.project'
+COMPOSE_SERVICE_LABEL = 'com.docker.compose.service'
+COMPOSE_DEPENDS_LABEL = 'com.docker.compose.depends_on'
+
+
+class DockerError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that connects to a unix domain socket instead of TCP."""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerClient:
+    """Minimal Docker Engine API client with a small keep-alive connection pool.
+
+    Talks HTTP over the engine's unix socket, so listing containers or
+    starting a compose project costs a socket round-trip instead of
+    forking the docker CLI.
+    """
+
+    def __init__(self, socket_path=DOCKER_SOCKET, pool_size=4, timeout=10):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    # --- Connection pool ---
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def available(self):
+        try:
+            self.request('GET', '/_ping', raw=True)
+            return True
+        except (DockerError, OSError):
+            return False
+
+    def request(self, method, path, params=None, body=None, timeout=None, raw=False):
+        """Sends one API request and returns the decoded JSON body (or bytes when raw)."""
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        headers = {'Host': 'docker'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        # Slow calls (e.g. stop with a grace period) get their own connection and timeout.
+        # A pooled connection may have been closed by the daemon while idle; retry once on a fresh one.
+        for attempt in (0, 1):
+            if timeout is not None:
+                conn = UnixHTTPConnection(self.socket_path, timeout=timeout)
+            elif attempt == 0:
+                conn = self._acquire()
+            else:
+                conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close or timeout is not None:
+                conn.close()
+            else:
+                self._release(conn)
+            break
+
+        if resp.status >= 400:
+            try:
+                message = json.loads(data).get('message', '')
+            except ValueError:
+                message = data.decode(errors='replace')
+            raise DockerError(f"{method} {path} failed ({resp.status}): {message}", resp.status)
+        if raw:
+            return data
+        if not data:
+            return None
+        return json.loads(data)
+
+    # --- Containers ---
+    def containers(self, all=False, labels=None, names=None):
+        """Lists containers, optionally filtered by label ('key' or 'key=value') or exact name."""
+        filters = {}
+        if labels:
+            filters['label'] = list(labels)
+        if names:
+            filters['name'] = list(names)
+        params = {'all': '1' if all else '0'}
+        if filters:
+            params['filters'] = json.dumps(filters)
+        return self.request('GET', '/containers/json', params=params)
+
+    def inspect(self, container):
+        return self.request('GET', f"/containers/{quote(container)}/json")
+
+    def container_state(self, container):
+        """Returns the State dict of a container, or None if it does not exist."""
+        try:
+            return self.inspect(container)['State']
+        except DockerError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def start(self, container):
+        # 304 means it was already running
+        try:
+            self.request('POST', f"/containers/{quote(container)}/start")
+        except DockerError as e:
+            if e.status != 304:
+                raise
+
+    def stop(self, container, timeout=10):
+        try:
+            self.request('POST', f"/containers/{quote(container)}/stop", params={'t': timeout},
+                         timeout=self.timeout + timeout)
+        except DockerError as e:
+            if e.status != 304:
+                raise
+
+    def remove(self, container, force=True):
+        try:
+            self.request('DELETE', f"/containers/{quote(container)}", params={'force': '1' if force else '0'})
+        except DockerError as e:
+            if e.status != 404:
+                raise
+
+    def events(self, filters=None):
+        """Yields decoded events from the /events stream until the daemon closes it."""
+        params = {}
+        if filters:
+            params['filters'] = json.dumps(filters)
+        path = f"/events?{urlencode(params)}" if params else '/events'
+        # Long-lived stream: dedicated connection, no read timeout
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            conn.request('GET', path, headers={'Host': 'docker'})
+            resp = conn.getresponse()
+            if resp.status >= 400:
+                raise DockerError(f"GET {path} failed ({resp.status})", resp.status)
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    # --- Images ---
+    def _stream(self, method, path, params=None, body=None, headers=None):
+        """Opens a dedicated connection for a long transfer; returns (conn, response)."""
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            conn.request(method, path, body=body, headers=dict(headers or {}, Host='docker'))
+            resp = conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+        if resp.status >= 400:
+            data = resp.read()
+            conn.close()
+            try:
+                message = json.loads(data).get('message', '')
+            except ValueError:
+                message = data.decode(errors='replace')
+            raise DockerError(f"{method} {path} failed ({resp.status}): {message}", resp.status)
+        return conn, resp
+
+    @staticmethod
+    def _progress_errors(resp):
+        """Reads a JSON-lines progress stream (pull/load), raising on the first error entry."""
+        last = None
+        while True:
+            line = resp.readline()
+            if not line:
+                return last
+            line = line.strip()
+            if not line:
+                continue
+            last = json.loads(line)
+            if last.get('error') or last.get('errorDetail'):
+                raise DockerError(last.get('error') or last['errorDetail'].get('message', 'unknown error'))
+
+    def image_id(self, image):
+        """Returns the local image ID for a reference, or None if it isn't present."""
+        try:
+            return self.request('GET', f"/images/{quote(image, safe='/:@')}/json")['Id']
+        except DockerError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def pull(self, image):
+        name, tag = image, 'latest'
+        # A ':' after the last '/' is a tag; one before it is a registry port
+        if ':' in image.rsplit('/', 1)[-1]:
+            name, tag = image.rsplit(':', 1)
+        conn, resp = self._stream('POST', '/images/create', params={'fromImage': name, 'tag': tag})
+        try:
+            return self._progress_errors(resp)
+        finally:
+            conn.close()
+
+    def save(self, image, fileobj, chunk_size=1024 * 1024):
+        """Streams `docker save` output for one image into fileobj; returns the byte count."""
+        conn, resp = self._stream('GET', f"/images/{quote(image, safe='/:@')}/get")
+        size = 0
+        try:
+            while True:
+                chunk = resp.read(chunk_size)
+                if not chunk:
+                    return size
+                fileobj.write(chunk)
+                size += len(chunk)
+        finally:
+            conn.close()
+
+    def load(self, fileobj, size):
+        """Uploads a `docker save` tarball from fileobj (read sequentially, never held in memory)."""
+        conn, resp = self._stream('POST', '/images/load', params={'quiet': '1'}, body=fileobj,
+                                  headers={'Content-Type': 'application/x-tar', 'Content-Length': str(size)})
+        try:
+            return self._progress_errors(resp)
+        finally:
+            conn.close()
+
+    # --- Compose projects ---
+    def project_containers(self, project, all=True):
+        return self.containers(all=all, labels=[f"{COMPOSE_PROJECT_LABEL}={project}"])
+
+    @staticmethod
+    def _start_order(containers):
+        """Orders a project's containers so services with depends_on start after the rest."""
+        def depends(c):
+            deps = c.get('Labels', {}).get(COMPOSE_DEPENDS_LABEL, '')
+            return 1 if deps else 0
+        return sorted(containers, key=depends)
+
+    def start_project(self, project):
+        """Starts every existing container of a compose project.
+
+        Returns False when the project has no containers yet; creating them
+        needs the compose file, so callers fall back to `docker compose up`.
+        """
+        containers = self.project_containers(project)
+        if not containers:
+            return False
+        for c in self._start_order(containers):
+            if c.get('State') != 'running':
+                self.start(c['Id'])
+        return True
+
+    def stop_project(self, project, timeout=10):
+        containers = self.project_containers(project, all=False)
+        for c in reversed(self._start_order(containers)):
+            self.stop(c['Id'], timeout=timeout)
+        return len(containers)
+
+    def remove_project(self, project, timeout=10):
+        """Equivalent of `docker compose down`: stops and removes containers and project networks."""
+        self.stop_project(project, timeout=timeout)
+        for c in self.project_containers(project):
+            self.remove(c['Id'])
+        networks = self.request('GET', '/networks', params={
+            'filters': json.dumps({'label': [f"{COMPOSE_PROJECT_LABEL}={project}"]})
+        }) or []
+        for net in networks:
+            try:
+                self.request('DELETE', f"/networks/{net['Id']}")
+            except DockerError as e:
+                if e.status != 404:
+                    raise
+
+
+_client = None
+
+
+def get_client():
+    """Shared client for the dashboard process."""
+    global _client
+    if _client is None:
+        _client = DockerClient()
+    return _client
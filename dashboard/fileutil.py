@@ -0,0 +1,45 @@
+import contextlib
+import os
+import tempfile
+
+DEFAULT_MODE = 0o644
+
+
+@contextlib.contextmanager
+def atomic_file(path, binary=False, mode=None):
+    """Opens a temp file next to `path` that replaces it only if the block succeeds.
+
+    The data is fsynced before the rename, so readers (and a power cut) see
+    either the old file or the complete new one. The new file gets `mode`,
+    or the old file's mode, or 0644.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.pioneer-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is None:
+            try:
+                mode = os.stat(path).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = DEFAULT_MODE
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path, data, mode=None):
+    """Replaces a file with `data` (str, bytes or a list of lines) atomically."""
+    binary = isinstance(data, (bytes, bytearray))
+    with atomic_file(path, binary=binary, mode=mode) as f:
+        if isinstance(data, (str, bytes, bytearray)):
+            f.write(data)
+        else:
+            f.writelines(data)
@@ -0,0 +1,51 @@
+# Gunicorn settings for the dashboard in production:
+#   gunicorn --config gunicorn.conf.py app:app
+# `python3 app.py` still starts the Flask development server for local work.
+import grp
+import os
+
+# Nginx proxies /admin/ to this socket; the master keeps it open across reloads.
+# Under systemd socket activation (LISTEN_FDS) gunicorn uses the inherited
+# socket instead and this is ignored.
+bind = os.environ.get('PIONEER_BIND', 'unix:/run/pioneer-dashboard/dashboard.sock')
+umask = 0o007
+# gunicorn creates the socket as root:root; with the umask above only this
+# group (nginx's workers) can connect besides root
+SOCKET_GROUP = os.environ.get('PIONEER_SOCKET_GROUP', 'www-data')
+
+# One process with a thread pool. Probes, the job queue, the Docker event
+# watcher and the metrics rings live in process memory, so extra workers would
+# each run their own copy; scale with threads instead. Every open SSE stream
+# (/api/events, job logs) holds a thread; the app refuses streams past
+# PIONEER_MAX_STREAMS, and the pool is that plus threads for plain requests.
+MAX_STREAMS = int(os.environ.get('PIONEER_MAX_STREAMS', 4))
+REQUEST_THREADS = 4
+workers = int(os.environ.get('PIONEER_WORKERS', 1))
+worker_class = 'gthread'
+threads = max(int(os.environ.get('PIONEER_THREADS', 0)), MAX_STREAMS + REQUEST_THREADS)
+
+# Background threads start at import time and must be created in the worker,
+# not in the master before fork
+preload_app = False
+
+# gthread heartbeats from its main loop, so long-running streams don't trip this
+timeout = 60
+# On HUP/TERM the old worker finishes in-flight requests for up to this long
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('PIONEER_LOG_LEVEL', 'info')
+proc_name = 'pioneer-dashboard'
+
+
+def when_ready(server):
+    """Hands the unix socket to SOCKET_GROUP once gunicorn has created it."""
+    path = bind[len('unix:'):] if bind.startswith('unix:') else None
+    if not path or not os.path.exists(path):
+        return
+    try:
+        os.chown(path, -1, grp.getgrnam(SOCKET_GROUP).gr_gid)
+    except (KeyError, OSError) as e:
+        server.log.warning("could not give %s to group %s: %s", path, SOCKET_GROUP, e)
@@ -0,0 +1,172 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from flask import request, url_for
+
+try:
+    import brotli
+except ImportError:  # python3-brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE = {'text/html', 'text/css', 'text/plain', 'text/javascript',
+                'application/javascript', 'application/json', 'image/svg+xml'}
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Higher levels cost too much CPU on a Pi for dynamic responses
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+class StaticAssets:
+    """Content hashes for files under the static folder, for cache-busting URLs.
+
+    `url(filename)` returns the static URL with `?v=<hash>`; the hash changes
+    whenever the file does, so those URLs can be cached indefinitely.
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._lock = threading.Lock()
+        self._digests = {}  # filename -> (mtime_ns, size, digest)
+
+    def digest(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        st = os.stat(path)
+        with self._lock:
+            cached = self._digests.get(filename)
+            if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._digests[filename] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def url(self, filename):
+        return url_for('static', filename=filename, v=self.digest(filename))
+
+
+def stable_etag(data, volatile):
+    """ETag of JSON-able `data` with the `volatile` keys left out at every level.
+
+    For responses that carry timestamps and ages next to their values: two
+    bodies that differ only in those fields get the same tag, so polling
+    clients see 304 until a value actually changes.
+    """
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k not in volatile}
+        if isinstance(value, (list, tuple)):
+            return [strip(v) for v in value]
+        return value
+
+    body = json.dumps(strip(data), sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(body.encode()).hexdigest()
+
+
+def negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output stable for identical input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class HTTPCache:
+    """after_request hook adding validators, cache headers and compression.
+
+    - Fingerprinted static assets (`?v=`) get a one-year immutable Cache-Control.
+    - GET JSON responses get a content ETag (unless the view set its own, e.g.
+      with stable_etag) and turn into 304 when it matches If-None-Match, so
+      polling clients on slow links only pay for changes.
+    - Text responses over MIN_COMPRESS_SIZE are gzip/brotli encoded. Streamed
+      responses (SSE, job log streams) are left alone so events aren't held back.
+    """
+
+    def __init__(self, app=None, max_static_cache=32):
+        self.max_static_cache = max_static_cache
+        self._static_cache = {}  # (path, etag, encoding) -> compressed bytes
+        self._lock = threading.Lock()
+        self.assets = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.assets = StaticAssets(app.static_folder)
+        app.jinja_env.globals['asset_url'] = self.assets.url
+        app.after_request(self.process)
+
+    def process(self, response):
+        if request.endpoint == 'static' and request.args.get('v') and response.status_code in (200, 304):
+            response.headers['Cache-Control'] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+
+        # Static files are sent as file streams; everything else streamed is live output
+        if request.endpoint != 'static' and (response.is_streamed or response.mimetype == 'text/event-stream'):
+            return response
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+
+        encoding = None
+        if response.mimetype in COMPRESSIBLE:
+            response.vary.add('Accept-Encoding')
+            encoding = negotiate_encoding()
+
+        if request.method == 'GET' and response.mimetype == 'application/json':
+            if response.get_etag()[0] is None:
+                data = response.get_data()
+                # Weak when the body will be re-encoded: same content, different bytes
+                response.set_etag(hashlib.sha1(data).hexdigest(),
+                                  weak=bool(encoding and len(data) >= MIN_COMPRESS_SIZE))
+            # Private: responses depend on the session; revalidate on every use
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if encoding is None:
+            return response
+        if request.endpoint == 'static':
+            return self._compress_static(response, encoding)
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        self._encode(response, compress(data, encoding), encoding)
+        return response
+
+    def _compress_static(self, response, encoding):
+        # Static files are few and never change under the same ETag: compress once
+        etag, _ = response.get_etag()
+        key = (request.path, etag, encoding)
+        with self._lock:
+            body = self._static_cache.get(key)
+        response.direct_passthrough = False
+        if body is None:
+            data = response.get_data()
+            if len(data) < MIN_COMPRESS_SIZE:
+                return response
+            body = compress(data, encoding)
+            with self._lock:
+                if len(self._static_cache) >= self.max_static_cache:
+                    self._static_cache.pop(next(iter(self._static_cache)))
+                self._static_cache[key] = body
+        else:
+            response.close()  # Release the unread file
+        if etag:
+            response.set_etag(etag, weak=True)
+        self._encode(response, body, encoding)
+        return response
+
+    @staticmethod
+    def _encode(response, body, encoding):
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
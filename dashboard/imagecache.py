@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Local cache of `docker save` tarballs so apps install without a network.
+
+    imagecache.py warm [--app ID ...]    pull and store images of catalogue apps
+    imagecache.py load --app ID          load an app's cached images into Docker
+    imagecache.py status
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+
+from catalog import registry
+from docker_api import DockerError, get_client
+from fileutil import atomic_file, atomic_write
+
+CACHE_DIR = os.environ.get('PIONEER_IMAGE_CACHE', '/var/cache/pioneer/images')
+INDEX_FILE = 'index.json'
+CHUNK_SIZE = 1024 * 1024
+
+
+class ImageCacheError(Exception):
+    pass
+
+
+class HashingReader:
+    """File wrapper that hashes what is read through it, so a load is also its checksum pass."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+
+class HashingWriter:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.fileobj.write(data)
+
+
+class ImageCache:
+    """One tarball per image reference plus an index of sha256, size and image ID.
+
+    The index is re-read only when its stat signature changes, so status
+    checks from the dashboard don't touch the tarballs.
+    """
+
+    def __init__(self, client, path=CACHE_DIR):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = {}
+        self._signature = None
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, INDEX_FILE)
+
+    @staticmethod
+    def filename(image):
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', image) + '.tar'
+
+    def _stat(self):
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def index(self):
+        with self._lock:
+            signature = self._stat()
+            if signature != self._signature:
+                try:
+                    with open(self.index_path, 'r') as f:
+                        self._index = json.load(f)
+                except (OSError, ValueError):
+                    self._index = {}
+                self._signature = signature
+            return dict(self._index)
+
+    def _update_index(self, image, entry):
+        with self._lock:
+            index = {}
+            try:
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                pass
+            if entry is None:
+                index.pop(image, None)
+            else:
+                index[image] = entry
+            atomic_write(self.index_path, json.dumps(index, indent=2))
+
+    def fetch(self, image, pull=True):
+        """Pulls an image (if asked) and stores its tarball; returns the index entry."""
+        os.makedirs(self.path, exist_ok=True)
+        if pull:
+            self.client.pull(image)
+        image_id = self.client.image_id(image)
+        if image_id is None:
+            raise ImageCacheError(f"{image} is not available locally")
+        cached = self.index().get(image)
+        if cached and cached.get('image_id') == image_id and os.path.exists(os.path.join(self.path, cached['file'])):
+            return cached  # Pull brought nothing new
+        with atomic_file(os.path.join(self.path, self.filename(image)), binary=True) as f:
+            writer = HashingWriter(f)
+            size = self.client.save(image, writer)
+        entry = {
+            'file': self.filename(image),
+            'sha256': writer.sha256.hexdigest(),
+            'size': size,
+            'image_id': image_id,
+            'saved': time.time(),
+        }
+        self._update_index(image, entry)
+        return entry
+
+    def load(self, image):
+        """Loads a cached tarball into Docker once its checksum has been verified.
+
+        Returns False when the image isn't cached. A checksum mismatch drops the
+        tarball from the cache and raises ImageCacheError without loading it.
+        """
+        entry = self.index().get(image)
+        if not entry:
+            return False
+        path = os.path.join(self.path, entry['file'])
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self._update_index(image, None)
+            return False
+        with f:
+            # Hash first: a corrupt or tampered tarball must never reach the daemon.
+            # Reading the file twice is cheap next to the load itself.
+            reader = HashingReader(f)
+            while reader.read(CHUNK_SIZE):
+                pass
+            if reader.sha256.hexdigest() != entry['sha256']:
+                self.remove(image)
+                raise ImageCacheError(f"checksum mismatch for cached {image}; removed from cache")
+            f.seek(0)
+            self.client.load(f, os.fstat(f.fileno()).st_size)
+        return True
+
+    def ensure(self, image):
+        """Makes an image available to Docker without the network if possible.
+
+        Returns 'present', 'loaded' or 'missing' (not cached: compose will pull it).
+        """
+        if self.client.image_id(image) is not None:
+            return 'present'
+        return 'loaded' if self.load(image) else 'missing'
+
+    def remove(self, image):
+        entry = self.index().get(image)
+        if entry:
+            try:
+                os.unlink(os.path.join(self.path, entry['file']))
+            except FileNotFoundError:
+                pass
+        self._update_index(image, None)
+
+    def status(self, images):
+        index = self.index()
+        entries = {image: index.get(image) for image in images}
+        cached = [e for e in entries.values() if e]
+        return {
+            'cached': len(cached),
+            'total': len(images),
+            'size': sum(e['size'] for e in cached),
+            'saved': max((e['saved'] for e in cached), default=None),
+        }
+
+    def summary(self):
+        index = self.index()
+        try:
+            free = shutil.disk_usage(self.path).free
+        except OSError:
+            free = None
+        return {
+            'path': self.path,
+            'images': index,
+            'size': sum(e['size'] for e in index.values()),
+            'free': free,
+        }
+
+
+def _app_images(app_ids):
+    apps = [registry.get(app_id) for app_id in app_ids] if app_ids else registry.apps()
+    missing = [app_id for app_id, app in zip(app_ids, apps) if app is None] if app_ids else []
+    if missing:
+        raise SystemExit(f"unknown app: {', '.join(missing)}")
+    images = []
+    for app in apps:
+        images += [image for image in app['images'] if image not in images]
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['warm', 'load', 'status'])
+    parser.add_argument('images', nargs='*', help="image references (default: images of --app or the catalogue)")
+    parser.add_argument('--app', action='append', default=[], help="catalogue app id (repeatable)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = ImageCache(get_client(), args.cache_dir)
+    if args.command == 'status':
+        print(json.dumps(cache.summary(), indent=2))
+        return 0
+
+    images = args.images or _app_images(args.app)
+    failed = 0
+    for image in images:
+        started = time.time()
+        try:
+            if args.command == 'warm':
+                entry = cache.fetch(image)
+                print(f"cached {image}: {entry['size'] / 1e6:.1f} MB sha256:{entry['sha256'][:12]} "
+                      f"({time.time() - started:.1f}s)", flush=True)
+            else:
+                result = cache.ensure(image)
+                print(f"{image}: {result} ({time.time() - started:.1f}s)", flush=True)
+        except (DockerError, ImageCacheError, OSError) as e:
+            failed += 1
+            print(f"{image}: {e}", file=sys.stderr, flush=True)
+    # Loading is best effort: anything not loaded is pulled by compose/docker run as before
+    return 1 if failed and args.command == 'warm' else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import os
+import socket
+import struct
+import threading
+import time
+
+from logs import get_logger
+
+SYS_NET = '/sys/class/net'
+
+# rtnetlink constants (linux/netlink.h, linux/rtnetlink.h, linux/if_addr.h)
+NETLINK_ROUTE = 0
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+NLMSG_HDR = struct.Struct('=IHHII')  # len, type, flags, seq, pid
+IFADDRMSG = struct.Struct('=BBBBI')  # family, prefixlen, flags, scope, index
+RTATTR = struct.Struct('=HH')        # len, type
+
+log = get_logger('interfaces')
+
+
+def _align(n):
+    return (n + 3) & ~3
+
+
+def netlink_addresses():
+    """Dumps every IPv4/IPv6 address from the kernel: {ifindex: [(family, 'addr/prefix'), ...]}."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.settimeout(2)
+        sock.bind((0, 0))
+        seq = int(time.time()) & 0xFFFFFFFF
+        payload = IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        sock.send(NLMSG_HDR.pack(NLMSG_HDR.size + len(payload), RTM_GETADDR,
+                                 NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + payload)
+        result = {}
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + NLMSG_HDR.size <= len(data):
+                length, msg_type, flags, msg_seq, pid = NLMSG_HDR.unpack_from(data, offset)
+                if length < NLMSG_HDR.size:
+                    return result
+                if msg_type == NLMSG_DONE:
+                    return result
+                if msg_type == NLMSG_ERROR:
+                    raise OSError("netlink address dump failed")
+                if msg_type == RTM_NEWADDR and msg_seq == seq:
+                    body = offset + NLMSG_HDR.size
+                    family, prefixlen, _, _, index = IFADDRMSG.unpack_from(data, body)
+                    attrs = {}
+                    pos = body + IFADDRMSG.size
+                    end = offset + length
+                    while pos + RTATTR.size <= end:
+                        attr_len, attr_type = RTATTR.unpack_from(data, pos)
+                        if attr_len < RTATTR.size:
+                            break
+                        attrs[attr_type] = data[pos + RTATTR.size:pos + attr_len]
+                        pos += _align(attr_len)
+                    # For IPv4, IFA_LOCAL is the interface's own address (IFA_ADDRESS is the peer on p2p links)
+                    raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+                    if raw and family in (socket.AF_INET, socket.AF_INET6):
+                        addr = socket.inet_ntop(family, raw)
+                        result.setdefault(index, []).append((family, f"{addr}/{prefixlen}"))
+                offset += _align(length)
+    finally:
+        sock.close()
+
+
+def _read(path, default=None):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def _read_int(path):
+    value = _read(path)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class InterfaceInventory:
+    """Network interfaces read straight from the kernel, cached for a short time.
+
+    Link details come from /sys/class/net, addresses from an rtnetlink dump
+    (no `ip` fork). Byte counters are kept between samples to derive
+    per-interface RX/TX rates.
+    """
+
+    def __init__(self, max_age=2.0, skip=('lo',)):
+        self.max_age = max_age
+        self.skip = set(skip)
+        self._lock = threading.Lock()
+        self._cached = []
+        self._sampled = None
+        self._previous = {}  # name -> (time, rx_bytes, tx_bytes)
+
+    def snapshot(self):
+        with self._lock:
+            if self._sampled is None or time.time() - self._sampled > self.max_age:
+                self._cached = self._collect()
+                self._sampled = time.time()
+            return [dict(iface) for iface in self._cached]
+
+    def _collect(self):
+        try:
+            addresses = netlink_addresses()
+        except OSError as e:
+            log.warning("netlink address dump failed: %s", e)
+            addresses = {}
+        now = time.time()
+        interfaces = []
+        try:
+            names = sorted(os.listdir(SYS_NET))
+        except OSError:
+            names = []
+        for name in names:
+            if name in self.skip:
+                continue
+            base = os.path.join(SYS_NET, name)
+            index = _read_int(os.path.join(base, 'ifindex'))
+            addrs = addresses.get(index, [])
+            ipv4 = [a for family, a in addrs if family == socket.AF_INET]
+            ipv6 = [a for family, a in addrs if family == socket.AF_INET6]
+            rx = _read_int(os.path.join(base, 'statistics', 'rx_bytes')) or 0
+            tx = _read_int(os.path.join(base, 'statistics', 'tx_bytes')) or 0
+            rx_rate = tx_rate = None
+            prev = self._previous.get(name)
+            if prev and now > prev[0] and rx >= prev[1] and tx >= prev[2]:
+                rx_rate = (rx - prev[1]) / (now - prev[0])
+                tx_rate = (tx - prev[2]) / (now - prev[0])
+            self._previous[name] = (now, rx, tx)
+            speed = _read_int(os.path.join(base, 'speed'))
+            interfaces.append({
+                'name': name,
+                'index': index,
+                'mac': _read(os.path.join(base, 'address'), ''),
+                'state': _read(os.path.join(base, 'operstate'), 'unknown'),
+                'ip': ipv4[0].split('/')[0] if ipv4 else 'No IP',
+                'ipv4': ipv4,
+                'ipv6': ipv6,
+                'mtu': _read_int(os.path.join(base, 'mtu')),
+                'speed': speed if speed and speed > 0 else None,  # Mbit/s; -1 or unreadable when down
+                'wireless': os.path.isdir(os.path.join(base, 'wireless')) or os.path.exists(os.path.join(base, 'phy80211')),
+                'rx_bytes': rx,
+                'tx_bytes': tx,
+                'rx_rate': rx_rate,
+                'tx_rate': tx_rate,
+            })
+        # Forget counters of interfaces that went away (e.g. container veths)
+        current = {iface['name'] for iface in interfaces}
+        for name in list(self._previous):
+            if name not in current:
+                del self._previous[name]
+        return interfaces
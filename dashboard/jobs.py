@@ -0,0 +1,175 @@
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+import uuid
+
+import commands
+from logs import get_logger
+
+JOB_LOG_DIR = os.environ.get('PIONEER_JOB_LOG_DIR', '/var/log/pioneer-jobs')
+
+log = get_logger('jobs')
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """A queued external command with its own log file and exit status."""
+
+    def __init__(self, key, cmd, log_dir, cwd=None, on_exit=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.on_exit = on_exit
+        self.status = 'queued'
+        self.exit_code = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.lines = 0
+        self.last_line = ''
+        safe_key = re.sub(r'[^A-Za-z0-9_.-]', '_', key)
+        self.log_path = os.path.join(log_dir, f"{self.id}-{safe_key}.log")
+        self.changed = threading.Condition()
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'cmd': self.cmd,
+            'status': self.status,
+            'exit_code': self.exit_code,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'duration': ((self.finished or time.time()) - self.started) if self.started else None,
+            'lines': self.lines,
+            'last_line': self.last_line,
+        }
+
+    def read_log(self, offset=0, limit=65536):
+        """Returns (bytes, next_offset) of the log starting at offset."""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(limit)
+        except FileNotFoundError:
+            return b'', offset
+        return data, offset + len(data)
+
+
+class JobQueue:
+    """Bounded worker pool for long-running commands such as Salt states.
+
+    At most `workers` commands run at once (one by default, Salt runs are
+    RAM hungry on a Pi 3B), a key can only have one active job, and every
+    job's stdout/stderr goes to its own log file.
+    """
+
+    def __init__(self, workers=1, log_dir=JOB_LOG_DIR, max_queued=20, history=50):
+        self.log_dir = log_dir
+        self.history = history
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}   # id -> Job, in submission order
+        self._active = {}  # key -> Job
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, key, cmd, cwd=None, on_exit=None):
+        """Queues a command unless one with the same key is already queued or running.
+
+        Returns (job, created); created is False when an existing job was returned.
+        """
+        with self._lock:
+            existing = self._active.get(key)
+            if existing:
+                return existing, False
+            job = Job(key, cmd, self.log_dir, cwd=cwd, on_exit=on_exit)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFull("Too many queued jobs, try again later")
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def active(self, key):
+        return self._active.get(key)
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in reversed(list(self._jobs.values()))]
+
+    def _prune(self):
+        # Drop the oldest finished jobs (and their logs) beyond the history limit
+        finished = [job for job in self._jobs.values() if not job.active]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+            try:
+                os.remove(job.log_path)
+            except OSError:
+                pass
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+                with job.changed:
+                    job.changed.notify_all()
+                if job.on_exit:
+                    try:
+                        job.on_exit(job)
+                    except Exception as e:
+                        log.error("job %s exit hook failed: %s", job.id, e, extra={'job': job.id})
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(job.log_path, 'w', buffering=1) as output:
+                output.write(f"$ {' '.join(job.cmd)}\n")
+                proc = subprocess.Popen(job.cmd, cwd=job.cwd, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, errors='replace')
+                for line in proc.stdout:
+                    output.write(line)
+                    job.lines += 1
+                    job.last_line = line.rstrip()
+                    with job.changed:
+                        job.changed.notify_all()
+                # wait() also reaps the child, so no zombies are left behind
+                job.exit_code = proc.wait()
+            commands.record(job.cmd, (time.time() - job.started) * 1000, job.exit_code)
+            job.status = 'succeeded' if job.exit_code == 0 else 'failed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            log.error("job %s (%s) failed: %s", job.id, job.key, e, extra={'job': job.id, 'key': job.key})
+        finally:
+            job.finished = time.time()
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+LEASE_FILE = os.environ.get('PIONEER_LEASE_FILE', '/var/lib/misc/dnsmasq.leases')
+
+# One dnsmasq lease line: "<expiry epoch> <mac> <ip> <hostname|*> <client-id|*>"
+Lease = namedtuple('Lease', ['expiry', 'mac', 'ip', 'hostname', 'client_id'])
+
+
+class LeaseTracker:
+    """Lease table that re-parses the dnsmasq lease file only when it changes.
+
+    dnsmasq rewrites the whole file on every lease change, so a stat check
+    (inode, mtime, size) on access is enough to know when to re-read it.
+    Leases are kept as tuples, indexed by MAC for the portal's client join.
+    """
+
+    def __init__(self, path=LEASE_FILE):
+        self.path = path
+        self._signature = None
+        self._lock = threading.Lock()
+        self.leases = []
+        self.by_mac = {}
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        with self._lock:
+            signature = self._stat()
+            if signature is not None and signature == self._signature:
+                return self
+            leases = []
+            if signature is not None:
+                with open(self.path, 'r') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) < 4:
+                            continue
+                        try:
+                            expiry = int(parts[0])
+                        except ValueError:
+                            continue
+                        hostname = '' if parts[3] == '*' else parts[3]
+                        client_id = parts[4] if len(parts) > 4 and parts[4] != '*' else ''
+                        leases.append(Lease(expiry, parts[1].lower(), parts[2], hostname, client_id))
+            self.leases = leases
+            self.by_mac = {lease.mac: lease for lease in leases}
+            self._signature = signature
+        return self
+
+    @staticmethod
+    def is_active(lease, now=None):
+        # Expiry 0 means an infinite lease
+        return lease.expiry == 0 or lease.expiry > (now or time.time())
+
+    @staticmethod
+    def to_dict(lease, now=None):
+        now = now or time.time()
+        return {
+            'mac': lease.mac,
+            'ip': lease.ip,
+            'hostname': lease.hostname,
+            'client_id': lease.client_id,
+            'expiry': lease.expiry,
+            'expires_in': None if lease.expiry == 0 else int(lease.expiry - now),
+            'active': LeaseTracker.is_active(lease, now),
+        }
+
+    def query(self, page=1, per_page=50, search='', state='active'):
+        """Returns one page of leases filtered by state ('active', 'expired', 'all') and text."""
+        self.refresh()
+        now = time.time()
+        search = search.strip().lower()
+        matched = []
+        for lease in self.leases:
+            if state != 'all' and self.is_active(lease, now) != (state == 'active'):
+                continue
+            if search and search not in lease.mac and search not in lease.ip and search not in lease.hostname.lower():
+                continue
+            matched.append(lease)
+        per_page = max(1, min(per_page, 500))
+        page = max(1, page)
+        start = (page - 1) * per_page
+        return {
+            'total': len(matched),
+            'page': page,
+            'per_page': per_page,
+            'pages': (len(matched) + per_page - 1) // per_page,
+            'leases': [self.to_dict(lease, now) for lease in matched[start:start + per_page]],
+        }
+
+
+lease_tracker = LeaseTracker()
@@ -0,0 +1,85 @@
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+
+LOG_FILE = os.environ.get('PIONEER_LOG_FILE', '/var/log/pioneer-dashboard.log')
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+BUFFER_RECORDS = 64
+FLUSH_INTERVAL = 5.0
+
+# LogRecord attributes that aren't user supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BufferedHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes on a timer, so quiet periods don't strand records.
+
+    Records are written in batches when the buffer fills, right away for
+    warnings and above, and otherwise at most FLUSH_INTERVAL seconds late.
+    """
+
+    def __init__(self, target, capacity=BUFFER_RECORDS, interval=FLUSH_INTERVAL):
+        super().__init__(capacity, flushLevel=logging.WARNING, target=target, flushOnClose=True)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name='log-flush', daemon=True)
+        self._thread.start()
+
+    def _loop(self, interval):
+        while not self._stopping.wait(interval):
+            self.flush()
+
+    def close(self):
+        self._stopping.set()
+        super().close()
+
+
+_configured = False
+_lock = threading.Lock()
+
+
+def setup_logging(path=LOG_FILE, level=None):
+    """Routes the `pioneer` loggers to one buffered, rotating JSON log file.
+
+    Falls back to stderr when the file can't be opened (e.g. running as a
+    user without access to /var/log). Safe to call more than once.
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return logging.getLogger('pioneer')
+        logger = logging.getLogger('pioneer')
+        logger.setLevel((level or os.environ.get('PIONEER_LOG_LEVEL', 'info')).upper())
+        logger.propagate = False
+        try:
+            target = logging.handlers.RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
+        except OSError as e:
+            print(f"Logging to stderr, can't open {path}: {e}", file=sys.stderr)
+            target = logging.StreamHandler(sys.stderr)
+        target.setFormatter(JSONFormatter())
+        logger.addHandler(BufferedHandler(target))
+        _configured = True
+        return logger
+
+
+def get_logger(name):
+    return logging.getLogger(f"pioneer.{name}")
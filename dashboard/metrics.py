@@ -0,0 +1,231 @@
+import math
+import os
+import threading
+import time
+from array import array
+
+import psutil
+
+from docker_api import DockerError
+from logs import get_logger
+
+# (name, seconds per point, points kept)
+SYSTEM_RESOLUTIONS = [('1s', 1, 600), ('1m', 60, 1440)]      # 10 min at 1 s, 24 h at 1 min
+CONTAINER_RESOLUTIONS = [('10s', 10, 60), ('1m', 60, 1440)]  # 10 min at 10 s, 24 h at 1 min
+MAX_CONTAINERS = 32
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+NAN = float('nan')
+
+log = get_logger('metrics')
+
+
+class RingBuffer:
+    """Fixed number of float32 slots, one per `step` seconds; missed slots read as NaN.
+
+    Memory use is fixed at creation (4 bytes per slot) no matter how long
+    the box runs.
+    """
+
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.values = array('f', [NAN]) * size
+        self.last = None  # Absolute slot number (time // step) of the newest value
+
+    def put(self, timestamp, value):
+        slot = int(timestamp // self.step)
+        if self.last is not None:
+            if slot < self.last:
+                return
+            # Clear slots skipped since the last write so stale values don't reappear
+            for missing in range(self.last + 1, min(slot, self.last + self.size + 1)):
+                self.values[missing % self.size] = NAN
+        self.values[slot % self.size] = value
+        self.last = slot
+
+    def read(self, points=None):
+        """Returns (start_time, values oldest first) for the last `points` slots."""
+        if self.last is None:
+            return None, array('f')
+        points = min(points or self.size, self.size)
+        first = self.last - points + 1
+        out = array('f', (self.values[slot % self.size] for slot in range(first, self.last + 1)))
+        return first * self.step, out
+
+
+class Series:
+    """One metric at several resolutions; coarser rings store the mean of finer samples."""
+
+    def __init__(self, resolutions):
+        self.rings = {name: RingBuffer(step, size) for name, step, size in resolutions}
+        self._acc = {name: [None, 0.0, 0] for name in self.rings}  # slot, sum, count
+
+    def add(self, timestamp, value):
+        if value is None:
+            return
+        for name, ring in self.rings.items():
+            acc = self._acc[name]
+            slot = int(timestamp // ring.step)
+            if acc[0] != slot:
+                acc[0], acc[1], acc[2] = slot, 0.0, 0
+            acc[1] += value
+            acc[2] += 1
+            # Rewriting the current slot keeps the running mean visible before it closes
+            ring.put(timestamp, acc[1] / acc[2])
+
+
+def read_temperature():
+    try:
+        with open(THERMAL_ZONE) as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def _read_first_int(paths, key=None):
+    for path in paths:
+        try:
+            with open(path) as f:
+                if key is None:
+                    return int(f.read().strip())
+                for line in f:
+                    name, _, value = line.partition(' ')
+                    if name == key:
+                        return int(value)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def container_usage(container_id):
+    """(cpu_seconds, memory_bytes) from the container's cgroup, v2 or v1 layout."""
+    v2 = os.path.join(CGROUP_ROOT, 'system.slice', f"docker-{container_id}.scope")
+    cpu_usec = _read_first_int([os.path.join(v2, 'cpu.stat')], key='usage_usec')
+    if cpu_usec is not None:
+        cpu = cpu_usec / 1e6
+    else:
+        cpu_ns = _read_first_int([os.path.join(CGROUP_ROOT, 'cpuacct', 'docker', container_id, 'cpuacct.usage'),
+                                  os.path.join(CGROUP_ROOT, 'cpu,cpuacct', 'docker', container_id, 'cpuacct.usage')])
+        cpu = cpu_ns / 1e9 if cpu_ns is not None else None
+    mem = _read_first_int([os.path.join(v2, 'memory.current'),
+                           os.path.join(CGROUP_ROOT, 'memory', 'docker', container_id, 'memory.usage_in_bytes')])
+    return cpu, mem
+
+
+class MetricsSampler:
+    """Background sampler for system and per-container metrics.
+
+    System metrics are read every second via psutil and sysfs; container CPU
+    and memory come from cgroup files every `container_interval` seconds,
+    which avoids the Docker stats API (it blocks ~1 s per container).
+    """
+
+    def __init__(self, docker=None, container_interval=10):
+        self.docker = docker
+        self.container_interval = container_interval
+        self.series = {name: Series(SYSTEM_RESOLUTIONS)
+                       for name in ('cpu', 'mem', 'disk_read', 'disk_write', 'temp')}
+        self.containers = {}  # name -> {'cpu': Series, 'mem': Series}
+        self._lock = threading.Lock()
+        self._prev_disk = None
+        self._prev_cpu = {}  # container id -> (time, cpu_seconds)
+        self._next_containers = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        psutil.cpu_percent(interval=None)  # Prime the counter; the first reading is meaningless
+        self._thread = threading.Thread(target=self._run, name='metrics', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.time()
+            try:
+                self.sample_system(started)
+                if self.docker is not None and started >= self._next_containers:
+                    self._next_containers = started + self.container_interval
+                    self.sample_containers(started)
+            except Exception as e:
+                log.warning("metrics sample failed: %s", e)
+            time.sleep(max(0.0, 1.0 - (time.time() - started)))
+
+    def sample_system(self, now):
+        disk = psutil.disk_io_counters()
+        read_rate = write_rate = None
+        if disk and self._prev_disk:
+            prev_time, prev = self._prev_disk
+            elapsed = now - prev_time
+            if elapsed > 0:
+                read_rate = max(0, disk.read_bytes - prev.read_bytes) / elapsed
+                write_rate = max(0, disk.write_bytes - prev.write_bytes) / elapsed
+        if disk:
+            self._prev_disk = (now, disk)
+        with self._lock:
+            self.series['cpu'].add(now, psutil.cpu_percent(interval=None))
+            self.series['mem'].add(now, psutil.virtual_memory().percent)
+            self.series['disk_read'].add(now, read_rate)
+            self.series['disk_write'].add(now, write_rate)
+            self.series['temp'].add(now, read_temperature())
+
+    def sample_containers(self, now):
+        try:
+            running = self.docker.containers()
+        except (DockerError, OSError):
+            return
+        running = running[:MAX_CONTAINERS]
+        names = {}
+        for c in running:
+            name = (c.get('Names') or [c['Id'][:12]])[0].lstrip('/')
+            names[c['Id']] = name
+            cpu, mem = container_usage(c['Id'])
+            cpu_percent = None
+            prev = self._prev_cpu.get(c['Id'])
+            if cpu is not None:
+                if prev and now > prev[0]:
+                    cpu_percent = max(0.0, (cpu - prev[1]) / (now - prev[0]) * 100)
+                self._prev_cpu[c['Id']] = (now, cpu)
+            with self._lock:
+                entry = self.containers.setdefault(name, {'cpu': Series(CONTAINER_RESOLUTIONS),
+                                                          'mem': Series(CONTAINER_RESOLUTIONS)})
+                entry['cpu'].add(now, cpu_percent)
+                entry['mem'].add(now, mem / (1024 * 1024) if mem is not None else None)
+        with self._lock:
+            # Only running containers are kept, so memory stays bounded by MAX_CONTAINERS
+            for name in set(self.containers) - set(names.values()):
+                del self.containers[name]
+        for cid in set(self._prev_cpu) - set(names):
+            del self._prev_cpu[cid]
+
+    def names(self):
+        with self._lock:
+            names = list(self.series)
+            for container in self.containers:
+                names += [f"container:{container}:cpu", f"container:{container}:mem"]
+        return names
+
+    def _lookup(self, name):
+        if name.startswith('container:'):
+            container, _, metric = name[len('container:'):].rpartition(':')
+            return self.containers.get(container, {}).get(metric)
+        return self.series.get(name)
+
+    def query(self, names, resolution, points=None):
+        """Returns {name: (start, step, values)} for the requested series at one resolution."""
+        out = {}
+        with self._lock:
+            for name in names:
+                series = self._lookup(name)
+                if series is None or resolution not in series.rings:
+                    continue
+                ring = series.rings[resolution]
+                start, values = ring.read(points)
+                out[name] = (start, ring.step, values)
+        return out
+
+
+def to_json_values(values, digits=1):
+    return [None if math.isnan(v) else round(v, digits) for v in values]
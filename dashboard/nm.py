@@ -0,0 +1,268 @@
+import queue
+import threading
+
+import commands
+from logs import get_logger
+
+try:
+    from jeepney import DBusAddress, MatchRule, MessageType, Properties, new_method_call
+    from jeepney.bus_messages import message_bus
+    from jeepney.io.threading import DBusRouter, open_dbus_connection
+except ImportError:  # python3-jeepney not installed: fall back to nmcli
+    DBusRouter = None
+
+HOTSPOT_NAME = 'PIONEER_SETUP'
+DEFAULT_SSID = 'PIONEER_SETUP'
+DEFAULT_PSK = 'pioneer123'
+
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_PATH = '/org/freedesktop/NetworkManager'
+NM_IFACE = 'org.freedesktop.NetworkManager'
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+SETTINGS_IFACE = 'org.freedesktop.NetworkManager.Settings'
+CONNECTION_IFACE = 'org.freedesktop.NetworkManager.Settings.Connection'
+ACTIVE_IFACE = 'org.freedesktop.NetworkManager.Connection.Active'
+DEVICE_IFACE = 'org.freedesktop.NetworkManager.Device'
+
+ACTIVE_STATE_ACTIVATED = 2
+DEVICE_TYPE_WIFI = 2
+
+log = get_logger('nm')
+
+
+class NMError(Exception):
+    pass
+
+
+def hotspot_settings(name, ssid, psk, iface):
+    """NetworkManager settings dict for a WPA2 access point sharing its uplink."""
+    return {
+        'connection': {
+            'id': ('s', name),
+            'type': ('s', '802-11-wireless'),
+            'interface-name': ('s', iface),
+            'autoconnect': ('b', True),
+        },
+        '802-11-wireless': {
+            'ssid': ('ay', ssid.encode()),
+            'mode': ('s', 'ap'),
+            'band': ('s', 'bg'),
+        },
+        '802-11-wireless-security': {
+            'key-mgmt': ('s', 'wpa-psk'),
+            'psk': ('s', psk),
+        },
+        'ipv4': {
+            'method': ('s', 'shared'),
+        },
+    }
+
+
+class DBusNetworkManager:
+    """NetworkManager client over one persistent system bus connection.
+
+    Keeps a cached model of connection profiles, active connections and
+    devices. NM signals (active connections changing, profiles added or
+    removed, activation state changes) trigger a refresh of the model in a
+    background thread, so status reads never leave the process.
+    """
+
+    cached = True
+
+    def __init__(self, bus='SYSTEM', timeout=10):
+        self.bus = bus
+        self.timeout = timeout
+        self.connections = {}  # profile id -> {'path', 'uuid', 'type'}
+        self.active = {}       # profile id -> {'path', 'state', 'connection'}
+        self.devices = {}      # interface -> {'path', 'type', 'state'}
+        self._router = None
+        self._lock = threading.Lock()
+        self._signals = queue.Queue()
+        self._filters = []
+        self._thread = None
+
+    def connect(self):
+        self._router = DBusRouter(open_dbus_connection(bus=self.bus))
+        rules = [
+            dict(path=NM_PATH, interface='org.freedesktop.DBus.Properties', member='PropertiesChanged'),
+            dict(path=SETTINGS_PATH, interface=SETTINGS_IFACE),
+            dict(interface=ACTIVE_IFACE, member='StateChanged'),
+        ]
+        for fields in rules:
+            # The bus matches on NM's well-known name, but delivered signals carry its
+            # unique name, so the local filter leaves the sender out
+            bus_rule = MatchRule(type='signal', sender=NM_BUS, **fields)
+            self._router.send_and_get_reply(message_bus.AddMatch(bus_rule), timeout=self.timeout)
+            self._filters.append(self._router.filter(MatchRule(type='signal', **fields), queue=self._signals))
+        self.reload()
+        self._thread = threading.Thread(target=self._watch, name='nm-signals', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        router, self._router = self._router, None
+        if router is not None:
+            self._signals.put(None)  # Ends the watcher thread
+            router.close()
+            router.conn.close()
+
+    # --- D-Bus helpers ---
+    def _call(self, path, interface, method, signature=None, body=()):
+        msg = new_method_call(DBusAddress(path, bus_name=NM_BUS, interface=interface), method, signature, body)
+        reply = self._router.send_and_get_reply(msg, timeout=self.timeout)
+        if reply.header.message_type == MessageType.error:
+            raise NMError(f"{method} failed: {reply.body[0] if reply.body else reply.header}")
+        return reply.body
+
+    def _props(self, path, interface):
+        msg = Properties(DBusAddress(path, bus_name=NM_BUS, interface=interface)).get_all()
+        reply = self._router.send_and_get_reply(msg, timeout=self.timeout)
+        if reply.header.message_type == MessageType.error:
+            raise NMError(f"GetAll {interface} on {path} failed")
+        return {key: value for key, (sig, value) in reply.body[0].items()}
+
+    # --- Model ---
+    def reload(self):
+        connections = {}
+        for path in self._call(SETTINGS_PATH, SETTINGS_IFACE, 'ListConnections')[0]:
+            settings = self._call(path, CONNECTION_IFACE, 'GetSettings')[0]
+            conn = settings.get('connection', {})
+            connections[conn['id'][1]] = {
+                'path': path,
+                'uuid': conn.get('uuid', ('s', ''))[1],
+                'type': conn.get('type', ('s', ''))[1],
+            }
+        active = {}
+        for path in self._props(NM_PATH, NM_IFACE).get('ActiveConnections', []):
+            try:
+                props = self._props(path, ACTIVE_IFACE)
+            except NMError:
+                continue  # Went away between listing and reading
+            active[props['Id']] = {'path': path, 'state': props['State'], 'connection': props['Connection']}
+        devices = {}
+        for path in self._call(NM_PATH, NM_IFACE, 'GetDevices')[0]:
+            props = self._props(path, DEVICE_IFACE)
+            devices[props['Interface']] = {'path': path, 'type': props['DeviceType'], 'state': props['State']}
+        with self._lock:
+            self.connections, self.active, self.devices = connections, active, devices
+
+    def _watch(self):
+        while True:
+            self._signals.get()
+            # Signals come in bursts during (de)activation; coalesce them into one reload
+            try:
+                while True:
+                    self._signals.get(timeout=0.2)
+            except queue.Empty:
+                pass
+            if self._router is None:
+                return
+            try:
+                self.reload()
+            except Exception as e:
+                log.warning("NetworkManager model refresh failed: %s", e)
+
+    # --- Hotspot ---
+    def hotspot_active(self, name=HOTSPOT_NAME):
+        return self.active.get(name, {}).get('state') == ACTIVE_STATE_ACTIVATED
+
+    def wireless_interface(self):
+        return next((iface for iface, dev in self.devices.items() if dev['type'] == DEVICE_TYPE_WIFI), 'wlan0')
+
+    def ensure_hotspot(self, name=HOTSPOT_NAME):
+        if name in self.connections:
+            return False
+        log.info("creating hotspot %s", name)
+        self._call(SETTINGS_PATH, SETTINGS_IFACE, 'AddConnection', 'a{sa{sv}}',
+                   (hotspot_settings(name, DEFAULT_SSID, DEFAULT_PSK, self.wireless_interface()),))
+        self.reload()
+        return True
+
+    def set_hotspot_active(self, on, name=HOTSPOT_NAME):
+        if on:
+            self._call(NM_PATH, NM_IFACE, 'ActivateConnection', 'ooo',
+                       (self.connections[name]['path'], '/', '/'))
+        elif name in self.active:
+            self._call(NM_PATH, NM_IFACE, 'DeactivateConnection', 'o', (self.active[name]['path'],))
+        self.reload()
+
+    def update_hotspot(self, ssid, psk, name=HOTSPOT_NAME):
+        path = self.connections[name]['path']
+        settings = self._call(path, CONNECTION_IFACE, 'GetSettings')[0]
+        settings.setdefault('802-11-wireless', {})['ssid'] = ('ay', ssid.encode())
+        settings.setdefault('802-11-wireless-security', {})['psk'] = ('s', psk)
+        # Deprecated address fields are returned alongside address-data but rejected on update
+        for family in ('ipv4', 'ipv6'):
+            for key in ('addresses', 'routes'):
+                settings.get(family, {}).pop(key, None)
+        self._call(path, CONNECTION_IFACE, 'Update', 'a{sa{sv}}', (settings,))
+        # Re-activating an active profile applies the new settings
+        if self.hotspot_active(name):
+            self.set_hotspot_active(True, name)
+
+
+class NmcliNetworkManager:
+    """Fallback that shells out to nmcli when D-Bus isn't available."""
+
+    cached = False
+
+    def close(self):
+        pass
+
+    def hotspot_active(self, name=HOTSPOT_NAME):
+        try:
+            # Check if PIONEER_SETUP is active
+            out_name = commands.check_output(['nmcli', '-t', '-f', 'NAME,ACTIVE', 'connection', 'show']).decode()
+            return f"{name}:yes" in out_name
+        except Exception as e:
+            log.warning("hotspot check failed: %s", e)
+            return False
+
+    def ensure_hotspot(self, name=HOTSPOT_NAME):
+        """Creates the hotspot connection if it doesn't exist."""
+        try:
+            # Check if connection exists (active or not)
+            out = commands.check_output(['nmcli', '-t', '-f', 'NAME', 'connection', 'show']).decode()
+            if name in out.split('\n'):
+                return False
+            log.info("creating hotspot %s", name)
+            # Try to find a wireless interface
+            iface = "wlan0"  # Default fallback
+            try:
+                # Find first wireless device
+                devs = commands.check_output(['nmcli', '-t', '-f', 'DEVICE,TYPE', 'device']).decode().split('\n')
+                for line in devs:
+                    if ':wifi' in line:
+                        iface = line.split(':')[0]
+                        break
+            except Exception:
+                pass
+            # One call with every property instead of add + two modifies
+            commands.check_call([
+                'nmcli', 'con', 'add', 'type', 'wifi', 'ifname', iface, 'con-name', name,
+                'autoconnect', 'yes', 'ssid', DEFAULT_SSID,
+                '802-11-wireless.mode', 'ap', '802-11-wireless.band', 'bg', 'ipv4.method', 'shared',
+                'wifi-sec.key-mgmt', 'wpa-psk', 'wifi-sec.psk', DEFAULT_PSK
+            ])
+            return True
+        except Exception as e:
+            log.error("failed to create hotspot %s: %s", name, e)
+            return False
+
+    def set_hotspot_active(self, on, name=HOTSPOT_NAME):
+        commands.run(['nmcli', 'connection', 'up' if on else 'down', name], check=True)
+
+    def update_hotspot(self, ssid, psk, name=HOTSPOT_NAME):
+        commands.run(['nmcli', 'con', 'modify', name, 'ssid', ssid, 'wifi-sec.psk', psk], check=True)
+        # 'up' on an active profile re-applies it; no separate 'down' needed
+        commands.run(['nmcli', 'con', 'up', name])
+
+
+def get_network_manager(bus='SYSTEM'):
+    """D-Bus client when python3-jeepney and the bus are available, nmcli otherwise."""
+    if DBusRouter is not None:
+        try:
+            return DBusNetworkManager(bus=bus).connect()
+        except Exception as e:
+            log.warning("NetworkManager D-Bus unavailable, using nmcli: %s", e)
+    return NmcliNetworkManager()
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+
+from dnsmasq import ConfigError, validate_mac
+from logs import get_logger
+
+NDSCTL_SOCKET = os.environ.get('PIONEER_NDSCTL_SOCKET', '/tmp/ndsctl.sock')
+NDS_CONF = os.environ.get('PIONEER_NDS_CONF', '/etc/nodogsplash/nodogsplash.conf')
+
+# Per-client ndsctl commands the bulk endpoint accepts
+BULK_OPS = ('deauth', 'auth', 'trust', 'untrust', 'block', 'unblock')
+MAX_BULK = 2048
+
+# Tunable nodogsplash.conf directives: key -> (directive, default, min, max)
+# Timeouts are minutes (0 = none); limits are kbit/s per client (0 = unlimited)
+SETTINGS = {
+    'max_clients': ('MaxClients', 50, 1, 2048),
+    'auth_idle_timeout': ('AuthIdleTimeout', 480, 0, 10080),
+    'preauth_idle_timeout': ('PreauthIdleTimeout', 10, 0, 1440),
+    'session_timeout': ('SessionTimeout', 0, 0, 10080),
+    'download_limit': ('DownloadLimit', 0, 0, 1000000),
+    'upload_limit': ('UploadLimit', 0, 0, 1000000),
+}
+DIRECTIVE_RE = re.compile(r'^\s*(\w+)\s+(\d+)\s*$')
+
+log = get_logger('portal')
+
+
+class PortalError(Exception):
+    pass
+
+
+class Ndsctl:
+    """Talks to nodogsplash's control socket directly, as the ndsctl binary does.
+
+    One short connection per request and no process per call, so acting on
+    hundreds of clients doesn't fork hundreds of ndsctl processes.
+    """
+
+    def __init__(self, path=NDSCTL_SOCKET, timeout=5):
+        self.path = path
+        self.timeout = timeout
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def request(self, line):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+            # The daemon reads until a blank line, answers and closes
+            sock.sendall(line.encode() + b'\r\n\r\n')
+            chunks = []
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+        except OSError as e:
+            raise PortalError(f"nodogsplash control socket unavailable: {e}")
+        finally:
+            sock.close()
+        return b''.join(chunks).decode(errors='replace')
+
+    def clients(self):
+        out = self.request('json')
+        try:
+            data = json.loads(out)
+        except ValueError:
+            raise PortalError(f"unexpected ndsctl json output: {out[:200]!r}")
+        clients = data.get('clients') or {}
+        return list(clients.values()) if isinstance(clients, dict) else list(clients)
+
+    def client_op(self, op, mac):
+        """Runs one per-client command; returns (ok, reply)."""
+        reply = self.request(f"{op} {mac}").strip()
+        return reply.startswith('Yes'), reply
+
+
+class PortalTracker:
+    """Portal clients from one `ndsctl json` call, joined with DHCP leases.
+
+    The listing is cached for `max_age` seconds and refreshed by at most one
+    thread at a time, so any number of admin pages polling it cost one
+    control-socket round trip per interval. The round trip happens outside
+    the state lock, so settings() and invalidate() never wait on ndsctl.
+    """
+
+    def __init__(self, ndsctl, leases, conf_path=NDS_CONF, max_age=5.0):
+        self.ndsctl = ndsctl
+        self.leases = leases
+        self.conf_path = conf_path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._clients = []
+        self._fetched = None
+        self._error = None
+        self._conf_signature = None
+        self._settings = None
+
+    @staticmethod
+    def normalize(client):
+        state = (client.get('state') or '').lower()
+        return {
+            'mac': (client.get('mac') or '').lower(),
+            'ip': client.get('ip', ''),
+            'state': state,
+            'authenticated': state in ('authenticated', 'trusted'),
+            'added': client.get('added'),
+            'active': client.get('active'),
+            'duration': client.get('duration'),
+            'downloaded': client.get('downloaded'),
+            'uploaded': client.get('uploaded'),
+            'avg_down_speed': client.get('avg_down_speed'),
+            'avg_up_speed': client.get('avg_up_speed'),
+        }
+
+    def _fresh(self):
+        fetched = self._fetched
+        return fetched is not None and time.time() - fetched < self.max_age
+
+    def refresh(self, force=False):
+        if not force and self._fresh():
+            return self
+        with self._refresh_lock:
+            # Whoever waited here behind another refresh can use its result
+            if not force and self._fresh():
+                return self
+            clients = None
+            if not self.ndsctl.available():
+                clients, error = [], 'nodogsplash is not running'
+            else:
+                try:
+                    clients, error = [self.normalize(c) for c in self.ndsctl.clients()], None
+                except PortalError as e:
+                    error = str(e)  # Keep showing the last listing
+            with self._lock:
+                if clients is not None:
+                    self._clients = clients
+                self._error = error
+                self._fetched = time.time()
+        return self
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched = None
+
+    def _matching(self, search='', state='all'):
+        search = search.strip().lower()
+        leases = self.leases.refresh().by_mac
+        matched = []
+        for client in self._clients:
+            if state != 'all' and client['state'] != state:
+                continue
+            lease = leases.get(client['mac'])
+            hostname = lease.hostname if lease else ''
+            if search and search not in client['mac'] and search not in client['ip'] and search not in hostname.lower():
+                continue
+            matched.append(dict(client, hostname=hostname))
+        return matched
+
+    def query(self, page=1, per_page=50, search='', state='all'):
+        """One page of clients filtered by state ('authenticated', 'preauthenticated', 'all') and text."""
+        self.refresh()
+        matched = self._matching(search, state)
+        counts = {}
+        for client in self._clients:
+            counts[client['state']] = counts.get(client['state'], 0) + 1
+        per_page = max(1, min(per_page, 500))
+        page = max(1, page)
+        start = (page - 1) * per_page
+        return {
+            'available': self._error is None,
+            'error': self._error,
+            'fetched': self._fetched,
+            'total': len(matched),
+            'clients_total': len(self._clients),
+            'counts': counts,
+            'max_clients': (self.settings() or {}).get('max_clients'),
+            'page': page,
+            'per_page': per_page,
+            'pages': (len(matched) + per_page - 1) // per_page,
+            'clients': matched[start:start + per_page],
+        }
+
+    def bulk(self, op, macs=None, search=None, state=None):
+        """Applies one ndsctl command to many clients in a single call.
+
+        Clients are given as a list of MACs, or selected by the same filter as
+        query() (e.g. every preauthenticated client). Returns the MACs that
+        succeeded and the reply for each one that didn't.
+        """
+        if op not in BULK_OPS:
+            raise ConfigError(f"Unknown portal operation: {op}")
+        if macs is None:
+            self.refresh(force=True)
+            if self._error:
+                raise PortalError(self._error)
+            macs = [client['mac'] for client in self._matching(search or '', state or 'all')]
+        else:
+            macs = list(dict.fromkeys(validate_mac(mac) for mac in macs))
+        if len(macs) > MAX_BULK:
+            raise ConfigError(f"At most {MAX_BULK} clients per operation")
+        if macs and not self.ndsctl.available():
+            raise PortalError('nodogsplash is not running')
+        ok, failed = [], {}
+        for mac in macs:
+            try:
+                success, reply = self.ndsctl.client_op(op, mac)
+            except PortalError as e:
+                success, reply = False, str(e)
+            if success:
+                ok.append(mac)
+            else:
+                failed[mac] = reply or 'failed'
+        self.invalidate()
+        log.info("portal %s: %d ok, %d failed", op, len(ok), len(failed),
+                 extra={'op': op, 'ok': len(ok), 'failed': len(failed)})
+        return {'op': op, 'requested': len(macs), 'ok': ok, 'failed': failed}
+
+    # --- Settings ---
+    def settings(self):
+        """Current limits read from nodogsplash.conf; None when the portal isn't installed."""
+        try:
+            st = os.stat(self.conf_path)
+        except OSError:
+            return None
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if signature != self._conf_signature:
+                values = {}
+                with open(self.conf_path, 'r') as f:
+                    for line in f:
+                        match = DIRECTIVE_RE.match(line)
+                        if match:
+                            values[match.group(1)] = int(match.group(2))
+                self._settings = {key: values.get(directive, default)
+                                  for key, (directive, default, _, _) in SETTINGS.items()}
+                self._conf_signature = signature
+            return dict(self._settings)
+
+
+def validate_settings(data):
+    """Checks the tunables against their ranges; returns a complete settings dict."""
+    settings = {}
+    for key, (directive, default, low, high) in SETTINGS.items():
+        value = data.get(key, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"{directive} must be a number")
+        if not low <= value <= high:
+            raise ConfigError(f"{directive} must be between {low} and {high}")
+        settings[key] = value
+    return settings
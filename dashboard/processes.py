@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+import psutil
+
+
+class ProcessIndex:
+    """One pass over the process table, mapping running salt-call jobs to app ids.
+
+    Building it costs O(processes); lookups afterwards are O(1) no matter how
+    many apps are in the catalogue.
+    """
+
+    def __init__(self):
+        self.installing = {}  # app_id -> pid of the salt-call applying modules.<app_id>
+        self.states = {}      # any state being applied (e.g. core.portainer) -> pid
+        self.process_count = 0
+        self.built_at = None
+        self.build_duration = None
+        self._build()
+
+    def _build(self):
+        started = time.time()
+        count = 0
+        for proc in psutil.process_iter(['pid', 'cmdline', 'status']):
+            count += 1
+            try:
+                # Ignore zombie processes (finished but not reaped)
+                if proc.info['status'] == psutil.STATUS_ZOMBIE:
+                    continue
+                cmdline = proc.info['cmdline']
+                if not cmdline or not any(os.path.basename(arg) == 'salt-call' for arg in cmdline[:3]):
+                    continue
+                for state in self.parse_state_targets(cmdline):
+                    self.states[state] = proc.info['pid']
+                    if state.startswith('modules.') and len(state) > len('modules.'):
+                        self.installing[state[len('modules.'):]] = proc.info['pid']
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        self.process_count = count
+        self.built_at = time.time()
+        self.build_duration = self.built_at - started
+
+    @staticmethod
+    def parse_state_targets(cmdline):
+        """Yields the states named after state.apply/state.sls, including comma separated lists."""
+        args = [arg for arg in cmdline if not arg.startswith('-')]
+        for i, arg in enumerate(args):
+            if arg in ('state.apply', 'state.sls') and i + 1 < len(args):
+                for target in args[i + 1].split(','):
+                    if target and '=' not in target:
+                        yield target
+
+    def is_applying(self, state):
+        return state in self.states
+
+    def stats(self):
+        return {
+            'processes': self.process_count,
+            'installing': dict(self.installing),
+            'states': dict(self.states),
+            'built_at': self.built_at,
+            'build_ms': round(self.build_duration * 1000, 2),
+        }
+
+
+_cache_lock = threading.Lock()
+_cached_index = None
+
+
+def get_process_index(max_age=2.0):
+    """Returns a shared ProcessIndex, rebuilding it when older than max_age seconds."""
+    global _cached_index
+    with _cache_lock:
+        if _cached_index is None or time.time() - _cached_index.built_at > max_age:
+            _cached_index = ProcessIndex()
+        return _cached_index
@@ -0,0 +1,161 @@
+import threading
+import time
+
+from flask import request
+
+# Upper bounds of the latency buckets; one more bucket catches everything slower
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Latency histogram with fixed log-spaced buckets: constant memory per series.
+
+    Percentiles are estimated as the upper bound of the bucket they fall in
+    (the slowest bucket reports the observed max).
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes = 0
+
+    def add(self, ms, error=False, timeout=False, size=None):
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.errors += bool(error)
+        self.timeouts += bool(timeout)
+        self.bytes += size or 0
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS_MS[index], self.max_ms) if index < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'total_ms': round(self.total_ms, 1),
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': round(self.max_ms, 2),
+            'stdout_bytes': self.bytes,
+            'buckets': {(f"le_{bound}" if i < len(BUCKETS_MS) else 'inf'): n
+                        for i, (bound, n) in enumerate(zip(BUCKETS_MS + (None,), self.buckets)) if n},
+        }
+
+
+_local = threading.local()
+
+
+def current_request():
+    """Profile context of the request being handled on this thread, if any."""
+    return getattr(_local, 'request', None)
+
+
+class Profile:
+    """Per-command and per-route histograms, plus which commands each route ran."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.commands = {}
+            self.routes = {}
+            self.route_commands = {}  # route -> command -> [count, total_ms]
+            self.since = time.time()
+
+    def record_command(self, name, ms, error=False, timeout=False, size=None):
+        ctx = current_request()
+        if ctx is not None:
+            ctx['commands'].append((name, ms))
+        with self._lock:
+            self.commands.setdefault(name, Histogram()).add(ms, error, timeout, size)
+
+    def record_route(self, route, ms, status, commands):
+        with self._lock:
+            self.routes.setdefault(route, Histogram()).add(ms, error=status >= 500)
+            breakdown = self.route_commands.setdefault(route, {})
+            for name, command_ms in commands:
+                entry = breakdown.setdefault(name, [0, 0.0])
+                entry[0] += 1
+                entry[1] += command_ms
+
+    def snapshot(self):
+        """Lists sorted by total time (not dicts: JSON output sorts keys), biggest cost first."""
+        with self._lock:
+            commands = [dict(h.snapshot(), command=name) for name, h in self.commands.items()]
+            routes = []
+            for route, h in self.routes.items():
+                breakdown = [{'command': name, 'count': count, 'total_ms': round(total, 1)}
+                             for name, (count, total) in self.route_commands.get(route, {}).items()]
+                routes.append(dict(h.snapshot(), route=route,
+                                   commands=sorted(breakdown, key=lambda c: -c['total_ms'])))
+            since = self.since
+        return {'since': since, 'bucket_bounds_ms': list(BUCKETS_MS),
+                'commands': sorted(commands, key=lambda c: -c['total_ms']),
+                'routes': sorted(routes, key=lambda r: -r['total_ms'])}
+
+
+profile = Profile()
+
+
+class RequestProfiler:
+    """Times every request per route and attributes external commands to it.
+
+    Adds a Server-Timing header (total command time and count), so browser
+    devtools show how much of a slow page was spent waiting on commands.
+    """
+
+    def __init__(self, app=None, profile=profile):
+        self.profile = profile
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._begin)
+        app.after_request(self._after)
+        app.teardown_request(self._end)
+
+    @staticmethod
+    def _begin():
+        rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+        _local.request = {'route': f"{request.method} {rule}", 'started': time.perf_counter(),
+                          'commands': [], 'status': 500}
+
+    @staticmethod
+    def _after(response):
+        ctx = current_request()
+        if ctx is not None:
+            ctx['status'] = response.status_code
+            if ctx['commands']:
+                spent = sum(ms for _, ms in ctx['commands'])
+                response.headers.add('Server-Timing',
+                                     f'cmd;dur={spent:.1f};desc="{len(ctx["commands"])} commands"')
+        return response
+
+    def _end(self, exc=None):
+        ctx = current_request()
+        if ctx is None:
+            return
+        _local.request = None
+        ms = (time.perf_counter() - ctx['started']) * 1000
+        self.profile.record_route(ctx['route'], ms, ctx['status'], ctx['commands'])
@@ -0,0 +1,102 @@
+import importlib
+import os
+import threading
+import time
+
+from logs import get_logger
+
+# Seconds after import before background warm-up starts on its own; the first
+# request starts it earlier. The unit sets this at boot so Docker, cockpit and
+# portainer get the CPU first.
+WARMUP_DELAY = float(os.environ.get('PIONEER_WARMUP_DELAY', 0))
+
+log = get_logger('startup')
+
+_UNSET = object()
+
+
+class Lazy:
+    """Stands in for an object that is built on first attribute access.
+
+    Used for clients that connect or probe when created and for modules that
+    are slow to import (psutil) or rarely needed, so importing the app only
+    pays for what the first request actually uses.
+    """
+
+    __slots__ = ('_factory', '_value', '_lock')
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self._factory()
+        return self._value
+
+    @property
+    def resolved(self):
+        return self._value is not _UNSET
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+def lazy_import(name):
+    """Module proxy that imports `name` on first attribute access (thread safe)."""
+    return Lazy(lambda: importlib.import_module(name))
+
+
+class Warmup:
+    """Start-up work (probes, watchers, client connections) run once, in order, on one thread.
+
+    It begins `delay` seconds after start() or at the first request, whichever
+    comes first, so the worker can answer as soon as the app is imported.
+    """
+
+    def __init__(self, delay=WARMUP_DELAY):
+        self.delay = delay
+        self.tasks = []
+        self.started = None
+        self.finished = None
+        self.results = []
+        self._go = threading.Event()
+        self._thread = None
+
+    def add(self, name, func):
+        self.tasks.append((name, func))
+
+    def init_app(self, app):
+        app.before_request(self.trigger)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+            self._thread.start()
+
+    def trigger(self):
+        self._go.set()
+
+    def _run(self):
+        self._go.wait(self.delay)
+        self.started = time.time()
+        for name, func in self.tasks:
+            began = time.perf_counter()
+            error = None
+            try:
+                func()
+            except Exception as e:
+                # One failed step (e.g. no D-Bus) must not keep the others from starting
+                error = str(e)
+                log.error("warm-up step %s failed: %s", name, e, extra={'step': name})
+            self.results.append({'name': name, 'ms': round((time.perf_counter() - began) * 1000, 1),
+                                 'error': error})
+        self.finished = time.time()
+        log.info("warm-up done in %.0f ms", (self.finished - self.started) * 1000,
+                 extra={'steps': self.results})
+
+    def status(self):
+        return {'started': self.started, 'finished': self.finished, 'steps': list(self.results)}
@@ -0,0 +1,43 @@
+function sendAction(cmd, target=null) {
+    if(confirm('Are you sure you want to perform this action?')) {
+        // Use relative path 'api/action' to work behind Nginx /admin/ prefix
+        fetch('api/action', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({command: cmd, target: target})
+        })
+        .then(response => {
+            if (response.redirected) {
+                window.location.href = response.url;
+                throw new Error("Session expired");
+            }
+            const contentType = response.headers.get("content-type");
+            if (contentType && contentType.includes("application/json")) {
+                return response.json();
+            } else {
+                return response.text().then(text => {
+                     if (text.includes("<!DOCTYPE html>")) {
+                         window.location.reload();
+                         throw new Error("Session expired");
+                     }
+                     throw new Error("Server Error: " + text.substring(0, 100));
+                });
+            }
+        })
+        .then(data => {
+            if(window.pioneerLive && ['started', 'stopped', 'removed', 'installing', 'caching'].includes(data.status)) {
+                // Page is subscribed to /api/events; the change arrives on its own
+                return;
+            } else if(['success', 'started', 'stopped', 'removed', 'installing', 'caching'].includes(data.status)) {
+                location.reload();
+            } else {
+                alert('Action sent: ' + data.status);
+            }
+        })
+        .catch(err => {
+            if(err.message !== "Session expired") {
+                alert('Network/Server Error: ' + err.message);
+            }
+        });
+    }
+}
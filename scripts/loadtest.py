@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Concurrent admin-session load test for the dashboard.
+
+Logs in N independent sessions and has each one request the given paths in
+a loop. Reports latency percentiles per path, overall throughput and the
+achieved concurrency (sum of request time / wall time): close to 1.0 means
+requests were served one at a time.
+
+    scripts/loadtest.py --url unix:/run/pioneer-dashboard/dashboard.sock \\
+        --password pioneer_admin --sessions 8 --requests 25 /api/status /network
+"""
+import argparse
+import http.client
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def connection(url, timeout):
+    if url.startswith('unix:'):
+        return UnixHTTPConnection(url[len('unix:'):], timeout)
+    parts = urllib.parse.urlsplit(url)
+    cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=timeout)
+
+
+class Session:
+    """One logged-in admin: a keep-alive connection plus its session cookie."""
+
+    def __init__(self, url, prefix, timeout):
+        self.url = url
+        self.prefix = prefix.rstrip('/')
+        self.timeout = timeout
+        self.conn = connection(url, timeout)
+        self.cookie = None
+        self.headers = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in (0, 1):
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Server closed the keep-alive connection; retry once on a new one
+                self.conn.close()
+                self.conn = connection(self.url, self.timeout)
+                if attempt:
+                    raise
+        self.headers = response.headers
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status, data
+
+    def login(self, password):
+        body = urllib.parse.urlencode({'password': password})
+        deadline = time.monotonic() + self.timeout
+        while True:
+            status, _ = self.request('POST', '/login', body,
+                                     {'Content-Type': 'application/x-www-form-urlencoded'})
+            # The server checks one password at a time and turns the rest away with 429
+            if status != 429 or time.monotonic() >= deadline:
+                break
+            time.sleep(float(self.headers.get('Retry-After') or 1))
+        if status != 302:
+            raise RuntimeError(f"login failed with HTTP {status}")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(args):
+    results = {path: [] for path in args.paths}
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(args.sessions + 1)
+
+    def worker():
+        session = Session(args.url, args.prefix, args.timeout)
+        try:
+            session.login(args.password)
+        except Exception as e:
+            with lock:
+                errors.append(f"login: {e}")
+            start_gate.wait()
+            return
+        start_gate.wait()
+        for _ in range(args.requests):
+            for path in args.paths:
+                started = time.perf_counter()
+                try:
+                    status, _ = session.request('GET', path)
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{path}: {e}")
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if status == 200:
+                        results[path].append(elapsed)
+                    else:
+                        errors.append(f"{path}: HTTP {status}")
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.sessions)]
+    for t in threads:
+        t.start()
+    start_gate.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return results, errors, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['/api/status', '/network', '/apps'])
+    parser.add_argument('--url', default='http://127.0.0.1:5000',
+                        help="http(s)://host:port or unix:/path/to.sock")
+    parser.add_argument('--prefix', default='', help="path prefix, e.g. /admin when going through nginx")
+    parser.add_argument('--password', default='pioneer_admin')
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=25, help="iterations over the paths per session")
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    results, errors, wall = run(args)
+    total = sum(len(v) for v in results.values())
+    busy = sum(sum(v) for v in results.values())
+    print(f"{args.sessions} sessions, {total} ok requests in {wall:.2f}s "
+          f"({total / wall if wall else 0:.1f} req/s), {len(errors)} errors")
+    print(f"{'path':<24} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for path, values in results.items():
+        row = [percentile(values, p) for p in (50, 95, 99, 100)]
+        print(f"{path:<24} {len(values):>5} " + ' '.join(
+            f"{v * 1000:>8.1f}" if v is not None else f"{'-':>8}" for v in row))
+    # ~1.0 when the server handles one request at a time, up to --sessions when fully parallel
+    print(f"achieved concurrency: {busy / wall if wall else 0:.2f}")
+    for error in errors[:10]:
+        print(f"error: {error}", file=sys.stderr)
+    return 1 if errors and not total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Dependency-aware parallel provisioning with Salt.
+
+Applies the states assigned to this device by top.sls as separate
+`salt-call state.apply <sls> concurrent=True` runs. States start as soon as
+the states they depend on have finished, so independent ones (e.g. image
+pulls for Portainer and WordPress next to nginx/cockpit package installs)
+overlap instead of running back to back.
+
+Dependencies come from the .sls files themselves:
+  include:                    included states run first
+  - sls: <name>               requisites on another sls
+  # provision: after <a> <b>  ordering-only dependency, without a Salt include
+  # provision: barrier        runs alone: after every state listed before it in
+                              top.sls and before every state listed after it
+
+States that install packages share one apt/dpkg lock, so at most one of them
+runs at a time; everything else runs alongside.
+
+    scripts/provision.py               apply everything, print a timing report
+    scripts/provision.py --plan        show the dependency graph, apply nothing
+    scripts/provision.py --serial      one state at a time (baseline timing)
+    scripts/provision.py --json t.json also write the timings as JSON
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+STATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'salt', 'states')
+SALT_CALL = ['salt-call', '--local', '--out=json']
+
+INCLUDE_RE = re.compile(r'^include:\s*$')
+LIST_ITEM_RE = re.compile(r'^\s+-\s+([\w.]+)\s*$')
+SLS_REQUISITE_RE = re.compile(r'^\s+-\s+sls:\s*([\w.]+)\s*$')
+DIRECTIVE_RE = re.compile(r'^#\s*provision:\s*(\w[\w-]*)\s*(.*)$')
+PKG_RE = re.compile(r'^\s+pkg\.(installed|latest|removed|purged)\s*:')
+
+
+def sls_path(states_dir, name):
+    base = os.path.join(states_dir, *name.split('.'))
+    for path in (base + '.sls', os.path.join(base, 'init.sls')):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def parse_sls(path):
+    """Returns (dependencies, barrier, uses_pkg) read from one .sls file."""
+    deps = []
+    barrier = False
+    uses_pkg = False
+    in_include = False
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            directive = DIRECTIVE_RE.match(line)
+            if directive:
+                if directive.group(1) == 'after':
+                    deps += directive.group(2).split()
+                elif directive.group(1) == 'barrier':
+                    barrier = True
+                continue
+            if INCLUDE_RE.match(line):
+                in_include = True
+                continue
+            if in_include:
+                item = LIST_ITEM_RE.match(line)
+                if item:
+                    deps.append(item.group(1))
+                    continue
+                if line.strip() and not line.lstrip().startswith('#'):
+                    in_include = False
+            requisite = SLS_REQUISITE_RE.match(line)
+            if requisite:
+                deps.append(requisite.group(1))
+            if PKG_RE.match(line):
+                uses_pkg = True
+    return deps, barrier, uses_pkg
+
+
+def top_states():
+    """States this minion gets from top.sls, in top order (grain matches resolved by Salt)."""
+    out = subprocess.run(SALT_CALL + ['state.show_top'], stdout=subprocess.PIPE, check=True, text=True).stdout
+    states = []
+    for env_states in json.loads(out)['local'].values():
+        for name in env_states:
+            if name not in states:
+                states.append(name)
+    return states
+
+
+def build_graph(states, states_dir):
+    """{state: {'deps', 'requires', 'pkg'}} restricted to the states being applied.
+
+    `deps` is everything a state waits for; `requires` only the real
+    dependencies (include/sls/after), whose failure skips the state. Barriers
+    and --serial add ordering without making states depend on each other.
+    """
+    graph = {}
+    barriers = []
+    for index, name in enumerate(states):
+        path = sls_path(states_dir, name)
+        deps, barrier, uses_pkg = parse_sls(path) if path else ([], False, False)
+        requires = {d for d in deps if d in states and d != name}
+        graph[name] = {'deps': set(requires), 'requires': requires, 'pkg': uses_pkg}
+        if barrier:
+            barriers.append(index)
+    for index in barriers:
+        name = states[index]
+        graph[name]['deps'] |= set(states[:index])
+        for later in states[index + 1:]:
+            graph[later]['deps'].add(name)
+    check_acyclic(graph)
+    return graph
+
+
+def check_acyclic(graph):
+    visiting, done = set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise SystemExit(f"dependency cycle: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in graph[name]['deps']:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in graph:
+        visit(name, [])
+
+
+def apply_state(name):
+    """Runs one sls; returns (ok, per-state-id results from Salt's JSON output)."""
+    proc = subprocess.run(SALT_CALL + ['--retcode-passthrough', 'state.apply', name, 'concurrent=True'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        results = json.loads(proc.stdout).get('local', {})
+    except ValueError:
+        results = {}
+    if not isinstance(results, dict):
+        # Render errors come back as a list of messages
+        print(f"[{name}] {results}", file=sys.stderr)
+        results = {}
+    ok = proc.returncode == 0 and all(r.get('result') is not False for r in results.values())
+    if proc.returncode != 0 and proc.stderr:
+        print(f"[{name}] {proc.stderr.strip()[-2000:]}", file=sys.stderr)
+    return ok, results
+
+
+class Runner:
+    """Starts each state once its dependencies succeeded, with at most `jobs` in flight."""
+
+    def __init__(self, graph, jobs=4, apply=apply_state):
+        self.graph = graph
+        self.jobs = jobs
+        self.apply = apply
+        self.timings = {}  # state -> {'start', 'end', 'ok', 'ids'}
+        self._pending = set(graph)
+        self._running = set()
+        self._pkg_busy = False
+        self._cond = threading.Condition()
+        self._started = None
+
+    def _ready(self):
+        for name in sorted(self._pending, key=list(self.graph).index):
+            deps = self.graph[name]['deps']
+            if any(d not in self.timings for d in deps):
+                continue
+            if self.graph[name]['pkg'] and self._pkg_busy:
+                continue
+            return name
+        return None
+
+    def _skip_failed(self):
+        # Dependents of a failed state are skipped, not run against a half-provisioned box
+        changed = True
+        while changed:
+            changed = False
+            for name in list(self._pending):
+                failed = [d for d in self.graph[name]['requires'] if d in self.timings and not self.timings[d]['ok']]
+                if failed:
+                    self._pending.discard(name)
+                    now = time.monotonic() - self._started
+                    self.timings[name] = {'start': now, 'end': now, 'ok': False,
+                                          'skipped': f"dependency failed: {', '.join(sorted(failed))}", 'ids': {}}
+                    changed = True
+
+    def _run_one(self, name):
+        started = time.monotonic() - self._started
+        print(f"[{started:7.1f}s] start  {name}", flush=True)
+        try:
+            ok, ids = self.apply(name)
+        except Exception as e:
+            print(f"[{name}] {e}", file=sys.stderr)
+            ok, ids = False, {}
+        ended = time.monotonic() - self._started
+        print(f"[{ended:7.1f}s] {'done  ' if ok else 'FAILED'} {name} ({ended - started:.1f}s)", flush=True)
+        with self._cond:
+            self.timings[name] = {'start': started, 'end': ended, 'ok': ok, 'ids': ids}
+            self._running.discard(name)
+            if self.graph[name]['pkg']:
+                self._pkg_busy = False
+            self._cond.notify_all()
+
+    def run(self):
+        self._started = time.monotonic()
+        with self._cond:
+            while self._pending or self._running:
+                self._skip_failed()
+                name = self._ready() if len(self._running) < self.jobs else None
+                if name is None:
+                    if not self._pending and not self._running:
+                        break
+                    self._cond.wait()
+                    continue
+                self._pending.discard(name)
+                self._running.add(name)
+                if self.graph[name]['pkg']:
+                    self._pkg_busy = True
+                threading.Thread(target=self._run_one, args=(name,), daemon=True).start()
+        return all(t['ok'] for t in self.timings.values())
+
+    @property
+    def wall(self):
+        return max((t['end'] for t in self.timings.values()), default=0.0)
+
+
+def critical_path(graph, timings):
+    """Longest chain of dependent states by duration: what bounds first-boot time."""
+    best = {}
+
+    def cost(name):
+        if name not in best:
+            duration = timings[name]['end'] - timings[name]['start']
+            prev = max(graph[name]['deps'], key=cost, default=None)
+            best[name] = (duration + (cost(prev)[0] if prev else 0), (cost(prev)[1] if prev else []) + [name])
+        return best[name]
+
+    return max((cost(name) for name in graph), default=(0, []))
+
+
+def report(graph, runner, top=10):
+    timings = runner.timings
+    busy = sum(t['end'] - t['start'] for t in timings.values())
+    print()
+    print(f"{'state':<28} {'start':>8} {'time':>8}  result")
+    for name, t in sorted(timings.items(), key=lambda item: item[1]['start']):
+        result = 'ok' if t['ok'] else t.get('skipped', 'failed')
+        print(f"{name:<28} {t['start']:>7.1f}s {t['end'] - t['start']:>7.1f}s  {result}")
+    print(f"\nwall time {runner.wall:.1f}s, serial sum {busy:.1f}s, "
+          f"speedup {busy / runner.wall if runner.wall else 0:.2f}x")
+    length, path = critical_path(graph, timings)
+    print(f"critical path ({length:.1f}s): {' -> '.join(path)}")
+    # Package states never overlap, so their sum is a floor on wall time too
+    locked = sum(t['end'] - t['start'] for name, t in timings.items() if graph[name]['pkg'])
+    print(f"apt-locked states: {locked:.1f}s serialized")
+    # Salt reports a duration (ms) per state ID; the slowest ones are where to optimise
+    ids = []
+    for name, t in timings.items():
+        for state_id, result in t['ids'].items():
+            ids.append((float(result.get('duration', 0) or 0) / 1000, name, result.get('__id__', state_id)))
+    if ids:
+        print("\nslowest state IDs:")
+        for seconds, name, state_id in sorted(ids, reverse=True)[:top]:
+            print(f"  {seconds:7.1f}s  {name}: {state_id}")
+
+
+def print_plan(graph):
+    for name, node in graph.items():
+        deps = ', '.join(sorted(node['deps'])) or '-'
+        print(f"{name:<28} after: {deps}{'  [apt lock]' if node['pkg'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('states', nargs='*', help="states to apply (default: this minion's top.sls)")
+    parser.add_argument('--states-dir', default=os.path.normpath(STATES_DIR))
+    parser.add_argument('--jobs', type=int, default=4, help="states applied at the same time")
+    parser.add_argument('--serial', action='store_true', help="apply one state at a time, in top order")
+    parser.add_argument('--plan', action='store_true', help="print the dependency graph and exit")
+    parser.add_argument('--json', metavar='PATH', help="write per-state timings to this file")
+    args = parser.parse_args()
+
+    states = args.states or top_states()
+    graph = build_graph(states, args.states_dir)
+    if args.plan:
+        print_plan(graph)
+        return 0
+    if args.serial:
+        for index, name in enumerate(states):
+            graph[name]['deps'] |= set(states[:index])
+
+    runner = Runner(graph, jobs=1 if args.serial else max(1, args.jobs))
+    ok = runner.run()
+    report(graph, runner)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'wall': runner.wall, 'serial': args.serial, 'states': {
+                name: {k: v for k, v in t.items() if k != 'ids'} for name, t in runner.timings.items()
+            }}, f, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
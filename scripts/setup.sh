@@ -186,8 +186,15 @@ if [ -n "$AP_IFACE" ]; then
 fi
 
 # 6. Apply Salt State
+# Independent states are applied in parallel; the timing report goes to the log
 log ">>> [6/6] Applying Configuration..."
-salt-call --local state.apply
+set +e
+python3 "$INSTALL_DIR/scripts/provision.py" --json /var/log/pioneer-provision.json 2>&1 | tee -a "$LOG_FILE"
+PROVISION_STATUS=${PIPESTATUS[0]}
+set -e
+if [ "$PROVISION_STATUS" -ne 0 ]; then
+    log "WARNING: Some states failed; see $LOG_FILE. Re-run with: salt-call --local state.apply"
+fi
 
 log ">>> Bootstrap Complete!"
 log "    Access Cockpit at: https://$(hostname -I | awk '{print $1}'):9090"
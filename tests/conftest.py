@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The dashboard runs as flat modules from its own directory; the fake backends are the bench's
+sys.path.insert(0, os.path.join(ROOT_DIR, 'dashboard'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bench'))
@@ -0,0 +1,28 @@
+from appstate import AppStateTable
+
+
+def test_seeded_rows_until_the_first_reconcile():
+    table = AppStateTable()
+    table.seed([{'id': 'wiki', 'name': 'Wiki'}, {'id': 'blog', 'name': 'Blog'}])
+    assert table.ids() == ['wiki', 'blog']
+    assert table.get('wiki')['status'] == 'unknown'
+    assert table.get('wiki')['installed'] is False
+
+    events = table.subscribe()
+    table.reconcile([{'id': 'wiki', 'name': 'Wiki', 'installed': True, 'running': True}])
+    assert table.ids() == ['wiki']
+    assert 'status' not in table.get('wiki')
+    assert events.get_nowait()['id'] == 'wiki'
+
+    # Seeding again must not hide the real state behind placeholders
+    table.seed([{'id': 'wiki', 'name': 'Wiki'}])
+    assert table.get('wiki')['running'] is True
+
+
+def test_docker_event_makes_a_seeded_row_known():
+    table = AppStateTable()
+    table.seed([{'id': 'wiki', 'name': 'Wiki'}])
+    table.update('wiki', cache_job='j1')
+    assert table.get('wiki')['status'] == 'unknown'
+    table.update('wiki', installed=True, running=False)
+    assert 'status' not in table.get('wiki')
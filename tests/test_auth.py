@@ -0,0 +1,117 @@
+import json
+import os
+import stat
+
+import pytest
+
+import auth
+from auth import (AuthError, Authenticator, ConfigFile, LoginLimiter, SessionStore, check_password,
+                  hash_iterations, hash_password)
+
+
+def test_password_hash_round_trip():
+    encoded = hash_password('s3cret', iterations=1000)
+    assert encoded.startswith('pbkdf2_sha256$1000$')
+    assert hash_iterations(encoded) == 1000
+    assert check_password('s3cret', encoded)
+    assert not check_password('s3cret!', encoded)
+    # Same password, new salt
+    assert hash_password('s3cret', iterations=1000) != encoded
+
+
+@pytest.mark.parametrize('encoded', [None, '', 'plaintext', 'md5$1$a$b', 'pbkdf2_sha256$x$a$b'])
+def test_malformed_hashes_never_match(encoded):
+    assert not check_password('anything', encoded)
+
+
+def test_limiter_locks_out_after_max_failures(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, 'monotonic', lambda: now[0])
+    limiter = LoginLimiter(max_failures=3, window=60)
+    for _ in range(3):
+        assert limiter.retry_after('10.0.0.2') == 0
+        limiter.failure('10.0.0.2')
+    assert limiter.retry_after('10.0.0.2') == 61
+    assert limiter.retry_after('10.0.0.3') == 0
+    now[0] += 60
+    assert limiter.retry_after('10.0.0.2') == 0
+
+
+def test_success_clears_failures():
+    limiter = LoginLimiter(max_failures=2, window=60)
+    limiter.failure('10.0.0.2')
+    limiter.success('10.0.0.2')
+    limiter.failure('10.0.0.2')
+    assert limiter.retry_after('10.0.0.2') == 0
+
+
+def test_authenticator_refuses_locked_out_clients_unchecked(tmp_path):
+    config = ConfigFile(str(tmp_path / 'config.json'), {'admin_password_hash': hash_password('right', 1000)})
+    authenticator = Authenticator(config, LoginLimiter(max_failures=1, window=60), iterations=1000)
+    assert not authenticator.verify('wrong', '10.0.0.2')
+    with pytest.raises(AuthError) as raised:
+        authenticator.verify('right', '10.0.0.2')
+    assert raised.value.retry_after > 0
+    assert authenticator.verify('right', '10.0.0.3')
+
+
+def test_sessions_expire_when_idle(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, 'time', lambda: now[0])
+    store = SessionStore(str(tmp_path / 'sessions.json'), idle_timeout=600)
+    user = store.create()
+    assert store.get(user.id) is user
+    now[0] += 599
+    assert store.get(user.id) is user
+    now[0] += 599
+    assert store.get(user.id) is user  # the previous get counted as activity
+    now[0] += 600
+    assert store.get(user.id) is None
+
+
+def test_sessions_survive_a_reload_with_their_last_touch(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, 'time', lambda: now[0])
+    path = str(tmp_path / 'sessions.json')
+    store = SessionStore(path, idle_timeout=600)
+    user = store.create()
+    other = store.create()
+    store.revoke(other.id)
+    now[0] += 500
+    store.get(user.id)
+    now[0] += 500
+    restored = SessionStore(path, idle_timeout=600)
+    assert restored.get(user.id).id == user.id
+    assert restored.get(other.id) is None
+    # Tokens themselves never reach the file
+    with open(path) as f:
+        assert user.id not in f.read()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_config_migrates_legacy_file_and_hashes_plaintext(tmp_path):
+    legacy = tmp_path / 'app' / 'config.json'
+    legacy.parent.mkdir()
+    legacy.write_text(json.dumps({'admin_password': 'pioneer', 'secret_key': 'k'}))
+    path = tmp_path / 'etc' / 'config.json'
+    config = ConfigFile(str(path), {'theme': 'dark'}, legacy_path=str(legacy))
+    assert not legacy.exists()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(path.parent).st_mode) == 0o700
+    saved = json.loads(path.read_text())
+    assert 'admin_password' not in saved
+    assert check_password('pioneer', saved['admin_password_hash'])
+    assert (saved['secret_key'], saved['theme']) == ('k', 'dark')
+    assert config['secret_key'] == 'k'
+
+
+def test_config_from_template_and_permissions_tightened(tmp_path):
+    template = tmp_path / 'config.example.json'
+    template.write_text(json.dumps({'admin_password': 'pioneer'}))
+    path = tmp_path / 'config.json'
+    ConfigFile(str(path), {}, template_path=str(template))
+    assert template.exists()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    os.chmod(path, 0o644)
+    ConfigFile(str(path), {}, template_path=str(template))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
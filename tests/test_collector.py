@@ -0,0 +1,50 @@
+import threading
+import time
+
+from collector import StatusCollector
+
+
+def test_every_waited_refresh_sees_a_run_that_started_after_it():
+    counter = {'runs': 0}
+    lock = threading.Lock()
+
+    def probe():
+        with lock:
+            counter['runs'] += 1
+            return counter['runs']
+
+    collector = StatusCollector()
+    collector.register('count', probe, interval=3600)
+    collector.start()
+    try:
+        for _ in range(200):
+            before = counter['runs']
+            value = collector.refresh('count', wait=True, timeout=5)
+            assert value > before
+    finally:
+        collector.stop()
+
+
+def test_wakes_during_a_run_are_not_dropped():
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def probe():
+        runs.append(time.monotonic())
+        started.set()
+        release.wait(5)
+
+    collector = StatusCollector()
+    collector.register('slow', probe, interval=3600)
+    collector.start()
+    try:
+        assert started.wait(5)
+        started.clear()
+        # Lands while the first run is still going; it must cause a second run
+        collector.refresh('slow')
+        release.set()
+        assert started.wait(5)
+        assert len(runs) >= 2
+    finally:
+        release.set()
+        collector.stop()
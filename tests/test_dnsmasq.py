@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+import dnsmasq
+import fakes
+from dnsmasq import BatchError, ConfigError, ConfigTransaction, RecordIndex, ReservationIndex
+
+
+@pytest.fixture
+def tx(tmp_path, monkeypatch):
+    monkeypatch.setattr(dnsmasq, 'CONFIG_DIR', str(tmp_path))
+    return ConfigTransaction(dhcp_conf=str(tmp_path / 'dhcp.conf'), dns_conf=str(tmp_path / 'dns.conf'),
+                             reload=lambda: None)
+
+
+@pytest.fixture
+def fake_commands(tmp_path, monkeypatch):
+    """dnsmasq and systemctl from the bench fakes, so the real reload_dnsmasq runs."""
+    monkeypatch.setenv('PATH', fakes.install_commands(str(tmp_path / 'bin')))
+    monkeypatch.delenv('PIONEER_FAKE_FAIL', raising=False)
+    monkeypatch.setattr(dnsmasq, 'CONFIG_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize('op, message', [
+    (5, "must be an object"),
+    ({'command': 'add_dhcp_reservation', 'mac': 'aa:bb:cc:dd:ee:ff'}, "'ip' is required"),
+    ({'command': 'del_dns_record', 'hostname': 3}, "'hostname' must be a string"),
+    ({'command': 'add_dns_record', 'hostname': 'nas', 'ip': '10.0.0.300'}, "Invalid IP address"),
+    ({'command': 'reboot'}, "Unknown batch command"),
+])
+def test_bad_batch_op_reports_its_index(tx, op, message):
+    ok = {'command': 'add_dns_record', 'hostname': 'nas', 'ip': '10.42.0.5'}
+    with pytest.raises(BatchError, match=message) as raised:
+        tx.apply_ops([ok, op])
+    assert raised.value.index == 1
+    assert isinstance(raised.value, ConfigError)
+
+
+def test_ops_must_be_a_list(tx):
+    with pytest.raises(ConfigError):
+        tx.apply_ops({'command': 'add_dns_record'})
+
+
+def test_batch_writes_each_file_once(tx):
+    tx.apply_ops([
+        {'command': 'add_dhcp_reservation', 'mac': 'AA:BB:CC:DD:EE:01', 'ip': '10.42.0.10', 'hostname': 'cam'},
+        {'command': 'add_dns_record', 'hostname': 'nas', 'ip': '10.42.0.5'},
+        {'command': 'del_dns_record', 'hostname': 'missing'},
+    ])
+    assert tx.commit() == 3
+    with open(tx.dhcp_conf) as f:
+        assert f.read() == "dhcp-host=aa:bb:cc:dd:ee:01,10.42.0.10,cam\n"
+    assert [r['hostname'] for r in RecordIndex(tx.dns_conf).all()] == ['nas']
+
+
+def test_record_query_pages_and_filters(tmp_path):
+    path = tmp_path / 'dns.conf'
+    path.write_text(''.join(f"host-record=host-{n:02},10.42.1.{n}\n" for n in range(25)))
+    index = RecordIndex(str(path))
+    page = index.query(page=3, per_page=10)
+    assert (page['total'], page['pages'], len(page['entries'])) == (25, 3, 5)
+    assert page['entries'][0]['hostname'] == 'host-20'
+    assert [r['hostname'] for r in index.query(search='HOST-1')['entries']] == [f"host-1{n}" for n in range(10)]
+    assert index.query(search='10.42.1.7')['total'] == 1
+
+
+def test_concurrent_commits_keep_every_change(fake_commands):
+    dhcp_conf, dns_conf = str(fake_commands / 'dhcp.conf'), str(fake_commands / 'dns.conf')
+    errors = []
+    start = threading.Barrier(8)
+
+    def commit(n):
+        tx = ConfigTransaction(dhcp_conf=dhcp_conf, dns_conf=dns_conf)
+        tx.add_reservation(f"aa:bb:cc:dd:ee:{n:02x}", f"10.42.0.{100 + n}", f"cam-{n}")
+        tx.add_record(f"host-{n}", f"10.42.1.{n}")
+        start.wait()
+        try:
+            tx.commit()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=commit, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    reservations = ReservationIndex(dhcp_conf).all()
+    assert sorted(r['ip'] for r in reservations) == sorted(f"10.42.0.{100 + n}" for n in range(8))
+    assert len(RecordIndex(dns_conf).all()) == 8
+
+
+def test_failed_reload_rolls_back(fake_commands, monkeypatch):
+    dhcp_conf = fake_commands / 'dhcp.conf'
+    dhcp_conf.write_text("dhcp-host=aa:bb:cc:dd:ee:01,10.42.0.10\n")
+    monkeypatch.setenv('PIONEER_FAKE_FAIL', 'dnsmasq=1')
+    tx = ConfigTransaction(dhcp_conf=str(dhcp_conf), dns_conf=str(fake_commands / 'dns.conf'))
+    tx.delete_reservation('aa:bb:cc:dd:ee:01')
+    tx.add_reservation('aa:bb:cc:dd:ee:02', '10.42.0.11')
+    with pytest.raises(Exception, match="Dnsmasq Error"):
+        tx.commit()
+    assert dhcp_conf.read_text() == "dhcp-host=aa:bb:cc:dd:ee:01,10.42.0.10\n"
+
+
+def test_conflicting_reservation_is_refused(tx):
+    tx.add_reservation('aa:bb:cc:dd:ee:01', '10.42.0.10')
+    tx.commit()
+    tx.add_reservation('aa:bb:cc:dd:ee:02', '10.42.0.10')
+    with pytest.raises(ConfigError, match="already reserved"):
+        tx.commit()
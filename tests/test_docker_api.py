@@ -0,0 +1,128 @@
+"""docker_api.DockerClient against the fake Engine API on a unix socket."""
+import threading
+
+import pytest
+
+import fakes
+from docker_api import COMPOSE_PROJECT_LABEL, DockerClient, DockerError
+
+
+def container(name, state='running', project=None):
+    labels = {COMPOSE_PROJECT_LABEL: project} if project else {}
+    return {'Id': f"{name}-0123456789abcdef", 'Names': [f"/{name}"], 'State': state,
+            'Status': 'Up 1 minute' if state == 'running' else 'Exited (0) 1 minute ago', 'Labels': labels}
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    state = fakes.DockerState([
+        container('web', project='blog'),
+        container('db', state='exited', project='blog'),
+        container('cache', state='exited'),
+    ])
+    handler = type('Handler', (fakes.DockerHandler,), {'state': state})
+    socket_path = str(tmp_path / 'docker.sock')
+    server = fakes.UnixServer(socket_path, handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield state, socket_path
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def client(daemon):
+    docker = DockerClient(daemon[1], timeout=5)
+    yield docker
+    docker.close()
+
+
+def names(containers):
+    return sorted(c['Names'][0].lstrip('/') for c in containers)
+
+
+def test_available(client, tmp_path):
+    assert client.available()
+    assert not DockerClient(str(tmp_path / 'missing.sock')).available()
+
+
+def test_containers_and_filters(client):
+    assert names(client.containers()) == ['web']
+    assert names(client.containers(all=True)) == ['cache', 'db', 'web']
+    assert names(client.containers(all=True, labels=[COMPOSE_PROJECT_LABEL])) == ['db', 'web']
+    assert names(client.containers(all=True, labels=[f"{COMPOSE_PROJECT_LABEL}=other"])) == []
+    assert names(client.containers(all=True, names=['cache'])) == ['cache']
+
+
+def test_start_stop_and_state(client):
+    assert client.container_state('cache')['Running'] is False
+    client.start('cache')
+    client.start('cache')  # 304 when already running
+    assert client.container_state('cache')['Status'] == 'running'
+    client.stop('cache', timeout=0)
+    client.stop('cache', timeout=0)
+    assert client.container_state('cache')['Running'] is False
+
+
+def test_missing_container(client):
+    assert client.container_state('nope') is None
+    with pytest.raises(DockerError) as raised:
+        client.start('nope')
+    assert raised.value.status == 404
+    client.remove('nope')  # already gone is fine
+
+
+def test_server_errors(client, monkeypatch):
+    monkeypatch.setenv('PIONEER_FAKE_FAIL', 'docker=1')
+    with pytest.raises(DockerError) as raised:
+        client.containers()
+    assert raised.value.status == 500
+    assert 'simulated failure' in str(raised.value)
+
+
+def test_projects(client):
+    assert client.start_project('blog')
+    assert names(client.containers(labels=[f"{COMPOSE_PROJECT_LABEL}=blog"])) == ['db', 'web']
+    assert client.stop_project('blog', timeout=0) == 2
+    client.remove_project('blog', timeout=0)
+    assert names(client.containers(all=True)) == ['cache']
+    assert not client.start_project('blog')
+
+
+def test_pooled_connections_are_reused(client):
+    for _ in range(5):
+        client.containers()
+    assert client._pool.qsize() == 1
+    # Concurrent callers each get a connection; the pool keeps at most pool_size
+    threads = [threading.Thread(target=client.containers) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 1 <= client._pool.qsize() <= 4
+
+
+def test_events(client):
+    events = client.events(filters={'type': ['container']})
+    received = []
+
+    def read():
+        # The first event seen may be the 'die' of an earlier attempt
+        for event in events:
+            if event['Action'] == 'start':
+                received.append(event)
+                return
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    # The stream has to be subscribed before the change it should report
+    for _ in range(50):
+        client.start('cache')
+        reader.join(timeout=0.2)
+        if received:
+            break
+        client.stop('cache', timeout=0)
+    events.close()
+    assert received[0]['Action'] == 'start'
+    assert received[0]['Actor']['Attributes']['name'] == 'cache'
@@ -0,0 +1,15 @@
+from httpcache import stable_etag
+
+VOLATILE = {'age', 'updated'}
+
+
+def test_stable_etag_ignores_volatile_fields_at_any_depth():
+    a = {'hotspot': {'value': True, 'updated': 1.0, 'age': 0.1}, 'list': [{'age': 3, 'ok': 1}]}
+    b = {'hotspot': {'value': True, 'updated': 9.0, 'age': 4.2}, 'list': [{'age': 8, 'ok': 1}]}
+    assert stable_etag(a, VOLATILE) == stable_etag(b, VOLATILE)
+
+
+def test_stable_etag_changes_with_values():
+    a = {'hotspot': {'value': True, 'updated': 1.0}}
+    b = {'hotspot': {'value': False, 'updated': 1.0}}
+    assert stable_etag(a, VOLATILE) != stable_etag(b, VOLATILE)
@@ -0,0 +1,109 @@
+"""nm.DBusNetworkManager against the fake NetworkManager on a private bus."""
+import shutil
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('jeepney')
+if not shutil.which('dbus-daemon'):
+    pytest.skip("dbus-daemon not installed", allow_module_level=True)
+
+import fakes  # noqa: E402
+import nm  # noqa: E402
+
+
+@pytest.fixture
+def bus(tmp_path):
+    proc, address = fakes.start_bus(str(tmp_path))
+    yield address
+    proc.terminate()
+    proc.wait()
+
+
+@pytest.fixture
+def service(bus, request):
+    kwargs = getattr(request, 'param', {})
+    fake = fakes.FakeNetworkManager.connect(bus, **kwargs)
+    thread = threading.Thread(target=fake.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.close()
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def client(bus, service):
+    clients = []
+
+    def connect():
+        clients.append(nm.DBusNetworkManager(bus=bus, timeout=5).connect())
+        return clients[-1]
+
+    yield connect
+    for c in clients:
+        c.close()
+
+
+def wait_for(predicate, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_model_and_hotspot_status(client):
+    manager = client()
+    assert set(manager.connections) == {'Wired connection 1', 'PIONEER_SETUP'}
+    assert manager.wireless_interface() == 'wlan0'
+    assert manager.hotspot_active()
+
+
+def test_disconnect_and_connect(client, service):
+    manager = client()
+    manager.set_hotspot_active(False)
+    assert not manager.hotspot_active()
+    assert 'PIONEER_SETUP' not in {conn['Id'] for conn in service.active.values()}
+    manager.set_hotspot_active(True)
+    assert manager.hotspot_active()
+
+
+def test_signals_refresh_other_clients(client):
+    watcher, other = client(), client()
+    other.set_hotspot_active(False)
+    assert wait_for(lambda: not watcher.hotspot_active())
+    other.set_hotspot_active(True)
+    assert wait_for(watcher.hotspot_active)
+
+
+@pytest.mark.parametrize('service', [{'profiles': {'Wired connection 1': ('802-3-ethernet', 'eth0')}}],
+                         indirect=True)
+def test_ensure_hotspot_creates_profile(client, service):
+    manager = client()
+    assert not manager.hotspot_active()
+    assert manager.ensure_hotspot()
+    assert not manager.ensure_hotspot()
+    settings = service.profiles[manager.connections['PIONEER_SETUP']['path']]
+    assert settings['802-11-wireless']['ssid'] == ('ay', nm.DEFAULT_SSID.encode())
+    assert settings['connection']['interface-name'] == ('s', 'wlan0')
+    manager.set_hotspot_active(True)
+    assert manager.hotspot_active()
+
+
+def test_update_hotspot_reapplies_active_profile(client, service):
+    manager = client()
+    before = manager.active['PIONEER_SETUP']['path']
+    manager.update_hotspot('Cafe', 'secret123')
+    settings = service.profiles[manager.connections['PIONEER_SETUP']['path']]
+    assert settings['802-11-wireless']['ssid'] == ('ay', b'Cafe')
+    assert settings['802-11-wireless-security']['psk'] == ('s', 'secret123')
+    assert manager.hotspot_active()
+    assert manager.active['PIONEER_SETUP']['path'] != before
+
+
+def test_errors_raise_nmerror(client, service):
+    manager = client()
+    with pytest.raises(nm.NMError):
+        manager._call(nm.NM_PATH, nm.NM_IFACE, 'DeactivateConnection', 'o', ('/nope',))
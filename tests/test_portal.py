@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+import portal
+
+
+class SlowNdsctl:
+    """Holds clients() until released, like a wedged nodogsplash socket."""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def clients(self):
+        self.calls += 1
+        self.entered.set()
+        assert self.release.wait(5)
+        return [{'mac': 'AA:BB:CC:DD:EE:01', 'ip': '10.42.0.2', 'state': 'Authenticated'}]
+
+
+class NoLeases:
+    by_mac = {}
+
+    def refresh(self):
+        return self
+
+
+@pytest.fixture
+def conf(tmp_path):
+    path = tmp_path / 'nodogsplash.conf'
+    path.write_text("GatewayInterface wlan0\nMaxClients 120\n")
+    return str(path)
+
+
+def test_settings_do_not_wait_for_a_refresh(conf):
+    ndsctl = SlowNdsctl()
+    tracker = portal.PortalTracker(ndsctl, NoLeases(), conf_path=conf)
+    refresher = threading.Thread(target=tracker.refresh)
+    refresher.start()
+    try:
+        assert ndsctl.entered.wait(5)
+        reader = threading.Thread(target=tracker.settings)
+        reader.start()
+        reader.join(1)
+        assert not reader.is_alive(), "settings() blocked behind the ndsctl round trip"
+        assert tracker.settings()['max_clients'] == 120
+    finally:
+        ndsctl.release.set()
+        refresher.join(5)
+    assert [c['mac'] for c in tracker._clients] == ['aa:bb:cc:dd:ee:01']
+
+
+def test_concurrent_refreshes_share_one_round_trip(conf):
+    ndsctl = SlowNdsctl()
+    tracker = portal.PortalTracker(ndsctl, NoLeases(), conf_path=conf)
+    threads = [threading.Thread(target=tracker.refresh) for _ in range(8)]
+    for t in threads:
+        t.start()
+    assert ndsctl.entered.wait(5)
+    ndsctl.release.set()
+    for t in threads:
+        t.join(5)
+    assert ndsctl.calls == 1
+
+
+def test_settings_none_without_portal(tmp_path):
+    tracker = portal.PortalTracker(SlowNdsctl(), NoLeases(), conf_path=str(tmp_path / 'missing.conf'))
+    assert tracker.settings() is None